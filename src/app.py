@@ -6,27 +6,122 @@
 Y \t X, где Y размер таблицы по вертикали, а X по горизонтали.
 
 Ячейки последующий Y строк, должны быть размером X и значения разделены так же символом \t (табуляции).
+
+Строки читаются из потока ввода, либо из файла (в кодировке UTF-8), путь к которому задан параметром
+командной строки. Файл отображается в память (mmap) и не загружается целиком.
+
+Параметры командной строки:
+    path Путь к файлу таблицы (по умолчанию поток ввода)
+    --sparse Хранить только заполненные ячейки (для таблиц с большим кол-вом пустых ячеек)
+    --stats Вывести статистику обработки в поток ошибок (stderr)
+    --workers N Рассчитать независимые группы ячеек параллельно в N процессах
+    --explain [N] Вывести анализ зависимостей (самая длинная цепочка, N самых дорогих ячеек) в поток ошибок
+    --stream N Потоковый расчет (выражения ссылаются только на ячейки своей строки и N предшествующих строк):
+        строка выводится сразу после чтения, память не зависит от кол-ва строк
 """
 
+import argparse
+import sys
+from typing import Iterator, Optional
+
 from excel.sheet import Sheet
+from excel.stream import LineReader, MappedLineReader, write_lines
+from excel.stream_sheet import StreamSheet
 
 
-def run():
+def run(sparse: bool = False, stats: bool = False, explain: int = None, workers: int = None, path: str = None,
+        stream: int = None):
     """
     Запустить приложение
+
+    :param sparse: Хранить только заполненные ячейки (см. Sheet)
+    :param stats: Вывести статистику обработки (см. SheetStats) в поток ошибок
+    :param explain: Вывести анализ зависимостей (см. SheetExplain) с заданным кол-вом самых дорогих ячеек
+    :param workers: Кол-во процессов для параллельного расчета (см. Sheet.calculate)
+    :param path: Путь к файлу таблицы (см. MappedLineReader), по умолчанию таблица читается из потока ввода
+    :param stream: Кол-во строк окна потокового расчета (см. StreamSheet), по умолчанию лист рассчитывается целиком
+    """
+
+    # Входной поток читается блоками, строки результата записываются пачками (см. LineReader, write_lines)
+    if path is None:
+        run_reader(LineReader(sys.stdin.buffer, sys.stdin.encoding, sys.stdin.errors), sparse, stats, explain,
+                   workers, stream)
+        return
+
+    with MappedLineReader(path) as reader:
+        run_reader(reader, sparse, stats, explain, workers, stream)
+
+
+def run_reader(reader: LineReader, sparse: bool, stats: bool, explain: Optional[int], workers: Optional[int],
+               stream: Optional[int]):
+    """
+    Рассчитать лист, строки которого читаются из reader, и вывести результат (параметры см. run)
+    """
+
+    if stream is not None:
+        write_lines(sys.stdout, stream_sheet(reader, stream))
+        sys.stdout.flush()
+        return
+
+    sheet = read_sheet(reader, sparse, stats)
+    result = sheet.calculate(workers=workers)
+
+    write_lines(sys.stdout, result.format_lines())
+    sys.stdout.flush()
+
+    if stats:
+        print(sheet.get_stats().format(), file=sys.stderr)
+
+    if explain is not None:
+        print(sheet.explain().format(explain), file=sys.stderr)
+
+
+def read_sheet(reader: LineReader, sparse: bool, stats: bool) -> Sheet:
+    """
+    Прочитать лист: строку размера и строки ячеек
+
+    :param reader: Чтение строк
+    :param sparse: Хранить только заполненные ячейки (см. Sheet)
+    :param stats: Собирать статистику обработки (см. Sheet)
+    :raise: ValueError, EOFError
     """
 
-    size_line = input()
-    sheet = Sheet(size_line)
+    sheet = Sheet(reader.read_line(), sparse=sparse, stats=stats)
 
-    for y in range(0, sheet.get_size().y):
-        sheet.add_line(input())
+    for _ in range(0, sheet.get_size().y):
+        sheet.add_line(reader.read_line())
+
+    return sheet
+
+
+def stream_sheet(reader: LineReader, window: int) -> Iterator[str]:
+    """
+    Рассчитать лист потоково (см. StreamSheet): строка значений возвращается после чтения строки ячеек
+
+    :param reader: Чтение строк
+    :param window: Кол-во строк окна потокового расчета
+    :raise: ValueError, EOFError
+    """
 
-    result = sheet.calculate()
+    sheet = StreamSheet(reader.read_line(), window)
 
-    for y in range(0, sheet.get_size().y):
-        print('\t'.join([str(result[(x + 1, y + 1)]) for x in range(0, sheet.get_size().x)]))
+    for _ in range(0, sheet.get_size().y):
+        sheet.add_line(reader.read_line())
+        yield sheet.format_line()
 
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser(description='Расчет таблицы по типу excel')
+    parser.add_argument('path', nargs='?', help='путь к файлу таблицы (по умолчанию поток ввода)')
+    parser.add_argument('--sparse', action='store_true', help='хранить только заполненные ячейки')
+    parser.add_argument('--stats', action='store_true', help='вывести статистику обработки в stderr')
+    parser.add_argument('--explain', type=int, nargs='?', const=10, metavar='N',
+                        help='вывести анализ зависимостей и N самых дорогих ячеек в stderr')
+    parser.add_argument('--workers', type=int, metavar='N', help='кол-во процессов для параллельного расчета')
+    parser.add_argument('--stream', type=int, metavar='N',
+                        help='потоковый расчет: выражения ссылаются на свою строку и N предшествующих строк')
+    args = parser.parse_args()
+    if args.stream is not None and (args.sparse or args.stats or args.explain is not None or args.workers):
+        parser.error('--stream не совместим с --sparse, --stats, --explain и --workers')
+    run(sparse=args.sparse, stats=args.stats, explain=args.explain, workers=args.workers, path=args.path,
+        stream=args.stream)
@@ -0,0 +1,4 @@
+"""
+Замеры производительности.
+Запуск из каталога src: python -m benchmark.<модуль>
+"""
@@ -0,0 +1,188 @@
+"""
+Генераторы синтетических листов для замеров производительности.
+
+Каждый генератор возвращает строки входных данных листа (как для app.run): первой строкой размер листа,
+далее строки ячеек. Генераторы детерминированы, одинаковые параметры дают одинаковый лист.
+"""
+
+import random
+from typing import Callable, Dict, List
+
+from excel.cell.ref_value import get_column_name
+
+
+def _make_lines(size_y: int, size_x: int, get_cell: Callable[[int, int], str]) -> List[str]:
+    """
+    Сформировать строки листа
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    :param get_cell: Функция получения значения ячейки по координатам (x, y)
+    """
+
+    return [f'{size_y}\t{size_x}'] + ['\t'.join(get_cell(x, y) for x in range(1, size_x + 1))
+                                      for y in range(1, size_y + 1)]
+
+
+def chain(length: int) -> List[str]:
+    """
+    Длинная цепочка ссылок: A1 = 1, A2 = A1+1, ..., каждая ячейка зависит от предыдущей
+
+    :param length: Длина цепочки (кол-во строк)
+    """
+
+    return _make_lines(length, 1, lambda x, y: '1' if y == 1 else f'=A{y - 1}+1')
+
+
+def fan_in(width: int, count: int) -> List[str]:
+    """
+    Широкое слияние: первая строка числа, в каждой следующей строке одно выражение суммирующее всю первую строку
+
+    :param width: Кол-во ссылок выражения (размер по горизонтали)
+    :param count: Кол-во выражений
+    """
+
+    exp = '=' + '+'.join(f'{get_column_name(x)}1' for x in range(1, width + 1))
+
+    def get_cell(x: int, y: int) -> str:
+        if y == 1:
+            return str(x)
+        return exp if x == 1 else ''
+
+    return _make_lines(count + 1, width, get_cell)
+
+
+def fan_out(size_y: int, size_x: int) -> List[str]:
+    """
+    Широкое ветвление: все ячейки листа зависят от одной ячейки A1
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    """
+
+    return _make_lines(size_y, size_x, lambda x, y: '1' if x == y == 1 else f'=A1+{x}')
+
+
+def cycles(count: int, length: int) -> List[str]:
+    """
+    Множество циклов: каждая строка цикл ссылок A = B, B = C, ..., последняя ячейка ссылается на первую
+
+    :param count: Кол-во циклов (строк)
+    :param length: Длина цикла (размер по горизонтали)
+    """
+
+    def get_cell(x: int, y: int) -> str:
+        return f'={get_column_name(x % length + 1)}{y}+1'
+
+    return _make_lines(count, length, get_cell)
+
+
+def text_heavy(size_y: int, size_x: int) -> List[str]:
+    """
+    Преимущественно текстовый лист: текст, каждая десятая ячейка ссылка на текст соседней ячейки
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    """
+
+    def get_cell(x: int, y: int) -> str:
+        if x > 1 and x % 10 == 0:
+            return f'={get_column_name(x - 1)}{y}'
+        return f"'Text {x * y % 1000}"
+
+    return _make_lines(size_y, size_x, get_cell)
+
+
+def mostly_empty(size_y: int, size_x: int, fill: float = 0.05, seed: int = 1) -> List[str]:
+    """
+    Преимущественно пустой лист: заполненные ячейки (числа и выражения со ссылками на строку выше) в случайных местах
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    :param fill: Доля заполненных ячеек
+    :param seed: Начальное значение генератора случайных чисел
+    """
+
+    rnd = random.Random(seed)
+
+    def get_cell(x: int, y: int) -> str:
+        value = rnd.random()
+        if value >= fill:
+            return ''
+        if y == 1 or value < fill / 2:
+            return str(x + y)
+        return f'={get_column_name(x)}{y - 1}+{get_column_name(rnd.randint(1, size_x))}{y - 1}'
+
+    return _make_lines(size_y, size_x, get_cell)
+
+
+def conditions(size_y: int, size_x: int) -> List[str]:
+    """
+    Условные функции: первый столбец числа, в остальных столбцах выбор между ссылкой на соседнюю ячейку
+    и функцией диапазона столбца (выбирается в зависимости от числа строки)
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    """
+
+    def get_cell(x: int, y: int) -> str:
+        if x == 1:
+            return str(y % 7)
+        column = get_column_name(x - 1)
+        return f'=IF(A{y}>2, {column}{y}+1, SUM({column}1:{column}{y}))'
+
+    return _make_lines(size_y, size_x, get_cell)
+
+
+def fill_down(size_y: int, size_x: int) -> List[str]:
+    """
+    Заполнение вниз: первый столбец числа, в остальных столбцах выражение, повторяющееся со сдвигом строки
+    (ссылки на соседнюю ячейку слева и на ячейку выше)
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    """
+
+    def get_cell(x: int, y: int) -> str:
+        if x == 1:
+            return str(y % 10)
+        if y == 1:
+            return f'={get_column_name(x - 1)}1*2'
+        return f'={get_column_name(x - 1)}{y}*2+{get_column_name(x)}{y - 1}'
+
+    return _make_lines(size_y, size_x, get_cell)
+
+
+def duplicates(size_y: int, size_x: int, count: int = 100) -> List[str]:
+    """
+    Одинаковые выражения: первый столбец числа, в остальных столбцах одно из нескольких выражений
+    с функцией диапазона первого столбца (текст выражения повторяется в разных ячейках без сдвига)
+
+    :param size_y: Размер по вертикали
+    :param size_x: Размер по горизонтали
+    :param count: Кол-во различных выражений
+    """
+
+    def get_cell(x: int, y: int) -> str:
+        if x == 1:
+            return str(y % 10)
+        k = (x * size_y + y) % count + 1
+        return f'=SUM(A1:A{size_y})*{k}-A{k}/2'
+
+    return _make_lines(size_y, size_x, get_cell)
+
+
+GENERATOR_LIST: Dict[str, Callable[..., List[str]]] = {
+    'chain': chain,
+    'fan_in': fan_in,
+    'fan_out': fan_out,
+    'cycles': cycles,
+    'text_heavy': text_heavy,
+    'mostly_empty': mostly_empty,
+    'conditions': conditions,
+    'fill_down': fill_down,
+    'duplicates': duplicates,
+}
+"""
+Генераторы по имени
+"""
@@ -0,0 +1,69 @@
+"""
+Замер производительности вычисления длинных выражений вида =A1+2+B3+...
+
+Для каждого кол-ва операндов замеряется время разбора, компиляции и вычисления выражения
+(длинное выражение вычисляется сверткой, см. _compile_exp_fold).
+Время в пересчете на один операнд не должно расти с ростом длины выражения (линейная сложность).
+
+Пример запуска:
+python -m benchmark.long_expression 1000 10000 100000
+"""
+
+import sys
+import time
+from typing import Dict, List
+
+from excel.cell.expression_value import ExpressionValue
+from excel.storage import CellStorage
+
+
+def measure(operand_count: int) -> Dict[str, float]:
+    """
+    Замерить время обработки выражения
+
+    :param operand_count: Кол-во операндов выражения
+    :return: Время каждого этапа в секундах
+    """
+
+    text = '=' + '+'.join(['A1', '2', 'B3'][i % 3] for i in range(operand_count))
+
+    # Значения ссылок A1 и B3 (индексы 0 и 1 в хранилище)
+    storage = CellStorage()
+    storage.extend(2)
+    storage.set_value(0, 1)
+    storage.set_value(1, 3)
+    ref_key = {(1, 1): 0, (2, 3): 1}
+
+    start = time.perf_counter()
+    exp = ExpressionValue(text)
+    parse_time = time.perf_counter()
+
+    calc_func = exp.compile(ref_key.get)
+    compile_time = time.perf_counter()
+
+    calc_func(storage)
+    calc_time = time.perf_counter()
+
+    return {'parse': parse_time - start,
+            'compile': compile_time - parse_time,
+            'calc': calc_time - compile_time}
+
+
+def run(operand_count_list: List[int]):
+    """
+    Выполнить замеры и вывести результат (время на один операнд в наносекундах)
+
+    :param operand_count_list: Список кол-ва операндов выражения
+    """
+
+    phase_list = ['parse', 'compile', 'calc']
+    print('\t'.join(['operands'] + [f'{phase}, ns/op' for phase in phase_list]))
+
+    for operand_count in operand_count_list:
+        result = measure(operand_count)
+        print('\t'.join([str(operand_count)] +
+                        [f'{result[phase] / operand_count * 1e9:.0f}' for phase in phase_list]))
+
+
+if __name__ == '__main__':
+    run([int(v) for v in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,194 @@
+"""
+Набор замеров производительности листа на синтетических данных (см. benchmark.generators).
+
+Для каждого сценария замеряются время и пиковая память этапов:
+    * parse - разбор значений ячеек (CellValue.parser),
+    * add_line - создание листа и добавление строк (Sheet.add_line),
+    * calculate - расчет значений (Sheet.calculate),
+    * output - строковое представление результата (SheetValues.format_lines).
+Время замеряется отдельным проходом без отслеживания памяти (tracemalloc замедляет выполнение).
+Результат сохраняется в JSON для сравнения замеров между версиями (параметр --compare).
+
+Пример запуска:
+python -m benchmark.suite --output result.json
+python -m benchmark.suite --scale 0.1 --case chain --case cycles --compare result.json
+"""
+
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmark.generators import GENERATOR_LIST
+from excel.cell.cell import CellValue
+from excel.sheet import Sheet, SheetSize
+
+CASE_LIST: Dict[str, Dict[str, Any]] = {
+    'chain': {'generator': 'chain', 'params': {'length': 100000}},
+    'fan_in': {'generator': 'fan_in', 'params': {'width': 10000, 'count': 10}},
+    'fan_out': {'generator': 'fan_out', 'params': {'size_y': 1000, 'size_x': 100}},
+    'cycles': {'generator': 'cycles', 'params': {'count': 1000, 'length': 100}},
+    'text_heavy': {'generator': 'text_heavy', 'params': {'size_y': 1000, 'size_x': 100}},
+    'mostly_empty': {'generator': 'mostly_empty', 'params': {'size_y': 2000, 'size_x': 500}},
+    'mostly_empty_sparse': {'generator': 'mostly_empty', 'params': {'size_y': 2000, 'size_x': 500}, 'sparse': True},
+    'conditions': {'generator': 'conditions', 'params': {'size_y': 10000, 'size_x': 10}},
+    'fill_down': {'generator': 'fill_down', 'params': {'size_y': 20000, 'size_x': 10}},
+    'duplicates': {'generator': 'duplicates', 'params': {'size_y': 10000, 'size_x': 10, 'count': 100}},
+}
+"""
+Сценарии замеров: генератор, его параметры (размеры при масштабе 1) и режим листа
+"""
+
+PHASE_LIST = ['parse', 'add_line', 'calculate', 'output']
+"""
+Этапы замера
+"""
+
+
+def _run_phases(lines: List[str], sparse: bool, on_phase: Callable[[str], None]):
+    """
+    Выполнить этапы обработки листа
+
+    :param lines: Строки листа (см. benchmark.generators)
+    :param sparse: Разреженный лист
+    :param on_phase: Вызывается по окончании каждого этапа с его именем
+    """
+
+    for line in lines[1:]:
+        for value in line.split('\t'):
+            CellValue.parser(value)
+    on_phase('parse')
+
+    sheet = Sheet(lines[0], sparse=sparse)
+    for line in lines[1:]:
+        sheet.add_line(line)
+    on_phase('add_line')
+
+    result = sheet.calculate()
+    on_phase('calculate')
+
+    for _ in result.format_lines():
+        pass
+    on_phase('output')
+
+
+def measure(lines: List[str], sparse: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    Замерить время и пиковую память этапов обработки листа
+
+    :param lines: Строки листа (см. benchmark.generators)
+    :param sparse: Разреженный лист
+    :return: Для каждого этапа время в секундах (time) и пиковая память в байтах (peak_memory)
+    """
+
+    result = {phase: {} for phase in PHASE_LIST}
+
+    # Время
+    start = time.perf_counter()
+
+    def on_time_phase(phase: str):
+        nonlocal start
+        end = time.perf_counter()
+        result[phase]['time'] = end - start
+        start = end
+
+    _run_phases(lines, sparse, on_time_phase)
+
+    # Пиковая память этапа (с учетом данных, сохраненных с предыдущих этапов)
+    def on_memory_phase(phase: str):
+        result[phase]['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    try:
+        _run_phases(lines, sparse, on_memory_phase)
+    finally:
+        tracemalloc.stop()
+
+    return result
+
+
+def run(case_name_list: List[str], scale: float = 1.0) -> Dict[str, Any]:
+    """
+    Выполнить замеры сценариев
+
+    :param case_name_list: Имена сценариев (см. CASE_LIST)
+    :param scale: Масштаб размеров листа
+    :return: Результат замеров (для сохранения в JSON)
+    """
+
+    result = {'python': platform.python_version(), 'scale': scale, 'cases': {}}
+
+    for case_name in case_name_list:
+        case = CASE_LIST[case_name]
+        params = {key: max(1, int(value * scale)) for key, value in case['params'].items()}
+        lines = GENERATOR_LIST[case['generator']](**params)
+        size = SheetSize.parser(lines[0])
+
+        result['cases'][case_name] = {'params': params,
+                                      'sparse': case.get('sparse', False),
+                                      'cells': size.y * size.x,
+                                      'phases': measure(lines, case.get('sparse', False))}
+
+    return result
+
+
+def format_result(result: Dict[str, Any], base_result: Dict[str, Any] = None) -> str:
+    """
+    Получить табличное представление результата замеров
+
+    :param result: Результат замеров (см. run)
+    :param base_result: Результат предыдущих замеров для сравнения (отношение времени текущего замера к предыдущему)
+    """
+
+    line_list = ['\t'.join(['case', 'cells'] + [f'{phase}, s\t{phase}, MB' for phase in PHASE_LIST] +
+                           (['time ratio'] if base_result else []))]
+
+    for case_name, case in result['cases'].items():
+        line = [case_name, str(case['cells'])]
+        for phase in PHASE_LIST:
+            line.append(f'{case["phases"][phase]["time"]:.3f}')
+            line.append(f'{case["phases"][phase]["peak_memory"] / 1e6:.1f}')
+
+        base_case = (base_result or {}).get('cases', {}).get(case_name)
+        if base_case:
+            base_time = sum(phase['time'] for phase in base_case['phases'].values())
+            line.append(f'{sum(phase["time"] for phase in case["phases"].values()) / base_time:.2f}')
+
+        line_list.append('\t'.join(line))
+
+    return '\n'.join(line_list)
+
+
+def main(argv: List[str] = None):
+    """
+    Запустить замеры из командной строки
+
+    :param argv: Параметры командной строки
+    """
+
+    parser = argparse.ArgumentParser(description='Замеры производительности листа')
+    parser.add_argument('--case', action='append', choices=list(CASE_LIST), help='сценарий (по умолчанию все)')
+    parser.add_argument('--scale', type=float, default=1.0, help='масштаб размеров листа')
+    parser.add_argument('--output', help='файл для сохранения результата (JSON)')
+    parser.add_argument('--compare', help='файл с результатом предыдущих замеров (JSON)')
+    args = parser.parse_args(argv)
+
+    result = run(args.case or list(CASE_LIST), args.scale)
+
+    base_result = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            base_result = json.load(file)
+
+    print(format_result(result, base_result))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
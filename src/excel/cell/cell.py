@@ -11,6 +11,8 @@ class CellValue(ABC):
     Значение ячейки
     """
 
+    __slots__ = ('_value',)
+
     def __init__(self):
         """
         """
@@ -33,15 +35,6 @@ class CellValue(ABC):
         :raise: ValueError
         """
 
-        from excel.cell.empty_value import EmptyValue
-        from excel.cell.number_value import NumberValue
-        from excel.cell.text_value import TextValue
-        from excel.cell.expression_value import ExpressionValue
-
-        for value_class in [EmptyValue, NumberValue, TextValue, ExpressionValue]:
-            try:
-                return value_class(value)
-            except ValueError:
-                pass
+        from excel.cell.lexer import parse_cell
 
-        raise ValueError(f'Значение "{value}" не соответствует ни одному типу!')
+        return parse_cell(value)
@@ -0,0 +1,100 @@
+"""
+Тип ячейки 'Условная функция'
+"""
+
+import re
+from typing import List, Tuple
+
+from excel.cell.cell import CellValue
+from excel.cell.function_value import FunctionValue
+from excel.cell.ref_value import RefValue
+
+
+class ConditionValue(CellValue):
+    """
+    Условная функция, например IF(A1>0, B1*2, C1). Имя функции не зависит от регистра.
+
+        * IF(условие, значение, [иначе]) Значение, если условие не равно 0, иначе второе значение (по умолчанию 0),
+        * CHOOSE(номер, значение1, значение2, ...) Значение с заданным номером (1..).
+
+    Аргументы разделяются запятой и являются выражениями без условных функций (числа, ссылки, функции диапазонов,
+    арифметические операторы и операторы сравнения). Вычисляется только выбранное значение: ошибки вычисления
+    и ссылки остальных значений на результат не влияют.
+    """
+
+    __slots__ = ()
+
+    IF = 'IF'
+    CHOOSE = 'CHOOSE'
+
+    All = [IF, CHOOSE]
+    """
+    Список всех функций
+    """
+
+    _pattern = re.compile(r'([A-Za-z]+)\(\s*([^()]*(?:\([^()]*\)[^()]*)*?)\s*\)')
+
+    def __init__(self, value: str):
+        """
+        :param value: Строка задающая значение
+        :raise: ValueError
+        """
+
+        from excel.cell.expression_value import ExpressionValue
+
+        super().__init__()
+
+        match = self._pattern.fullmatch(value) if isinstance(value, str) else None
+        if not match:
+            raise ValueError(f'Значение "{value}" не является условной функцией!')
+
+        name = match.group(1).upper()
+        arg_list = [ExpressionValue('=' + arg).get_value() for arg in match.group(2).split(',')]
+        if not (self.is_valid(name, len(arg_list))
+                and all(arg and not any(item.__class__ is ConditionValue for item in arg) for arg in arg_list)):
+            raise ValueError(f'Значение "{value}" не является условной функцией!')
+
+        self._value: Tuple[str, List[List]] = (name, arg_list)
+
+    @classmethod
+    def from_args(cls, name: str, arg_list: List[List]) -> 'ConditionValue':
+        """
+        Создать функцию по уже разобранным имени и аргументам (без повторной проверки строки)
+
+        :param name: Имя функции (см. All)
+        :param arg_list: Аргументы, каждый аргумент список элементов выражения (см. ExpressionValue.get_value)
+        """
+
+        condition = cls.__new__(cls)
+        condition._value = (name, arg_list)
+        return condition
+
+    @classmethod
+    def is_valid(cls, name: str, arg_count: int) -> bool:
+        """
+        Проверить имя функции и кол-во аргументов
+
+        :param name: Имя функции (в верхнем регистре)
+        :param arg_count: Кол-во аргументов
+        """
+
+        if name == cls.IF:
+            return 2 <= arg_count <= 3
+
+        return name == cls.CHOOSE and arg_count >= 2
+
+    def get_value(self) -> Tuple[str, List[List]]:
+        """
+        Получить значение: имя функции и аргументы (списки элементов выражения)
+        """
+
+        return self._value
+
+    def get_ref_list(self) -> List[Tuple]:
+        """
+        Получить ссылки и диапазоны функций всех аргументов в порядке следования
+        (см. RefValue.get_ref_key, RangeValue.get_ref_key)
+        """
+
+        return [item.get_ref_key() for arg in self._value[1] for item in arg
+                if item.__class__ is RefValue or item.__class__ is FunctionValue]
@@ -0,0 +1,398 @@
+"""
+Общие выражения.
+Выражения, отличающиеся только сдвигом всех ссылок на одно и то же смещение (заполнение столбца вниз,
+либо строки вправо, например =A1*B1, =A2*B2, ...), разбираются один раз.
+Одинаковые выражения разных ячеек разбираются, компилируются и вычисляются один раз.
+"""
+
+import re
+from array import array
+from itertools import chain
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from excel.cell.expression_value import ExpressionValue, _COMPILE_MAX_OPERAND_COUNT, _CalcExpError, _get_spec, \
+    compile_keys_spec, compile_spec, get_calc_spec
+from excel.cell.expression_vector import calc_keys_vector
+from excel.cell.number_value import NumberValue
+from excel.cell.ref_value import RefValue, get_column_name, get_column_number
+from excel.storage import CellStorage
+
+_ref_pattern = re.compile(r'([A-Za-z]+)([0-9]+)')
+"""
+Ссылка (угол диапазона) в тексте выражения: имена функций не содержат цифр, числа не содержат букв
+"""
+
+_SHARED_MAX_COUNT = 2 ** 14
+"""
+Максимальное кол-во текстов выражений, по которым ищутся одинаковые выражения (см. SharedCalcFunc)
+"""
+
+_TEMPLATE_MAX_SKIP_COUNT = 64
+"""
+Максимальное кол-во ячеек столбца, разбираемых без общих выражений после общего выражения без совпадений
+"""
+
+
+class ExpressionTemplate:
+    """
+    Общее выражение.
+
+    Хранит разобранное выражение первой ячейки (см. ExpressionValue) и текст выражения, в котором координаты
+    ссылок заменены местами подстановки. Выражение другой ячейки совпадает с общим, если его текст равен тексту
+    общего выражения со сдвигом всех ссылок на смещение ячейки (проверяется сравнением строк без разбора),
+    ссылки ячейки получаются сдвигом ссылок общего выражения.
+
+    Ячейки общего выражения из чисел и ссылок (см. add_key) вычисляются одним циклом (см. calc):
+    индексы ссылок таких ячеек отличаются от индекса ячейки на одни и те же смещения.
+    """
+
+    def __init__(self, value: str, expression: ExpressionValue, x: int, y: int):
+        """
+        :param value: Строка выражения (без ссылок на другие листы, см. from_expression)
+        :param expression: Разобранное выражение
+        :param x: Номер столбца ячейки выражения (1..)
+        :param y: Номер строки ячейки выражения (1..)
+        """
+
+        self._expression: ExpressionValue = expression
+        self._x: int = x
+        self._y: int = y
+
+        # Текст выражения с местами подстановки номеров строк ссылок (буквы столбцов сохраняются как есть),
+        # текст для сдвига по столбцам формируется при первом обращении (см. match)
+        self._value: str = value
+        self._row_format: str = _ref_pattern.sub(r'\1{}', value)
+        self._row_list: List[int] = [int(digits) for _, digits in _ref_pattern.findall(value)]
+        self._min_y: int = min(self._row_list, default=1)
+        self._format: Optional[str] = None
+        self._column_list: List[int] = []
+        self._min_x: int = 1
+
+        self._ref_list: List[Tuple] = expression.get_ref_list()
+        self._match_count: int = 0
+
+        # Ячейки, вычисляемые одним циклом, и функция расчета цикла (создается при добавлении первой ячейки)
+        item_list = expression.get_value()
+        self._loop: bool = all(
+            item.__class__ is RefValue or item.__class__ is NumberValue or item.__class__ is str for item in item_list)
+        self._key_list: array = array('q')
+        self._first_key: Optional[int] = None
+        self._calc_keys: Optional[Callable[[CellStorage, array], List[int]]] = None
+
+        # Вид выражения и значения операндов (смещения индексов ссылок относительно индекса ячейки)
+        self._shape: str = ''
+        self._param_list: Tuple = ()
+
+    @classmethod
+    def from_expression(cls, value: str, expression: ExpressionValue, x: int, y: int) -> Optional['ExpressionTemplate']:
+        """
+        Создать общее выражение по выражению ячейки
+
+        :param value: Строка выражения
+        :param expression: Разобранное выражение
+        :param x: Номер столбца ячейки выражения (1..)
+        :param y: Номер строки ячейки выражения (1..)
+        :return: Общее выражение, либо None для выражения со ссылками на другие листы и для длинного выражения
+        """
+
+        if '!' in value or len(expression.get_value()) > 2 * _COMPILE_MAX_OPERAND_COUNT:
+            return None
+
+        return cls(value, expression, x, y)
+
+    def match(self, value: str, x: int, y: int) -> bool:
+        """
+        Совпадает ли выражение ячейки с общим выражением, сдвинутым на смещение ячейки
+
+        :param value: Строка выражения
+        :param x: Номер столбца ячейки (1..)
+        :param y: Номер строки ячейки (1..)
+        """
+
+        dx = x - self._x
+        dy = y - self._y
+        if self._min_y + dy < 1:
+            return False
+
+        if not dx:
+            if value != self._row_format.format(*[row + dy for row in self._row_list]):
+                return False
+            self._match_count += 1
+            return True
+
+        if self._format is None:
+            self._format = _ref_pattern.sub('{}{}', self._value)
+            self._column_list = [get_column_number(letters) for letters, _ in _ref_pattern.findall(self._value)]
+            self._min_x = min(self._column_list, default=1)
+
+        if self._min_x + dx < 1:
+            return False
+
+        coord_list = []
+        for column, row in zip(self._column_list, self._row_list):
+            coord_list += (get_column_name(column + dx), row + dy)
+        if value != self._format.format(*coord_list):
+            return False
+        self._match_count += 1
+        return True
+
+    def get_match_count(self) -> int:
+        """
+        Получить кол-во совпавших с общим выражением ячеек (без первой ячейки)
+        """
+
+        return self._match_count
+
+    def get_expression(self) -> ExpressionValue:
+        """
+        Получить разобранное выражение первой ячейки
+        """
+
+        return self._expression
+
+    def get_ref_list(self, x: int, y: int) -> Dict[Tuple, Tuple]:
+        """
+        Получить ссылки выражения ячейки (см. ExpressionValue.get_ref_list)
+
+        :param x: Номер столбца ячейки (1..)
+        :param y: Номер строки ячейки (1..)
+        :return: Ключи ссылок ячейки по ключам ссылок общего выражения
+        """
+
+        dx = x - self._x
+        dy = y - self._y
+        if not (dx or dy):
+            return {ref: ref for ref in self._ref_list}
+
+        return {ref: (ref[0] + dx, ref[1] + dy) if len(ref) == 2
+                else (ref[0] + dx, ref[1] + dy, ref[2] + dx, ref[3] + dy) for ref in self._ref_list}
+
+    def add_key(self, index: int, ref_index_list: Dict[Tuple, Any]) -> List[int]:
+        """
+        Добавить ячейку в цикл расчета (только для выражения из чисел и корректных ссылок на ячейки листа).
+        Первая ячейка добавляется вместе со второй, выражение одной ячейки вычисляется отдельно.
+
+        :param index: Индекс ячейки
+        :param ref_index_list: Индексы ссылок ячейки по ключам ссылок общего выражения
+        :return: Добавленные ячейки
+        """
+
+        if not self._loop or None in ref_index_list.values():
+            return []
+
+        if self._first_key is None and not self._key_list:
+            self._first_key = index
+            return []
+
+        if self._calc_keys is None:
+            self._shape, self._param_list = _get_spec(self._expression.get_value(),
+                                                      lambda ref: ref_index_list[ref] - index)
+            self._calc_keys = compile_keys_spec(self._shape, self._param_list)
+
+        key_list = [index] if self._first_key is None else [self._first_key, index]
+        self._first_key = None
+        self._key_list.extend(key_list)
+        return key_list
+
+    def compile(self, index: int) -> Callable[[CellStorage], Union[int, str]]:
+        """
+        Скомпилировать выражение ячейки цикла расчета в функцию расчета (см. ExpressionValue.compile)
+
+        :param index: Индекс ячейки
+        """
+
+        return compile_spec(self._shape, tuple(index + param if operand == 'R' else param
+                                               for operand, param in zip(self._shape[0::2], self._param_list)))
+
+    def get_keys(self) -> array:
+        """
+        Получить индексы ячеек цикла расчета в порядке добавления
+        """
+
+        return self._key_list
+
+    def calc(self, storage: CellStorage) -> List[int]:
+        """
+        Вычислить ячейки цикла расчета в порядке добавления и записать результат в хранилище.
+        Уже вычисленные ячейки и ячейки, ссылающиеся на не вычисленные выражения, пропускаются.
+        При наличии NumPy ячейки сначала вычисляются векторно (см. calc_keys_vector), цикл вычисляет остальные.
+
+        :param storage: Хранилище значений ячеек
+        :return: Индексы вычисленных ячеек
+        """
+
+        if self._calc_keys is None:
+            return []
+
+        calculated_list = calc_keys_vector(storage, self._shape, self._param_list, self._key_list)
+        return calculated_list + self._calc_keys(storage, self._key_list)
+
+    def clear_keys(self):
+        """
+        Очистить цикл расчета (ячейки продолжают использовать общее выражение, см. CalcFuncList)
+        """
+
+        self._key_list = array('q')
+
+
+class CalcFuncList(dict):
+    """
+    Функции расчета выражений по индексу ячейки.
+
+    Функции ячеек цикла расчета общих выражений (см. ExpressionTemplate.add_key) не хранятся,
+    а компилируются при обращении, для ячейки хранится только общее выражение.
+    Перебор, проверка наличия и получение функции учитывают такие ячейки.
+    """
+
+    def __init__(self):
+        """
+        """
+
+        super().__init__()
+        self._template_list: Dict[int, ExpressionTemplate] = {}
+
+    def __missing__(self, index: int) -> Callable:
+        template = self._template_list.get(index)
+        if template is None:
+            raise KeyError(index)
+
+        return template.compile(index)
+
+    def __contains__(self, index: int) -> bool:
+        return dict.__contains__(self, index) or index in self._template_list
+
+    def __iter__(self) -> Iterator[int]:
+        return chain(dict.__iter__(self), self._template_list)
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + len(self._template_list)
+
+    def keys(self) -> Iterator[int]:
+        return iter(self)
+
+    def values(self) -> Iterator[Callable]:
+        return (self[index] for index in self)
+
+    def items(self) -> Iterator[Tuple[int, Callable]]:
+        return ((index, self[index]) for index in self)
+
+    def get(self, index: int, default: Callable = None) -> Optional[Callable]:
+        return self[index] if index in self else default
+
+    def __setitem__(self, index: int, calc_func: Callable):
+        if self._template_list:
+            self._template_list.pop(index, None)
+        dict.__setitem__(self, index, calc_func)
+
+    def pop(self, index: int, *default) -> Optional[Callable]:
+        """
+        Удалить функцию расчета ячейки
+
+        :param index: Индекс ячейки
+        :param default: Значение при отсутствии функции
+        :return: Функция расчета
+        """
+
+        template = self._template_list.pop(index, None)
+        if template is not None:
+            return template.compile(index)
+
+        return dict.pop(self, index, *default)
+
+    def set_template(self, index: int, template: ExpressionTemplate):
+        """
+        Задать общее выражение ячейки цикла расчета (функция расчета компилируется при обращении)
+
+        :param index: Индекс ячейки
+        :param template: Общее выражение
+        """
+
+        dict.pop(self, index, None)
+        self._template_list[index] = template
+
+
+class SharedCalcFunc:
+    """
+    Функция расчета выражения, общая для ячеек с одинаковым текстом выражения (ссылки таких ячеек совпадают).
+
+    Создается для первой ячейки с выражением (см. Sheet.add_line), функция расчета первой ячейки используется
+    остальными ячейками без разбора и компиляции выражения. При расчете (см. calc) выражение вычисляется один раз,
+    значение (в том числе ошибка вычисления) копируется остальным ячейкам.
+    """
+
+    __slots__ = ('_key', '_ref_count', '_not_valid_ref_count', '_calc_func')
+
+    def __init__(self, key: int, ref_count: int, not_valid_ref_count: int):
+        """
+        :param key: Индекс первой ячейки с выражением
+        :param ref_count: Кол-во ссылок выражения (для статистики)
+        :param not_valid_ref_count: Кол-во не корректных ссылок выражения (для статистики)
+        """
+
+        self._key: int = key
+        self._ref_count: int = ref_count
+        self._not_valid_ref_count: int = not_valid_ref_count
+        self._calc_func: Optional[Callable[[CellStorage], Union[int, str]]] = None
+
+    def __call__(self, storage: CellStorage) -> Union[int, str]:
+        return self._calc_func(storage)
+
+    @property
+    def spec(self) -> Tuple[str, Tuple]:
+        """
+        Вид выражения и значения операндов (см. get_calc_spec)
+        """
+
+        return get_calc_spec(self._calc_func)
+
+    def get_key(self) -> int:
+        """
+        Получить индекс первой ячейки с выражением
+        """
+
+        return self._key
+
+    def get_ref_count(self) -> Tuple[int, int]:
+        """
+        Получить кол-во ссылок и не корректных ссылок выражения
+        """
+
+        return self._ref_count, self._not_valid_ref_count
+
+    def is_bound(self) -> bool:
+        """
+        Задана ли функция расчета (выражение используется несколькими ячейками)
+        """
+
+        return self._calc_func is not None
+
+    def bind(self, calc_func: Callable[[CellStorage], Union[int, str]]):
+        """
+        Задать функцию расчета первой ячейки
+
+        :param calc_func: Функция расчета (см. ExpressionValue.compile)
+        """
+
+        self._calc_func = calc_func
+
+    def calc(self, storage: CellStorage, index: int, calculated_list: Dict['SharedCalcFunc', int]) -> Union[int, str]:
+        """
+        Вычислить выражение ячейки, либо получить значение ячейки, уже вычисленной этой функцией в текущем расчете
+        (ссылки ячеек совпадают и в текущем расчете уже вычислены)
+
+        :param storage: Хранилище значений ячеек
+        :param index: Индекс ячейки
+        :param calculated_list: Ячейки, вычисленные общими функциями в текущем расчете
+        :raise: _CalcExpError
+        """
+
+        key = calculated_list.get(self)
+        if key is not None:
+            value_type = storage.type_list[key]
+            if value_type == CellStorage.ERROR:
+                raise _CalcExpError(storage.get_value(key))
+            if value_type != CellStorage.EXPRESSION:
+                return storage.get_value(key)
+
+        calculated_list[self] = index
+        return self._calc_func(storage)
@@ -2,12 +2,62 @@
 Тип ячейки 'Выражение'
 """
 
-from collections import namedtuple
-from typing import Tuple, Any, List, Union
+import re
+from types import CodeType
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
 
+from excel.cell.condition_value import ConditionValue
+from excel.cell.function_value import FunctionValue, aggregate
 from excel.cell.number_value import NumberValue
-from excel.cell.ref_value import RefValue
+from excel.cell.range_value import RangeValue
+from excel.cell.ref_value import RefValue, get_column_number
 from excel.cell.cell import CellValue
+from excel.storage import CellStorage, NotCalculatedError
+
+
+_exp_operand_pattern = rf'(?:[A-Za-z]+\(\s*(?:{RefValue.SHEET_NAME_PATTERN}!)?' \
+                       rf'[A-Za-z]+[0-9]+(?::[A-Za-z]+[0-9]+)?\s*\)' \
+                       rf'|(?:{RefValue.SHEET_NAME_PATTERN}!)?[A-Za-z]+[0-9]+|\d+)'
+"""
+Операнд выражения: функция диапазона, ссылка (в том числе на ячейку другого листа), либо число
+"""
+
+_exp_operator_pattern = r'(?:<=|>=|<>|[-+*/<>=])'
+"""
+Оператор выражения: арифметический оператор, либо оператор сравнения
+"""
+
+_exp_arg_pattern = rf'{_exp_operand_pattern}(?:\s*{_exp_operator_pattern}\s*{_exp_operand_pattern})*'
+"""
+Аргумент условной функции: операнды, разделенные операторами
+"""
+
+_exp_condition_pattern = rf'[A-Za-z]+\(\s*{_exp_arg_pattern}(?:\s*,\s*{_exp_arg_pattern})*\s*\)'
+"""
+Условная функция: аргументы, разделенные запятой
+"""
+
+_exp_pattern = re.compile(rf'=\s*(?:{_exp_condition_pattern}|{_exp_operand_pattern})'
+                          rf'(?:\s*{_exp_operator_pattern}\s*(?:{_exp_condition_pattern}|{_exp_operand_pattern}))*\s*')
+"""
+Выражение целиком: операнды (условная функция, функция диапазона, ссылка, либо число), разделенные операторами
+"""
+
+_exp_token_operand_pattern = rf'([A-Za-z]+)\(\s*(?:({RefValue.SHEET_NAME_PATTERN})!)?' \
+                             rf'([A-Za-z]+)([0-9]+)(?::([A-Za-z]+)([0-9]+))?\s*\)' \
+                             rf'|(?:({RefValue.SHEET_NAME_PATTERN})!)?([A-Za-z]+)([0-9]+)|(\d+)'
+
+_exp_token_pattern = re.compile(rf'(<=|>=|<>|[-+*/<>=]?)\s*(?:({_exp_token_operand_pattern})'
+                                rf'|([A-Za-z]+)\(\s*({_exp_arg_pattern}(?:\s*,\s*{_exp_arg_pattern})*)\s*\))')
+"""
+Элемент выражения: оператор (кроме первого операнда) и операнд (текст операнда и имя функции, имя листа и углы
+диапазона, либо имя листа, буквы и номер строки ссылки, либо число, либо имя и аргументы условной функции)
+"""
+
+_exp_arg_token_pattern = re.compile(rf'(<=|>=|<>|[-+*/<>=]?)\s*({_exp_token_operand_pattern})')
+"""
+Элемент аргумента условной функции (см. _exp_token_pattern без условной функции)
+"""
 
 
 class ExpressionValue(CellValue):
@@ -16,8 +66,11 @@ class ExpressionValue(CellValue):
 
     Начинается с символа =, может содержать:
         * Неотрицательные целые числа,
-        * Ссылки на ячейки (одна латинска буква и следующа за ней цифра),
-        * Простые арифметические выражения (+ - * /).
+        * Ссылки на ячейки (латинские буквы и следующее за ними число, например AB1234),
+          в том числе на ячейки других листов книги (например Sheet2!B3),
+        * Агрегатные функции диапазонов (см. FunctionValue), например SUM(A1:A100),
+        * Условные функции (см. ConditionValue), например IF(A1>0, B1, C1),
+        * Простые арифметические выражения (+ - * /) и операторы сравнения (= <> < > <= >=, результат 1, либо 0).
     Скобки запрещены. Все операции одинаково приоритетны.
     """
 
@@ -29,73 +82,190 @@ class ExpressionValue(CellValue):
 
         super().__init__()
 
-        error_text = f'Значение "{value}" не является выражением!'
+        if not (isinstance(value, str) and (value == '=' or _exp_pattern.fullmatch(value))):
+            raise ValueError(f'Значение "{value}" не является выражением!')
 
-        if not (isinstance(value, str) and len(value) >= 1 and value[0] == '='):
-            raise ValueError(error_text)
+        # Выражение уже проверено целиком, элементы выбираются за один проход без повторного разбора операндов.
+        # Одинаковые операнды берутся из пула разобранных операндов (см. _operand_pool)
+        exp_item_list = []
+        for token in _exp_token_pattern.findall(value, 1):
+            operator, condition = token[0], token[12]
+            if operator:
+                exp_item_list.append(operator)
+
+            if condition:
+                # Аргументы условной функции не содержат условных функций и запятых внутри операндов
+                arg_list = []
+                for arg in token[13].split(','):
+                    arg_item_list = []
+                    for arg_token in _exp_arg_token_pattern.findall(arg):
+                        if arg_token[0]:
+                            arg_item_list.append(arg_token[0])
+                        arg_item_list.append(_get_pooled_operand(value, arg_token))
+                    arg_list.append(arg_item_list)
+
+                if not ConditionValue.is_valid(condition.upper(), len(arg_list)):
+                    raise ValueError(f'Значение "{value}" не является выражением!')
+                exp_item_list.append(ConditionValue.from_args(condition.upper(), arg_list))
+            else:
+                exp_item_list.append(_get_pooled_operand(value, token))
 
-        if value[1:] == '':
-            self._value = []
-            return
+        self._value = exp_item_list
 
-        #
-        # 1. Разбить строку с выражением на массив состоящий из операндов и операторов
-        #
-        expression = value[1:].upper()
-        for o in _Operator.All:
-            expression = expression.replace(o, f' {o} ')
-        exp_str_list = expression.split()
+    def get_ref_list(self) -> List[Union[Tuple[int, int], Tuple[int, int, str]]]:
+        """
+        Получить ссылки выражения (влияющие ячейки и диапазоны функций)
+        :return: Список ключей ссылок (см. RefValue.get_ref_key) и диапазонов (см. RangeValue.get_ref_key)
+            в порядке следования в выражении
+        """
 
-        #
-        # 2. Сформировать список операндов и операций выражений по массиву строкового представления
-        #
-        exp_item_list = []
-        for v in exp_str_list:
+        ref_list = []
+        for item in self.get_value():
+            if item.__class__ is RefValue or item.__class__ is FunctionValue:
+                ref_list.append(item.get_ref_key())
+            elif item.__class__ is ConditionValue:
+                ref_list += item.get_ref_list()
 
-            # Если элементом (выражения) является оператором, то последний элемент выражения должен быть операнд
-            if v in _Operator.All:
-                exp_item_list.append(v)
-            else:
-                operand = None
+        return ref_list
 
-                for value_class in [NumberValue, RefValue]:
-                    try:
-                        operand = value_class(v)
-                        break
-                    except ValueError:
-                        pass
+    def compile(self, get_ref_key: Callable[[Tuple], Any]) -> Callable[[CellStorage], Union[int, str]]:
+        """
+        Скомпилировать выражение в функцию расчета.
 
-                if operand:
-                    exp_item_list.append(operand)
-                else:
-                    raise ValueError(error_text)
+        Функция принимает хранилище значений листа (ссылки выражения должны быть уже вычислены)
+        и возвращает значение выражения, в случае ошибки вычисления генерируется исключение _CalcExpError.
 
-        #
-        # 3. Валидация
-        #
+        :param get_ref_key: Функция получения индекса ячейки в хранилище по ключу ссылки (см. RefValue.get_ref_key),
+            либо ячеек и блоков диапазона по ключу диапазона (см. RangeIndex.get_keys),
+            для не корректной ссылки возвращает None
+        """
 
-        # Кол-во элементов выражения должно быть не четным. Например 1+2+3
-        if len(exp_item_list) % 2 != 1:
-            raise ValueError(error_text)
+        return compile_spec(*_get_spec(self.get_value(), get_ref_key))
 
-        # Операторы в выражении должны быть быть строго в нечетных индексах списка. Например 1+2+3
-        if not all(exp_item_list[i] in _Operator.All for i in range(1, len(exp_item_list), 2)):
-            raise ValueError(error_text)
 
-        # Операнды в выражении должны быть быть строго в четных индексах списка. Например 1+2+3
-        if not all(isinstance(exp_item_list[i], (NumberValue, RefValue)) for i in range(0, len(exp_item_list), 2)):
-            raise ValueError(error_text)
+def _get_spec(exp_item_list: List, get_ref_key: Callable[[Tuple], Any]) -> Tuple[str, Tuple]:
+    """
+    Получить вид выражения и значения операндов (см. compile_spec).
+    Аргументы условной функции компилируются отдельно (см. _Condition), они не содержат условных функций,
+    поэтому вложенность вызовов не превышает двух.
 
-        self._value = exp_item_list
+    :param exp_item_list: Элементы выражения (см. ExpressionValue.get_value)
+    :param get_ref_key: Функция получения индекса ячейки по ключу ссылки (см. ExpressionValue.compile)
+    """
 
-    def calc(self, cell_key: Tuple, sheet_cell_value: Any):
-        """
-        Расчитать выражение
-        :param tuple cell_key: Ключ ячейки
-        :param sheet_cell_value: Значения листа
-        """
+    shape = []
+    param_list = []
+    for exp_item in exp_item_list:
+        if exp_item.__class__ is RefValue:
+            ref_key = get_ref_key(exp_item.get_ref_key())
+            shape.append('R' if ref_key is not None else 'X')
+            param_list.append(ref_key)
+
+        elif exp_item.__class__ is NumberValue:
+            shape.append('N')
+            param_list.append(exp_item.get_value())
+
+        elif exp_item.__class__ is FunctionValue:
+            key_list = get_ref_key(exp_item.get_ref_key())
+            shape.append('A' if key_list is not None else 'X')
+            param_list.append((exp_item.get_value()[0], key_list))
+
+        elif exp_item.__class__ is ConditionValue:
+            name, arg_list = exp_item.get_value()
+            shape.append('C')
+            param_list.append(_Condition(name, tuple(_get_spec(arg, get_ref_key) for arg in arg_list)))
+
+        else:
+            shape.append(_Operator.Shape.get(exp_item, exp_item))
+
+    # Числа в начале выражения сворачиваются в одно число (операторы выполняются слева направо).
+    # Операнд с ошибкой вычисления (например деление на ноль) не сворачивается: ошибка ссылок
+    # следующих операндов имеет приоритет (см. _get_exp_code)
+    count = 0
+    while 2 * count + 2 < len(shape) and shape[0] == 'N' and shape[2 * count + 2] == 'N':
+        try:
+            param_list[0] = _Operator.exec(_Operator.from_shape(shape[2 * count + 1]), param_list[0],
+                                           param_list[count + 1])
+        except _CalcExpError:
+            break
+        count += 1
+
+    if count:
+        del shape[1:2 * count + 1]
+        del param_list[1:count + 1]
+
+    return ''.join(shape), tuple(param_list)
+
+
+_OPERAND_POOL_MAX_COUNT = 2 ** 12
+"""
+Максимальное кол-во операндов в пуле (см. _operand_pool)
+"""
+
+_operand_pool: Dict[str, CellValue] = {}
+"""
+Разобранные операнды выражений (числа, ссылки и функции диапазонов) по тексту операнда.
+Операнды не изменяются после создания, поэтому одинаковые операнды разных выражений используют один объект.
+При заполнении пул очищается (хранятся операнды последних разобранных выражений)
+"""
+
+
+def _get_pooled_operand(value: str, token: Tuple[str, ...]) -> CellValue:
+    """
+    Получить операнд выражения из пула (см. _operand_pool), отсутствующий в пуле операнд разбирается
+    и добавляется в пул
+
+    :param value: Выражение (для текста ошибки)
+    :param token: Элемент выражения: оператор, текст операнда и группы операнда (см. _get_operand)
+    :raise: ValueError
+    """
 
-        _calc_exp_with_ref(cell_key, self.get_value(), sheet_cell_value)
+    operand = _operand_pool.get(token[1])
+    if operand is None:
+        operand = _get_operand(value, *token[2:12])
+        if len(_operand_pool) >= _OPERAND_POOL_MAX_COUNT:
+            _operand_pool.clear()
+        _operand_pool[token[1]] = operand
+
+    return operand
+
+
+def _get_operand(value: str, function: str, range_sheet: str, letters_1: str, digits_1: str, letters_2: str,
+                 digits_2: str, ref_sheet: str, ref_letters: str, ref_digits: str, number: str) -> CellValue:
+    """
+    Получить операнд выражения по элементу выражения (см. _exp_token_pattern)
+
+    :param value: Выражение (для текста ошибки)
+    :param function: Имя функции диапазона
+    :param range_sheet: Имя листа диапазона
+    :param letters_1: Буквы первого угла диапазона
+    :param digits_1: Номер строки первого угла диапазона
+    :param letters_2: Буквы второго угла диапазона
+    :param digits_2: Номер строки второго угла диапазона
+    :param ref_sheet: Имя листа ссылки
+    :param ref_letters: Буквы ссылки
+    :param ref_digits: Номер строки ссылки
+    :param number: Число
+    :raise: ValueError
+    """
+
+    if function:
+        if not letters_2:
+            letters_2, digits_2 = letters_1, digits_1
+        y1, y2 = int(digits_1), int(digits_2)
+        if not (function.upper() in FunctionValue.All and y1 > 0 and y2 > 0):
+            raise ValueError(f'Значение "{value}" не является выражением!')
+        range_value = RangeValue.from_key(get_column_number(letters_1), y1, get_column_number(letters_2), y2,
+                                          range_sheet or None)
+        return FunctionValue.from_range(function.upper(), range_value)
+
+    if ref_letters:
+        y = int(ref_digits)
+        if y <= 0:
+            raise ValueError(f'Значение "{value}" не является выражением!')
+        return RefValue.from_key(get_column_number(ref_letters), y, ref_sheet or None)
+
+    return NumberValue.from_int(int(number))
 
 
 class _Operator:
@@ -123,11 +293,77 @@ class _Operator:
     Поделить
     """
 
-    All = [Plus, Minus, Multiply, Divide]
+    Equal = '='
+    """
+    Равно (результат сравнения 1, либо 0)
+    """
+
+    NotEqual = '<>'
+    """
+    Не равно
+    """
+
+    Less = '<'
+    """
+    Меньше
+    """
+
+    Greater = '>'
+    """
+    Больше
+    """
+
+    LessEqual = '<='
+    """
+    Меньше или равно
+    """
+
+    GreaterEqual = '>='
+    """
+    Больше или равно
+    """
+
+    All = [Plus, Minus, Multiply, Divide, Equal, NotEqual, Less, Greater, LessEqual, GreaterEqual]
     """
     Список всех операторов
     """
 
+    Compare = {Equal: '==', NotEqual: '!=', Less: '<', Greater: '>', LessEqual: '<=', GreaterEqual: '>='}
+    """
+    Операторы сравнения и соответствующие им операторы Python
+    """
+
+    Shape = {NotEqual: '!', LessEqual: '{', GreaterEqual: '}'}
+    """
+    Обозначение операторов из двух символов одним символом в виде выражения (см. _compile_exp_factory)
+    """
+
+    _func = {
+        Plus: lambda a, b: a + b,
+        Minus: lambda a, b: a - b,
+        Multiply: lambda a, b: a * b,
+        Equal: lambda a, b: 1 if a == b else 0,
+        NotEqual: lambda a, b: 1 if a != b else 0,
+        Less: lambda a, b: 1 if a < b else 0,
+        Greater: lambda a, b: 1 if a > b else 0,
+        LessEqual: lambda a, b: 1 if a <= b else 0,
+        GreaterEqual: lambda a, b: 1 if a >= b else 0
+    }
+
+    @classmethod
+    def from_shape(cls, code: str) -> str:
+        """
+        Получить оператор по его обозначению в виде выражения (см. Shape)
+
+        :param code: Обозначение оператора
+        """
+
+        for operator, operator_code in cls.Shape.items():
+            if operator_code == code:
+                return operator
+
+        return code
+
     @classmethod
     def exec(cls, operator: str, left_value: int, right_value: int) -> int:
         """
@@ -145,14 +381,10 @@ class _Operator:
         if not (operator in cls.All and isinstance(left_value, int) and isinstance(right_value, int)):
             raise _CalcExpError.calc_exp()
 
-        func = {
-            cls.Plus: lambda a, b: a + b,
-            cls.Minus: lambda a, b: a - b,
-            cls.Multiply: lambda a, b: a * b,
-            cls.Divide: lambda a, b: a / b
-        }
+        if operator == cls.Divide:
+            return _divide(left_value, right_value)
 
-        return int(func[operator](left_value, right_value))
+        return cls._func[operator](left_value, right_value)
 
 
 class _CalcExpError(RuntimeError):
@@ -182,119 +414,451 @@ class _CalcExpError(RuntimeError):
         return _CalcExpError('#RefNotValid')
 
 
-def _calc_exp_wo_ref(exp: List[str]) -> Union[int, str, None]:
+def _calc_function(storage: CellStorage, param: Tuple[str, Tuple[int, ...]]) -> int:
     """
-    Вычислить выражение без наличия ссылок (на ячейки).
-    Вычисление происходит без рекурсии!
-
-    * Все вычисления выполняются с помощью целочисленной арифметики со знаком
-    * Операции над строками текста запрещены
+    Вычислить агрегатную функцию диапазона (см. FunctionValue)
 
-    :param exp: Выражение
+    :param storage: Хранилище значений ячеек
+    :param param: Имя функции, индексы ячеек и ключи блоков диапазона (см. RangeIndex.get_keys)
     :raise: _CalcExpError
     """
 
-    if not (exp and isinstance(exp, list) and len(exp) % 2 == 1):
+    name, key_list = param
+    total, count, low, high, error = aggregate(storage, key_list)
+
+    if name == FunctionValue.COUNT:
+        return count
+
+    if error:
         raise _CalcExpError.calc_exp()
 
-    # Выражение состоящие из одного элемента
-    if len(exp) == 1 and (exp[0] is None or isinstance(exp[0], str)):
-        return exp[0]
+    if name == FunctionValue.SUM:
+        return total
 
-    result_exp: List[Union[str, int]] = exp
-    while len(result_exp) > 1:
-        operator = result_exp[1]
-        operator_result = _Operator.exec(operator, result_exp[0], result_exp[2])
+    if name == FunctionValue.MIN:
+        return low if count else 0
 
-        del result_exp[0: 3]
-        result_exp.insert(0, operator_result)
+    return high if count else 0
 
-    return int(result_exp[0])
 
+def _divide(left_value: int, right_value: int) -> int:
+    """
+    Целочисленное деление (с отбрасыванием дробной части)
 
-def _calc_exp_with_ref(cell_key: Tuple[int, int], exp: List, sheet_cell_value: dict):
+    :param left_value: Делимое
+    :param right_value: Делитель
+    :raise: _CalcExpError
     """
-    Вычислить выражение.
-    Вычисление происходит без рекурсии!
 
-    :param cell_key: Координаты ячейки (x, y)
-    :param exp: Элементы задающие выражения (см. ExpressionValue.get_value)
-    :param sheet_cell_value: Текущие вычисленные значения листа
+    try:
+        return int(left_value / right_value)
+    except (ZeroDivisionError, OverflowError):
+        raise _CalcExpError.calc_exp()
+
+
+def _get_ref_error(storage: CellStorage, index: int) -> Exception:
+    """
+    Получить исключение для ссылки, значение которой не подходит для вычисления
+
+    :param storage: Хранилище значений ячеек
+    :param index: Индекс ячейки
+    :return: NotCalculatedError для не вычисленного выражения, иначе _CalcExpError
+    """
+
+    if storage.type_list[index] == CellStorage.EXPRESSION:
+        return NotCalculatedError(index)
+
+    return _CalcExpError.calc_exp()
+
+
+class _Condition:
     """
+    Условная функция выражения (см. ConditionValue).
 
-    CellExp = namedtuple('CellExp', 'cell_key source_exp result_exp')
-    CellExp.__doc__ = """
-    Выражение ячейки
-    
-    :param tuple cell_key: Координаты ячейки (x, y)
-    :param list source_exp: Исходное выражение
-    :param list result_exp: Результирующее выражение
+    Аргументы компилируются в отдельные функции расчета, вычисляются только первый (условие, номер)
+    и выбранный аргумент, поэтому ячейки остальных аргументов могут быть не вычислены.
+    Сериализуется видом и значениями операндов аргументов (функции расчета компилируются заново).
     """
 
-    def process_cell_exp(cell_exp: CellExp) -> Union[CellExp, None]:
+    __slots__ = ('_name', '_spec_list', '_func_list')
+
+    def __init__(self, name: str, spec_list: Tuple[Tuple[str, Tuple], ...]):
+        """
+        :param name: Имя функции (см. ConditionValue.All)
+        :param spec_list: Вид и значения операндов аргументов (см. compile_spec)
         """
-        Обработать выражение ячейки
 
-        :param cell_exp: Выражение ячейки
-        :return: Очередное выражение для обработки
+        self._name: str = name
+        self._spec_list: Tuple[Tuple[str, Tuple], ...] = spec_list
+        self._func_list: Tuple[Callable, ...] = tuple(compile_spec(shape, param_list)
+                                                      for shape, param_list in spec_list)
+
+    def __reduce__(self):
+        return _Condition, (self._name, self._spec_list)
+
+    def __call__(self, storage: CellStorage) -> Union[int, str]:
         """
+        Вычислить функцию
 
-        nonlocal sheet_cell_value
+        :param storage: Хранилище значений ячеек
+        :raise: _CalcExpError, NotCalculatedError
+        """
 
-        # Обойти все элементы выражения
-        while cell_exp.source_exp:
-            exp_item = cell_exp.source_exp[0]
+        func_list = self._func_list
 
-            if isinstance(exp_item, RefValue):
-                ref_cell_key = exp_item.get_value()
+        selector = func_list[0](storage)
+        if selector.__class__ is not int:
+            raise _CalcExpError.calc_exp()
 
-                if ref_cell_key not in sheet_cell_value:
-                    raise _CalcExpError.not_valid_ref()
+        if self._name == ConditionValue.IF:
+            if selector:
+                return func_list[1](storage)
+            return func_list[2](storage) if len(func_list) > 2 else 0
 
-                ref_value = sheet_cell_value[ref_cell_key]
+        if 0 < selector < len(func_list):
+            return func_list[selector](storage)
 
-                # Если выражение содержит другое выражение, то возвращаем его для последующего расчета
-                if isinstance(ref_value, ExpressionValue):
-                    return CellExp(ref_cell_key, ref_value.get_value(), [])
+        raise _CalcExpError.calc_exp()
 
-                exp_item_value = ref_value
+    def get_precedents(self) -> List[int]:
+        """
+        Получить индексы ячеек и ключи блоков диапазонов всех аргументов
+        """
 
-            elif exp_item not in _Operator.All:
-                exp_item_value = exp_item.get_value()
+        precedent_list = []
+        for shape, param_list in self._spec_list:
+            for operand, param in zip(shape[0::2], param_list):
+                if operand == 'R':
+                    precedent_list.append(param)
+                elif operand == 'A':
+                    precedent_list += param[1]
 
-            else:
-                exp_item_value = exp_item
+        return precedent_list
 
-            cell_exp.result_exp.append(exp_item_value)
-            del cell_exp.source_exp[0]
 
-        return None
+def has_condition(calc_func: Callable) -> bool:
+    """
+    Содержит ли выражение условные функции (см. _Condition), т.е. могут ли его ссылки вычисляться не все
 
-    # Добавить выражение в стэк расчета
-    process_exp_stack = [CellExp(cell_key, exp, [])]
+    :param calc_func: Функция расчета (см. ExpressionValue.compile)
+    """
 
-    try:
-        while process_exp_stack:
-            process_exp = process_exp_stack[-1]
-            next_process_exp = process_cell_exp(process_exp)
+    shape = _compile_shape_list.get(id(getattr(calc_func, '__code__', None)))
+    if shape is None:
+        spec = getattr(calc_func, 'spec', None)
+        shape = spec[0] if spec is not None else ''
 
-            # Если очередная обработка выражения приводит к необходимости нового вычисления,
-            # то добавляем выражение для вычисления в стек расчета
-            if next_process_exp:
-                if any(e.cell_key == next_process_exp.cell_key for e in process_exp_stack):
-                    raise _CalcExpError.circle_ref()
+    return 'C' in shape
 
-                process_exp_stack.append(next_process_exp)
 
-            # Производим расчет
+_COMPILE_MAX_OPERAND_COUNT = 32
+"""
+Максимальное кол-во операндов выражения, для которого генерируется код (см. _compile_exp_factory)
+"""
+
+_compile_cache: Dict[str, Callable] = {}
+"""
+Фабрики функций расчета выражения, ключом является вид выражения (см. _compile_exp_factory)
+"""
+
+_compile_keys_cache: Dict[str, Callable] = {}
+"""
+Фабрики функций расчета группы ячеек, ключом является вид выражения (см. _compile_keys_factory)
+"""
+
+_compile_shape_list: Dict[int, str] = {}
+"""
+Вид выражения по идентификатору кода сгенерированной функции расчета (см. get_calc_spec).
+Код разных видов выражения может совпадать (например 'X' и 'N+X'), поэтому ключом является идентификатор,
+код не удаляется, так как фабрики хранятся в _compile_cache
+"""
+
+
+def compile_spec(shape: str, param_list: Tuple) -> Callable[[CellStorage], Union[int, str]]:
+    """
+    Получить функцию расчета выражения по его виду и значениям операндов (см. ExpressionValue.compile)
+
+    :param shape: Вид выражения (см. _compile_exp_factory)
+    :param param_list: Значения операндов (числа и ключи ссылок)
+    """
+
+    # Для длинных выражений генерация кода не окупается, используется свертка за один проход
+    if len(param_list) > _COMPILE_MAX_OPERAND_COUNT:
+        return _compile_exp_fold(shape, param_list)
+
+    factory = _compile_cache.get(shape)
+    if factory is None:
+        factory = _compile_cache[shape] = _compile_exp_factory(shape)
+
+    return factory(*param_list)
+
+
+def compile_keys_spec(shape: str, param_list: Tuple) -> Callable[[CellStorage, Iterable[int]], List[int]]:
+    """
+    Получить функцию расчета группы ячеек с общим выражением (см. ExpressionTemplate).
+
+    Функция принимает хранилище и индексы ячеек группы, вычисляет ячейки в заданном порядке и записывает
+    результат в хранилище. Уже вычисленные ячейки и ячейки со ссылками на не вычисленные выражения пропускаются.
+    Возвращает индексы вычисленных ячеек.
+
+    :param shape: Вид выражения (см. _compile_exp_factory), только числа и ссылки
+    :param param_list: Значения операндов: числа и смещения индексов ссылок относительно индекса ячейки
+    """
+
+    factory = _compile_keys_cache.get(shape)
+    if factory is None:
+        factory = _compile_keys_cache[shape] = _compile_keys_factory(shape)
+
+    return factory(*param_list)
+
+
+def get_calc_spec(calc_func: Callable) -> Tuple[str, Tuple]:
+    """
+    Получить вид выражения и значения операндов функции расчета (обратное compile_spec).
+    Позволяет передать выражение в другой процесс без исходного текста (функции расчета не сериализуются).
+
+    :param calc_func: Функция расчета (см. ExpressionValue.compile)
+    """
+
+    spec = getattr(calc_func, 'spec', None)
+    if spec is not None:
+        return spec
+
+    # Значения операндов находятся в замыкании функции, операнды не используемые в расчете не сохраняются
+    shape = _compile_shape_list[id(calc_func.__code__)]
+    value_list = dict(zip(calc_func.__code__.co_freevars, [cell.cell_contents for cell in calc_func.__closure__ or ()]))
+
+    return shape, tuple(value_list.get(f'_p{i}') for i in range((len(shape) + 1) // 2))
+
+
+def _compile_exp_factory(shape: str) -> Callable:
+    """
+    Сгенерировать фабрику функций расчета для вида выражения.
+
+    Вид выражения задается строкой из операндов (N - число, R - ссылка, A - функция диапазона,
+    C - условная функция, X - не корректная ссылка) и операторов (см. _Operator.Shape), например 'R+N*A'.
+    Фабрика принимает значения операндов (числа, ключи ссылок, имена функций с ключами диапазонов,
+    условные функции) и возвращает функцию расчета (см. ExpressionValue.compile), в которой операторы
+    и проверки типов развернуты в код без интерпретации.
+
+    Ссылка на не вычисленное выражение генерирует исключение NotCalculatedError (см. calc_lazy),
+    проверка выполняется только для значений, не являющихся числом.
+
+    :param shape: Вид выражения
+    """
+
+    param_list = [f'_p{i}' for i in range((len(shape) + 1) // 2)]
+
+    code = [f'def _factory({", ".join(param_list)}):',
+            '    def _calc(v):',
+            '        t = v.type_list',
+            '        n = v.number_list']
+    code += _get_exp_code(shape, param_list, '        ')
+    if shape and 'X' not in shape:
+        code.append('        return r')
+    code.append('    return _calc')
+
+    factory = _exec_factory(code)
+    for const in factory.__code__.co_consts:
+        if isinstance(const, CodeType):
+            _compile_shape_list[id(const)] = shape
+
+    return factory
+
+
+def _compile_keys_factory(shape: str) -> Callable:
+    """
+    Сгенерировать фабрику функций расчета группы ячеек с общим выражением (см. compile_keys_spec).
+
+    Код вычисления выражения тот же, что и для одной ячейки (см. _compile_exp_factory), индексы ссылок
+    вычисляются сдвигом индекса ячейки, ячейки группы вычисляются в одном цикле без вызова функции на ячейку.
+
+    :param shape: Вид выражения (только числа и ссылки, см. compile_keys_spec)
+    """
+
+    param_list = [f'_p{i}' for i in range((len(shape) + 1) // 2)]
+    index_list = [f'i + _p{i}' if operand == 'R' else f'_p{i}' for i, operand in enumerate(shape[0::2])]
+
+    # Ячейка вычисляется, если вычислены все ее ссылки (ячейка цикла не вычисляется)
+    check = ' or '.join(f't[{index}] == {CellStorage.EXPRESSION}'
+                        for index, operand in zip(index_list, shape[0::2]) if operand == 'R')
+
+    code = [f'def _factory({", ".join(param_list)}):',
+            '    def _calc_keys(v, key_list):',
+            '        t = v.type_list',
+            '        n = v.number_list',
+            '        calculated_list = []',
+            '        for i in key_list:',
+            f'            if t[i] != {CellStorage.EXPRESSION}: continue']
+    if check:
+        code.append(f'            if {check}: continue')
+    code.append('            try:')
+    code += _get_exp_code(shape, index_list, '                ')
+    code += ['            except _calc_exp_error as e:',
+             '                v.set_error(i, str(e))',
+             '            else:',
+             '                v.set_value(i, r)',
+             '            calculated_list.append(i)',
+             '        return calculated_list',
+             '    return _calc_keys']
+
+    return _exec_factory(code)
+
+
+def _get_exp_code(shape: str, index_list: List[str], indent: str) -> List[str]:
+    """
+    Сгенерировать код вычисления выражения (см. _compile_exp_factory), результат в переменной r.
+    Код использует хранилище v, массивы типов t и чисел n.
+
+    :param shape: Вид выражения
+    :param index_list: Код значения каждого операнда (индекс ссылки, значение числа)
+    :param indent: Отступ строк кода
+    """
+
+    operand_list = shape[0::2]
+    operator_list = [_Operator.from_shape(code) for code in shape[1::2]]
+    p = index_list
+
+    code = []
+
+    # Пустое выражение
+    if not shape:
+        code.append('raise _calc_exp()')
+
+    # Некорректная ссылка. Ошибка вычисления предшествующих ссылок имеет приоритет
+    elif 'X' in operand_list:
+        for i, operand in enumerate(operand_list[:operand_list.index('X')]):
+            if operand == 'R':
+                code.append(f'if t[{p[i]}] == {CellStorage.ERROR} or t[{p[i]}] == {CellStorage.EXPRESSION}: '
+                            f'raise _ref_error(v, {p[i]})')
+            elif operand == 'A':
+                code.append(f'_function(v, {p[i]})')
+            elif operand == 'C':
+                code.append(f'{p[i]}(v)')
+        code.append('raise _not_valid_ref()')
+
+    # Выражение из одного операнда, значение ссылки (в том числе текст) возвращается как есть
+    elif len(operand_list) == 1:
+        if operand_list == 'R':
+            code += [f'if t[{p[0]}] == {CellStorage.ERROR} or t[{p[0]}] == {CellStorage.EXPRESSION}: '
+                     f'raise _ref_error(v, {p[0]})',
+                     f'r = v.get_value({p[0]})']
+        elif operand_list == 'A':
+            code.append(f'r = _function(v, {p[0]})')
+        elif operand_list == 'C':
+            code.append(f'r = {p[0]}(v)')
+        else:
+            code.append(f'r = {p[0]}')
+
+    # Арифметическое выражение, все операнды должны быть числами
+    else:
+        value_list = []
+        for i, operand in enumerate(operand_list):
+            if operand == 'R':
+                code += [f'if t[{p[i]}] == {CellStorage.NUMBER}: o{i} = n[{p[i]}]',
+                         'else:',
+                         f'    o{i} = v.get_number({p[i]})',
+                         f'    if o{i} is None: raise _ref_error(v, {p[i]})']
+                value_list.append(f'o{i}')
+            elif operand == 'A':
+                code.append(f'o{i} = _function(v, {p[i]})')
+                value_list.append(f'o{i}')
+            elif operand == 'C':
+                code += [f'o{i} = {p[i]}(v)',
+                         f'if o{i}.__class__ is not int: raise _calc_exp()']
+                value_list.append(f'o{i}')
             else:
-                sheet_cell_value[process_exp.cell_key] = _calc_exp_wo_ref(process_exp.result_exp)
-                process_exp_stack.pop()
+                value_list.append(p[i])
+
+        code.append(f'r = {value_list[0]}')
+        for operator, value in zip(operator_list, value_list[1:]):
+            if operator == _Operator.Divide:
+                code.append(f'r = _divide(r, {value})')
+            elif operator in _Operator.Compare:
+                code.append(f'r = 1 if r {_Operator.Compare[operator]} {value} else 0')
+            else:
+                code.append(f'r = r {operator} {value}')
+
+    return [indent + line for line in code]
+
 
-    except _CalcExpError as e:
-        sheet_cell_value[process_exp_stack[-1].cell_key] = str(e)
+def _exec_factory(code: List[str]) -> Callable:
+    """
+    Выполнить сгенерированный код фабрики (см. _compile_exp_factory)
+
+    :param code: Строки кода функции _factory
+    """
+
+    namespace = {'_calc_exp': _CalcExpError.calc_exp,
+                 '_not_valid_ref': _CalcExpError.not_valid_ref,
+                 '_ref_error': _get_ref_error,
+                 '_function': _calc_function,
+                 '_divide': _divide,
+                 '_calc_exp_error': _CalcExpError}
+    exec('\n'.join(code), namespace)
+
+    return namespace['_factory']
+
+
+def _compile_exp_fold(shape: str, param_list: List) -> Callable:
+    """
+    Построить функцию расчета длинного выражения (см. ExpressionValue.compile).
+
+    Выражение вычисляется левой сверткой за один линейный проход по заранее подготовленным шагам,
+    без генерации кода и без промежуточных списков.
+
+    :param shape: Вид выражения (см. _compile_exp_factory)
+    :param param_list: Значения операндов (числа, ключи ссылок, имена функций с ключами диапазонов,
+        условные функции)
+    """
 
-        # В остальных, связанных ячейках по стэку, прописываем "Ошибка вычисления"
-        error_text = str(_CalcExpError.calc_exp())
-        for process_exp in process_exp_stack[0: -1]:
-            sheet_cell_value[process_exp.cell_key] = error_text
+    operand_list = shape[0::2]
+
+    # Некорректная ссылка. Ошибка вычисления предшествующих ссылок имеет приоритет
+    if 'X' in operand_list:
+        ref_list = tuple((operand, p) for operand, p in zip(operand_list[:operand_list.index('X')], param_list)
+                         if operand == 'R' or operand == 'A' or operand == 'C')
+
+        def _calc_not_valid_ref(v):
+            t = v.type_list
+            for operand, p in ref_list:
+                if operand == 'A':
+                    _calc_function(v, p)
+                elif operand == 'C':
+                    p(v)
+                elif t[p] == CellStorage.ERROR or t[p] == CellStorage.EXPRESSION:
+                    raise _get_ref_error(v, p)
+            raise _CalcExpError.not_valid_ref()
+
+        _calc_not_valid_ref.spec = (shape, tuple(param_list))
+        return _calc_not_valid_ref
+
+    func = dict(_Operator._func)
+    func[_Operator.Divide] = _divide
+
+    # Вид операнда: 0 - число, 1 - ссылка, 2 - функция диапазона, 3 - условная функция
+    kind_list = [{'R': 1, 'A': 2, 'C': 3}.get(operand, 0) for operand in operand_list]
+    first_kind = kind_list[0]
+    first_param = param_list[0]
+    step_list = tuple(zip([func[_Operator.from_shape(code)] for code in shape[1::2]], kind_list[1:], param_list[1:]))
+
+    def _calc(v):
+        get_number = v.get_number
+
+        r = first_param if not first_kind else get_number(first_param) if first_kind == 1 else \
+            _calc_function(v, first_param) if first_kind == 2 else first_param(v)
+        if r.__class__ is not int:
+            raise _get_ref_error(v, first_param) if first_kind == 1 else _CalcExpError.calc_exp()
+
+        for f, kind, p in step_list:
+            if kind:
+                o = get_number(p) if kind == 1 else _calc_function(v, p) if kind == 2 else p(v)
+                if o.__class__ is not int:
+                    raise _get_ref_error(v, p) if kind == 1 else _CalcExpError.calc_exp()
+                p = o
+            r = f(r, p)
+
+        return r
+
+    _calc.spec = (shape, tuple(param_list))
+    return _calc
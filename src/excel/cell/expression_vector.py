@@ -0,0 +1,164 @@
+"""
+Векторный расчет групп ячеек с общим выражением (см. ExpressionTemplate) с помощью NumPy.
+NumPy не является обязательной зависимостью: при его отсутствии ячейки группы вычисляются циклом
+(см. compile_keys_spec), результат расчета не зависит от наличия NumPy.
+"""
+
+from typing import Iterable, List, Tuple
+
+from excel.cell.expression_value import _Operator
+from excel.storage import CellStorage
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_VECTOR_MIN_COUNT = 64
+"""
+Минимальное кол-во ячеек, вычисляемых за один проход (для меньшего кол-ва векторный расчет не окупается)
+"""
+
+_VECTOR_MIN_SHARE = 16
+"""
+Проходы повторяются, пока за проход вычисляется не меньше 1/_VECTOR_MIN_SHARE оставшихся ячеек группы
+(кол-во проходов для длинных цепочек ссылок ограничено, такие ячейки вычисляются циклом)
+"""
+
+_VECTOR_MAX_NUMBER = 2 ** 53
+"""
+Максимальный модуль операндов и промежуточных значений: числа точно представимы в float64, поэтому деление
+совпадает с int(a / b) для целых чисел Python, а сложение и умножение не переполняют int64
+"""
+
+
+def calc_keys_vector(storage: CellStorage, shape: str, param_list: Tuple, key_list: Iterable[int]) -> List[int]:
+    """
+    Вычислить ячейки группы с общим выражением векторно и записать результат в хранилище
+    (аналогично функции расчета группы, см. compile_keys_spec).
+
+    Ячейки вычисляются проходами: за проход вычисляются все ячейки группы, ссылки которых вычислены
+    к началу прохода (уровень графа зависимостей внутри группы). Ячейки, операнды которых не являются
+    числами int64, либо значения которых выходят за пределы _VECTOR_MAX_NUMBER, и ячейки с ошибками вычисления
+    (деление на ноль) не вычисляются и остаются для расчета циклом, поэтому результат совпадает с расчетом циклом.
+    Разреженное хранилище векторно не вычисляется.
+
+    :param storage: Хранилище значений ячеек
+    :param shape: Вид выражения (только числа и ссылки, см. compile_keys_spec)
+    :param param_list: Значения операндов: числа и смещения индексов ссылок относительно индекса ячейки
+    :param key_list: Индексы ячеек группы (массив int64)
+    :return: Индексы вычисленных ячеек
+    """
+
+    operand_list = shape[0::2]
+    if numpy is None or storage.type_list.__class__ is not bytearray or len(key_list) < _VECTOR_MIN_COUNT \
+            or 'R' not in operand_list \
+            or any(abs(param) > _VECTOR_MAX_NUMBER for operand, param in zip(operand_list, param_list)
+                   if operand == 'N'):
+        return []
+
+    # Массивы хранилища используются без копирования, размер хранилища в процессе расчета не изменяется
+    t = numpy.frombuffer(storage.type_list, dtype=numpy.uint8)
+    n = numpy.frombuffer(storage.number_list, dtype=numpy.int64)
+    key_array = numpy.array(key_list, dtype=numpy.int64)
+    key_array = key_array[t[key_array] == CellStorage.EXPRESSION]
+
+    calculated_list = []
+    while len(key_array) >= _VECTOR_MIN_COUNT:
+        ready = numpy.ones(len(key_array), dtype=bool)
+        for operand, param in zip(operand_list, param_list):
+            if operand == 'R':
+                ready &= t[key_array + param] != CellStorage.EXPRESSION
+
+        ready_count = int(numpy.count_nonzero(ready))
+        if ready_count < _VECTOR_MIN_COUNT or ready_count * _VECTOR_MIN_SHARE < len(key_array):
+            break
+
+        ready_key_array = key_array[ready]
+        value_array, valid = _calc_vector(t, n, shape, param_list, ready_key_array)
+
+        calculated_key_array = ready_key_array[valid]
+        t[calculated_key_array] = CellStorage.NUMBER
+        n[calculated_key_array] = value_array[valid]
+        calculated_list += calculated_key_array.tolist()
+
+        key_array = key_array[~ready]
+
+    return calculated_list
+
+
+def _calc_vector(t, n, shape: str, param_list: Tuple, key_array) -> Tuple:
+    """
+    Вычислить выражение для массива ячеек, ссылки которых вычислены
+
+    :param t: Массив типов значений хранилища
+    :param n: Массив чисел хранилища
+    :param shape: Вид выражения (см. calc_keys_vector)
+    :param param_list: Значения операндов
+    :param key_array: Индексы ячеек
+    :return: Значения и признаки корректности значений (операнды являются числами, значения в пределах
+        _VECTOR_MAX_NUMBER, нет деления на ноль)
+    """
+
+    valid = numpy.ones(len(key_array), dtype=bool)
+
+    value_list = []
+    for operand, param in zip(shape[0::2], param_list):
+        if operand == 'R':
+            ref_array = key_array + param
+            value = n[ref_array]
+            valid &= (t[ref_array] == CellStorage.NUMBER) & (value >= -_VECTOR_MAX_NUMBER) \
+                & (value <= _VECTOR_MAX_NUMBER)
+            value_list.append(value)
+        else:
+            value_list.append(param)
+
+    # Значения не корректных элементов не используются, переполнение и деление на ноль в них не важны
+    with numpy.errstate(all='ignore'):
+        result = numpy.full(len(key_array), value_list[0], dtype=numpy.int64)
+        for code, value in zip(shape[1::2], value_list[1:]):
+            operator = _Operator.from_shape(code)
+
+            if operator in _Operator.Compare:
+                result = _compare(operator, result, value).astype(numpy.int64)
+                continue
+
+            if operator == _Operator.Divide:
+                zero = numpy.equal(value, 0)
+                valid &= ~zero
+                result = numpy.trunc(result / numpy.where(zero, 1, value)).astype(numpy.int64)
+            elif operator == _Operator.Multiply:
+                valid &= numpy.abs(result.astype(numpy.float64) * value) <= _VECTOR_MAX_NUMBER
+                result = result * value
+            elif operator == _Operator.Plus:
+                result = result + value
+            else:
+                result = result - value
+
+            valid &= (result >= -_VECTOR_MAX_NUMBER) & (result <= _VECTOR_MAX_NUMBER)
+
+    return result, valid
+
+
+def _compare(operator: str, left_value, right_value):
+    """
+    Сравнить массивы значений (см. _Operator.Compare)
+
+    :param operator: Оператор сравнения
+    :param left_value: Массив значений
+    :param right_value: Массив значений, либо число
+    :return: Массив признаков
+    """
+
+    if operator == _Operator.Equal:
+        return left_value == right_value
+    if operator == _Operator.NotEqual:
+        return left_value != right_value
+    if operator == _Operator.Less:
+        return left_value < right_value
+    if operator == _Operator.Greater:
+        return left_value > right_value
+    if operator == _Operator.LessEqual:
+        return left_value <= right_value
+
+    return left_value >= right_value
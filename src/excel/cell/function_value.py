@@ -0,0 +1,152 @@
+"""
+Тип ячейки 'Функция'
+"""
+
+import re
+from typing import Callable, Optional, Tuple
+
+from excel.cell.cell import CellValue
+from excel.cell.range_value import RangeValue
+from excel.storage import CellStorage, NotCalculatedError
+
+Aggregate = Tuple[int, int, Optional[int], Optional[int], bool]
+"""
+Сводные значения ячеек: сумма, кол-во чисел, минимум, максимум (None при отсутствии чисел),
+признак ошибки вычисления в одной из ячеек
+"""
+
+
+class FunctionValue(CellValue):
+    """
+    Агрегатная функция диапазона (см. RangeValue), например SUM(A1:A100). Имя функции не зависит от регистра.
+
+        * SUM Сумма,
+        * MIN Минимум,
+        * MAX Максимум,
+        * COUNT Кол-во чисел.
+
+    Учитываются только числа (текст и пустые ячейки пропускаются), MIN и MAX диапазона без чисел равны 0.
+    Ошибка вычисления ячейки диапазона является ошибкой функции (кроме COUNT).
+    """
+
+    __slots__ = ()
+
+    SUM = 'SUM'
+    MIN = 'MIN'
+    MAX = 'MAX'
+    COUNT = 'COUNT'
+
+    All = [SUM, MIN, MAX, COUNT]
+    """
+    Список всех функций
+    """
+
+    _pattern = re.compile(r'([A-Za-z]+)\(\s*([^()]*?)\s*\)')
+
+    def __init__(self, value: str):
+        """
+        :param value: Строка задающая значение
+        :raise: ValueError
+        """
+
+        super().__init__()
+
+        match = self._pattern.fullmatch(value) if isinstance(value, str) else None
+        if not (match and match.group(1).upper() in self.All):
+            raise ValueError(f'Значение "{value}" не является функцией!')
+
+        self._value: Tuple[str, RangeValue] = (match.group(1).upper(), RangeValue(match.group(2)))
+
+    @classmethod
+    def from_range(cls, name: str, range_value: RangeValue) -> 'FunctionValue':
+        """
+        Создать функцию по уже разобранным имени и диапазону (без повторной проверки строки)
+
+        :param name: Имя функции (см. All)
+        :param range_value: Диапазон
+        """
+
+        function = cls.__new__(cls)
+        function._value = (name, range_value)
+        return function
+
+    def get_value(self) -> Tuple[str, RangeValue]:
+        """
+        Получить значение: имя функции и диапазон
+        """
+
+        return self._value
+
+    def get_ref_key(self) -> Tuple:
+        """
+        Получить ключ диапазона функции (см. RangeValue.get_ref_key)
+        """
+
+        return self._value[1].get_ref_key()
+
+
+def aggregate(storage: CellStorage, key_list: Tuple[int, ...]) -> Aggregate:
+    """
+    Получить сводные значения ячеек и блоков диапазона (см. RangeIndex)
+
+    :param storage: Хранилище значений ячеек
+    :param key_list: Индексы ячеек и ключи блоков (отрицательные, сводные значения в CellStorage.aggregate_list)
+    :raise: NotCalculatedError
+    """
+
+    type_list = storage.type_list
+    number_list = storage.number_list
+    aggregate_list = storage.aggregate_list
+
+    total, count, low, high, error = 0, 0, None, None, False
+
+    for key in key_list:
+        if key < 0:
+            try:
+                block_total, block_count, block_low, block_high, block_error = aggregate_list[key]
+            except KeyError:
+                raise NotCalculatedError(key) from None
+            error = error or block_error
+            if not block_count:
+                continue
+
+            total += block_total
+            count += block_count
+            if low is None or block_low < low:
+                low = block_low
+            if high is None or block_high > high:
+                high = block_high
+            continue
+
+        value_type = type_list[key]
+        if value_type == CellStorage.NUMBER:
+            value = number_list[key]
+        elif value_type == CellStorage.BIG_NUMBER:
+            value = storage.get_number(key)
+        else:
+            if value_type == CellStorage.EXPRESSION:
+                raise NotCalculatedError(key)
+            error = error or value_type == CellStorage.ERROR
+            continue
+
+        total += value
+        count += 1
+        if low is None or value < low:
+            low = value
+        if high is None or value > high:
+            high = value
+
+    return total, count, low, high, error
+
+
+def make_block_func(key_list: Tuple[int, ...]) -> Callable[[CellStorage], Aggregate]:
+    """
+    Получить функцию расчета сводных значений блока диапазона (см. RangeIndex)
+
+    :param key_list: Индексы ячеек, либо ключи дочерних блоков
+    """
+
+    def _calc_block(storage: CellStorage) -> Aggregate:
+        return aggregate(storage, key_list)
+
+    return _calc_block
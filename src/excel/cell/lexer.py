@@ -0,0 +1,61 @@
+"""
+Разбор строкового значения ячейки.
+Тип значения определяется по первому символу строки за один проход, без перебора типов через исключения.
+"""
+
+from typing import Union
+
+from excel.cell.cell import CellValue
+from excel.cell.empty_value import EmptyValue
+from excel.cell.expression_value import ExpressionValue
+from excel.cell.number_value import NumberValue
+from excel.cell.text_value import TextValue
+
+
+def parse_cell_value(value: str) -> Union[int, str, ExpressionValue]:
+    """
+    Разобрать значение ячейки без создания объекта для простых значений.
+
+    :param value: Строковое значение ячейки
+    :return: Число, текст (пустая строка для пустого значения), либо выражение
+    :raise: ValueError
+    """
+
+    if value == '':
+        return ''
+
+    if isinstance(value, str):
+        first = value[0]
+
+        if first == "'":
+            return value[1:]
+
+        if first == '=':
+            return ExpressionValue(value)
+
+        if value.isdigit():
+            try:
+                return int(value)
+            except ValueError:
+                pass
+
+    raise ValueError(f'Значение "{value}" не соответствует ни одному типу!')
+
+
+def parse_cell(value: str) -> CellValue:
+    """
+    Разобрать значение ячейки (см. CellValue.parser).
+
+    :param value: Строковое значение ячейки
+    :raise: ValueError
+    """
+
+    cell_value = parse_cell_value(value)
+
+    if cell_value.__class__ is ExpressionValue:
+        return cell_value
+
+    if cell_value.__class__ is int:
+        return NumberValue(value)
+
+    return EmptyValue(value) if value == '' else TextValue(value)
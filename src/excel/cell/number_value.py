@@ -11,6 +11,8 @@ class NumberValue(CellValue):
     Целое положительное.
     """
 
+    __slots__ = ()
+
     def __init__(self, value: str):
         """
         :param str value: Строка задающая значение
@@ -23,3 +25,15 @@ class NumberValue(CellValue):
             raise ValueError(f'Значение "{value}" не является целым положительным числом!')
 
         self._value: int = int(value)
+
+    @classmethod
+    def from_int(cls, value: int) -> 'NumberValue':
+        """
+        Создать число по уже разобранному значению (без повторной проверки строки)
+
+        :param value: Целое неотрицательное число
+        """
+
+        number = cls.__new__(cls)
+        number._value = value
+        return number
@@ -0,0 +1,87 @@
+"""
+Тип ячейки 'Диапазон'
+"""
+
+import re
+from typing import Optional, Tuple, Union
+
+from excel.cell.cell import CellValue
+from excel.cell.ref_value import RefValue, get_column_number
+
+
+class RangeValue(CellValue):
+    """
+    Диапазон.
+    Две ссылки, разделенные символом :, задают прямоугольник ячеек между ними включительно, например A1:B10.
+    Диапазон из одной ячейки может задаваться одной ссылкой, например A1.
+    Диапазону на другом листе книги предшествуют имя листа и символ !, например Sheet2!A1:B10.
+    """
+
+    __slots__ = ('_sheet',)
+
+    _pattern = re.compile(rf'(?:({RefValue.SHEET_NAME_PATTERN})!)?([A-Za-z]+)([0-9]+)(?::([A-Za-z]+)([0-9]+))?')
+
+    def __init__(self, value: str):
+        """
+        :param value: Строка задающая значение
+        :raise: ValueError
+        """
+
+        super().__init__()
+
+        match = self._pattern.fullmatch(value) if isinstance(value, str) else None
+        if not (match and int(match.group(3)) > 0 and (match.group(4) is None or int(match.group(5)) > 0)):
+            raise ValueError(f'Значение "{value}" не является диапазоном!')
+
+        sheet, letters_1, digits_1, letters_2, digits_2 = match.groups()
+        if letters_2 is None:
+            letters_2, digits_2 = letters_1, digits_1
+
+        x1, y1, x2, y2 = get_column_number(letters_1), int(digits_1), get_column_number(letters_2), int(digits_2)
+
+        # Углы приводятся к левому верхнему и правому нижнему
+        self._value: Tuple[Tuple[int, int], Tuple[int, int]] = ((min(x1, x2), min(y1, y2)),
+                                                                (max(x1, x2), max(y1, y2)))
+        self._sheet: Optional[str] = sheet
+
+    @classmethod
+    def from_key(cls, x1: int, y1: int, x2: int, y2: int, sheet: str = None) -> 'RangeValue':
+        """
+        Создать диапазон по уже разобранным координатам углов (без повторной проверки строки)
+
+        :param x1: Номер столбца первого угла (1..)
+        :param y1: Номер строки первого угла (1..)
+        :param x2: Номер столбца второго угла (1..)
+        :param y2: Номер строки второго угла (1..)
+        :param sheet: Имя листа (для диапазона на другом листе книги)
+        """
+
+        range_value = cls.__new__(cls)
+        range_value._value = ((min(x1, x2), min(y1, y2)), (max(x1, x2), max(y1, y2)))
+        range_value._sheet = sheet
+        return range_value
+
+    def get_value(self) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        Получить значение.
+        Координаты левого верхнего и правого нижнего углов ((x1, y1), (x2, y2))
+        """
+
+        return self._value
+
+    def get_sheet(self) -> Optional[str]:
+        """
+        Получить имя листа
+        :return: Имя листа, None для диапазона того же листа
+        """
+
+        return self._sheet
+
+    def get_ref_key(self) -> Union[Tuple[int, int, int, int], Tuple[int, int, int, int, str]]:
+        """
+        Получить ключ диапазона: координаты углов (x1, y1, x2, y2),
+        для диапазона на другом листе (x1, y1, x2, y2, имя листа)
+        """
+
+        (x1, y1), (x2, y2) = self._value
+        return (x1, y1, x2, y2) if self._sheet is None else (x1, y1, x2, y2, self._sheet)
@@ -3,7 +3,7 @@
 """
 
 import re
-from typing import Tuple
+from typing import Dict, Optional, Tuple, Union
 
 from excel.cell.cell import CellValue
 
@@ -11,9 +11,19 @@ from excel.cell.cell import CellValue
 class RefValue(CellValue):
     """
     Ссылка.
-    Одна латинска буква и следующа за ней цифра.
+    Латинские буквы (столбец A-Z, AA-ZZ, ...) и следующее за ними число (строка), например AB1234.
+    Ссылке на ячейку другого листа книги предшествуют имя листа и символ !, например Sheet2!B3.
     """
 
+    __slots__ = ('_sheet', '_key')
+
+    SHEET_NAME_PATTERN = r'[A-Za-z_][A-Za-z0-9_]*'
+    """
+    Имя листа: латинские буквы, цифры и символ _ (не начинается с цифры)
+    """
+
+    _pattern = re.compile(rf'(?:({SHEET_NAME_PATTERN})!)?([A-Za-z]+)([0-9]+)')
+
     def __init__(self, value: str):
         """
         :param value: Строка задающая значение
@@ -22,11 +32,45 @@ class RefValue(CellValue):
 
         super().__init__()
 
-        if not (isinstance(value, str) and len(value) == 2
-                and re.search(r'[A-Z]', value[0].upper()) is not None and value[1].isdigit() and int(value[1]) > 0):
+        match = self._pattern.fullmatch(value) if isinstance(value, str) else None
+        if not (match and int(match.group(3)) > 0):
             raise ValueError(f'Значение "{value}" не является ссылкой!')
 
-        self._value: str = value.upper()
+        # Координаты вычисляются один раз при разборе
+        self._value: Tuple[int, int] = (get_column_number(match.group(2)), int(match.group(3)))
+        self._sheet: Optional[str] = match.group(1)
+        self._key: Union[Tuple[int, int], Tuple[int, int, str]] = self._get_key()
+
+    @classmethod
+    def from_key(cls, x: int, y: int, sheet: str = None) -> 'RefValue':
+        """
+        Создать ссылку по уже разобранным координатам (без повторной проверки строки)
+
+        :param x: Номер столбца (1..)
+        :param y: Номер строки (1..)
+        :param sheet: Имя листа (для ссылки на другой лист книги)
+        """
+
+        ref = cls.__new__(cls)
+        ref._value = (x, y)
+        ref._sheet = sheet
+        ref._key = ref._get_key()
+        return ref
+
+    def get_sheet(self) -> Optional[str]:
+        """
+        Получить имя листа
+        :return: Имя листа, None для ссылки на ячейку того же листа
+        """
+
+        return self._sheet
+
+    def get_ref_key(self) -> Union[Tuple[int, int], Tuple[int, int, str]]:
+        """
+        Получить ключ ссылки: координаты (x, y), для ссылки на другой лист (x, y, имя листа)
+        """
+
+        return self._key
 
     def get_value(self) -> Tuple[int, int]:
         """
@@ -36,4 +80,52 @@ class RefValue(CellValue):
         :rtype: tuple(int, int)
         """
 
-        return ord(self._value[0]) - ord('A') + 1, int(self._value[1])
+        return self._value
+
+    def _get_key(self) -> Union[Tuple[int, int], Tuple[int, int, str]]:
+        """
+        Вычислить ключ ссылки (см. get_ref_key)
+        """
+
+        return self._value if self._sheet is None else self._value + (self._sheet,)
+
+
+_column_number_cache: Dict[str, int] = {}
+"""
+Номера столбцов по буквенному обозначению (см. get_column_number)
+"""
+
+
+def get_column_number(letters: str) -> int:
+    """
+    Получить номер столбца (1..) по буквенному обозначению (A-Z, AA-ZZ, ..., регистр не учитывается)
+
+    :param letters: Латинские буквы
+    """
+
+    x = _column_number_cache.get(letters)
+    if x is None:
+        x = 0
+        for letter in letters.upper():
+            x = x * 26 + ord(letter) - ord('A') + 1
+
+        # Кол-во столбцов листа ограничено, кэш не растет неограниченно для корректных листов
+        if len(_column_number_cache) < 65536:
+            _column_number_cache[letters] = x
+
+    return x
+
+
+def get_column_name(x: int) -> str:
+    """
+    Получить буквенное обозначение столбца (см. get_column_number)
+
+    :param x: Номер столбца (1..)
+    """
+
+    name = ''
+    while x > 0:
+        x, letter = divmod(x - 1, 26)
+        name = chr(ord('A') + letter) + name
+
+    return name
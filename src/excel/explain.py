@@ -0,0 +1,221 @@
+"""
+Анализ зависимостей листа.
+Для каждой ячейки определяются длина самой длинной цепочки влияющих выражений, кол-во прямых влияющих
+и зависимых ячеек и размер множества всех (транзитивно) влияющих ячеек. Позволяет найти ячейки,
+расчет которых обходится дороже всего.
+"""
+
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+from excel.cell.ref_value import get_column_name
+from excel.graph import DependencyGraph
+
+
+class CellExplain:
+    """
+    Показатели зависимостей ячейки
+    """
+
+    __slots__ = ('key', 'depth', 'fan_in', 'fan_out', 'precedent_count')
+
+    def __init__(self, key: Tuple[int, int], depth: int, fan_in: int, fan_out: int, precedent_count: int):
+        """
+        :param key: Координаты ячейки (x, y), для ячейки другого листа книги (x, y, имя листа)
+        :param depth: Длина самой длинной цепочки выражений, заканчивающейся ячейкой (0 для ячейки без выражения)
+        :param fan_in: Кол-во ячеек, на которые прямо ссылается выражение ячейки
+        :param fan_out: Кол-во выражений, прямо ссылающихся на ячейку
+        :param precedent_count: Кол-во всех ячеек, от которых транзитивно зависит ячейка
+        """
+
+        self.key: Tuple[int, int] = key
+        self.depth: int = depth
+        self.fan_in: int = fan_in
+        self.fan_out: int = fan_out
+        self.precedent_count: int = precedent_count
+
+    def get_name(self) -> str:
+        """
+        Получить обозначение ячейки (например AB12, для ячейки другого листа книги Sheet2!AB12)
+        """
+
+        return _get_name(self.key)
+
+
+class SheetExplain:
+    """
+    Анализ зависимостей листа.
+
+    Ячейки обходятся один раз в порядке вычисления (см. DependencyGraph.get_calc_order), без рекурсии.
+    Множества влияющих ячеек хранятся битовыми масками и освобождаются после обработки всех зависимых ячеек.
+    Ячейки цикла имеют общие показатели (каждая ячейка цикла зависит от всех ячеек цикла).
+    Вспомогательные вершины графа (блоки диапазонов, для которых get_key возвращает None) в отчет не попадают,
+    не увеличивают глубину и не учитываются в кол-ве влияющих ячеек, в кол-ве прямых влияющих и зависимых ячеек
+    заменяются ячейками блока и выражениями, ссылающимися на блок.
+    """
+
+    def __init__(self, graph: DependencyGraph, get_key: Callable[[Hashable], Tuple[int, int]]):
+        """
+        :param graph: Граф зависимостей листа
+        :param get_key: Функция получения координат ячейки (x, y), либо (x, y, имя листа) по ключу ячейки в графе,
+            для вспомогательной вершины возвращает None
+        """
+
+        self._cell_list: Dict[Tuple[int, int], CellExplain] = {}
+        self._longest_chain: List[Tuple[int, int]] = []
+
+        bit_list: Dict[Hashable, int] = {}
+        mask_list: Dict[Hashable, int] = {}
+        remaining_list: Dict[Hashable, int] = {}
+        depth_list: Dict[Hashable, int] = {}
+        next_list: Dict[Hashable, Hashable] = {}
+
+        # Биты вспомогательных вершин (исключаются из кол-ва влияющих ячеек)
+        virtual_mask = 0
+
+        def get_bit(key: Hashable) -> int:
+            nonlocal virtual_mask
+            bit = bit_list.get(key)
+            if bit is None:
+                bit = bit_list[key] = 1 << len(bit_list)
+                if get_key(key) is None:
+                    virtual_mask |= bit
+            return bit
+
+        def get_fan_count(key: Hashable, get_list: Callable[[Hashable], Iterable[Hashable]]) -> int:
+            # Кол-во ячеек, связанных прямо или через вспомогательные вершины (раскрываются без рекурсии)
+            cell_set, virtual_set, stack = set(), set(), list(get_list(key))
+            while stack:
+                ref_key = stack.pop()
+                if get_key(ref_key) is not None:
+                    cell_set.add(ref_key)
+                elif ref_key not in virtual_set:
+                    virtual_set.add(ref_key)
+                    stack.extend(get_list(ref_key))
+            return len(cell_set)
+
+        for component in graph.get_calc_order():
+            member_list = set(component)
+            mask, depth, next_key = 0, 0, None
+
+            for key in component:
+                for ref_key in graph.get_precedents(key):
+                    mask |= get_bit(ref_key)
+                    if ref_key in member_list:
+                        continue
+
+                    ref_mask = mask_list.get(ref_key)
+                    if ref_mask is not None:
+                        mask |= ref_mask
+
+                        # Маска влияющей ячейки больше не нужна после обработки всех зависимых ячеек
+                        remaining_list[ref_key] -= 1
+                        if remaining_list[ref_key] == 0:
+                            del mask_list[ref_key]
+                            del remaining_list[ref_key]
+
+                    if depth_list.get(ref_key, 0) > depth:
+                        depth, next_key = depth_list[ref_key], ref_key
+
+            precedent_count = (mask & ~virtual_mask).bit_count()
+
+            for key in component:
+                cell_key = get_key(key)
+                depth_list[key] = depth + 1 if cell_key is not None else depth
+                if next_key is not None:
+                    next_list[key] = next_key
+
+                remaining = sum(1 for dependent_key in graph.get_dependents(key) if dependent_key not in member_list)
+                if remaining:
+                    mask_list[key] = mask
+                    remaining_list[key] = remaining
+
+                if cell_key is None:
+                    continue
+                self._cell_list[cell_key] = CellExplain(cell_key, depth + 1,
+                                                        get_fan_count(key, graph.get_precedents),
+                                                        get_fan_count(key, graph.get_dependents), precedent_count)
+
+        # Ячейки без выражений, на которые ссылаются выражения
+        for key in bit_list:
+            if key not in depth_list:
+                cell_key = get_key(key)
+                if cell_key is None:
+                    continue
+                self._cell_list[cell_key] = CellExplain(cell_key, 0, 0, get_fan_count(key, graph.get_dependents), 0)
+
+        # Самая длинная цепочка: от ячейки с наибольшей глубиной по влияющим ячейкам
+        if depth_list:
+            key = max(depth_list, key=depth_list.get)
+            while key is not None:
+                cell_key = get_key(key)
+                if cell_key is not None:
+                    self._longest_chain.append(cell_key)
+                key = next_list.get(key)
+
+    def get_cell(self, key: Tuple[int, int]) -> CellExplain:
+        """
+        Получить показатели ячейки
+
+        :param key: Координаты ячейки (x, y)
+        :raise: KeyError Ячейка не участвует в зависимостях (не выражение и на нее нет ссылок)
+        """
+
+        return self._cell_list[key]
+
+    def get_cell_list(self) -> List[CellExplain]:
+        """
+        Получить показатели всех ячеек, участвующих в зависимостях
+        """
+
+        return list(self._cell_list.values())
+
+    def get_longest_chain(self) -> List[Tuple[int, int]]:
+        """
+        Получить самую длинную цепочку выражений: от зависимой ячейки к влияющим
+        :return: Координаты ячеек (x, y)
+        """
+
+        return list(self._longest_chain)
+
+    def get_top(self, count: int) -> List[CellExplain]:
+        """
+        Получить самые дорогие в расчете ячейки: по размеру множества влияющих ячеек, затем по глубине
+
+        :param count: Кол-во ячеек
+        """
+
+        return sorted(self._cell_list.values(), key=lambda cell: (-cell.precedent_count, -cell.depth, cell.key))[:count]
+
+    def format(self, count: int = 10) -> str:
+        """
+        Получить строковое представление отчета (значения разделены символом табуляции)
+
+        :param count: Кол-во самых дорогих ячеек в отчете (см. get_top)
+        """
+
+        cell_list = self._cell_list.values()
+        chain = [_get_name(key) for key in self._longest_chain]
+
+        line_list = [f'cells\t{len(self._cell_list)}',
+                     f'longest_chain\t{len(chain)}\t{" <- ".join(chain[:10])}{" <- ..." if len(chain) > 10 else ""}',
+                     f'max_fan_in\t{max((cell.fan_in for cell in cell_list), default=0)}',
+                     f'max_fan_out\t{max((cell.fan_out for cell in cell_list), default=0)}',
+                     f'max_precedent_count\t{max((cell.precedent_count for cell in cell_list), default=0)}',
+                     '',
+                     'cell\tdepth\tfan_in\tfan_out\tprecedent_count']
+
+        line_list += [f'{cell.get_name()}\t{cell.depth}\t{cell.fan_in}\t{cell.fan_out}\t{cell.precedent_count}'
+                      for cell in self.get_top(count)]
+
+        return '\n'.join(line_list)
+
+
+def _get_name(key: Tuple) -> str:
+    """
+    Получить обозначение ячейки (например AB12, для ячейки другого листа книги Sheet2!AB12)
+
+    :param key: Координаты ячейки (x, y), либо (x, y, имя листа)
+    """
+
+    name = f'{get_column_name(key[0])}{key[1]}'
+    return name if len(key) == 2 else f'{key[2]}!{name}'
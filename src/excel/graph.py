@@ -0,0 +1,158 @@
+"""
+Граф зависимостей ячеек.
+Предоставляется функциональность построения связей между ячейками (влияющие и зависимые ячейки)
+с последующим определением порядка вычисления и выявлением циклических ссылок.
+"""
+
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+class DependencyGraph:
+    """
+    Граф зависимостей.
+
+    Вершинами графа являются ключи ячеек с выражениями, ребрами ссылки выражения на другие ячейки.
+    Ссылки на ячейки без выражений (и на несуществующие ячейки) в обходе не участвуют.
+    """
+
+    def __init__(self, precedent_list: Dict[Hashable, Iterable[Hashable]] = None):
+        """
+        :param precedent_list: Для каждой ячейки с выражением перечень ячеек, на которые она ссылается
+        """
+
+        self._precedent_list: Dict[Hashable, Tuple[Hashable, ...]] = {}
+        self._dependent_list: Dict[Hashable, Set[Hashable]] = {}
+
+        for key, ref_list in (precedent_list or {}).items():
+            self.set_precedents(key, ref_list)
+
+    def set_precedents(self, key: Hashable, ref_list: Iterable[Hashable]):
+        """
+        Задать влияющие ячейки (ссылки выражения ячейки)
+
+        :param key: Ключ ячейки
+        :param ref_list: Ключи ячеек, на которые ссылается выражение
+        """
+
+        self.remove(key)
+
+        ref_list = tuple(dict.fromkeys(ref_list))
+        self._precedent_list[key] = ref_list
+
+        for ref_key in ref_list:
+            self._dependent_list.setdefault(ref_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        """
+        Удалить влияющие ячейки (ячейка перестала быть выражением)
+
+        :param key: Ключ ячейки
+        """
+
+        for ref_key in self._precedent_list.pop(key, ()):
+            dependent_list = self._dependent_list[ref_key]
+            dependent_list.discard(key)
+            if not dependent_list:
+                del self._dependent_list[ref_key]
+
+    def get_precedents(self, key: Hashable) -> Tuple[Hashable, ...]:
+        """
+        Получить ячейки, на которые ссылается выражение ячейки
+
+        :param key: Ключ ячейки
+        """
+
+        return self._precedent_list.get(key, ())
+
+    def get_dependents(self, key: Hashable) -> Set[Hashable]:
+        """
+        Получить ячейки, выражения которых ссылаются на ячейку
+
+        :param key: Ключ ячейки
+        """
+
+        return self._dependent_list.get(key, set())
+
+    def is_circle(self, component: List[Hashable]) -> bool:
+        """
+        Является ли компонента (см. get_calc_order) циклом
+
+        :param component: Компонента сильной связности
+        """
+
+        return len(component) > 1 or component[0] in self._precedent_list.get(component[0], ())
+
+    def get_calc_order(self, key_list: Iterable[Hashable] = None) -> List[List[Hashable]]:
+        """
+        Получить порядок вычисления ячеек с выражениями.
+
+        Ячейки разбиваются на компоненты сильной связности (алгоритм Тарьяна) за один линейный проход.
+        Компоненты возвращаются в топологическом порядке: влияющие ячейки раньше зависимых.
+        Компонента из нескольких ячеек (или ячейка ссылающаяся на саму себя) является циклом.
+        Обход происходит без рекурсии!
+
+        :param key_list: Ограничить обход заданными ячейками (ссылки на остальные ячейки считаются вычисленными),
+            по умолчанию все ячейки с выражениями
+        :return: Список компонент, каждая компонента список ключей ячеек
+        """
+
+        if key_list is None:
+            precedent_list = self._precedent_list
+        else:
+            precedent_list = {key: self._precedent_list[key] for key in key_list if key in self._precedent_list}
+
+        index: Dict[Hashable, int] = {}
+        low_index: Dict[Hashable, int] = {}
+        component_stack: List[Hashable] = []
+        on_stack: Set[Hashable] = set()
+        result: List[List[Hashable]] = []
+
+        for root_key in precedent_list:
+            if root_key in index:
+                continue
+
+            index[root_key] = low_index[root_key] = len(index)
+            component_stack.append(root_key)
+            on_stack.add(root_key)
+            work_stack = [(root_key, iter(precedent_list[root_key]))]
+
+            while work_stack:
+                key, ref_iter = work_stack[-1]
+
+                for ref_key in ref_iter:
+                    if ref_key not in precedent_list:
+                        continue
+
+                    # Ячейка еще не посещена, продолжаем обход с нее
+                    if ref_key not in index:
+                        index[ref_key] = low_index[ref_key] = len(index)
+                        component_stack.append(ref_key)
+                        on_stack.add(ref_key)
+                        work_stack.append((ref_key, iter(precedent_list[ref_key])))
+                        break
+
+                    if ref_key in on_stack and index[ref_key] < low_index[key]:
+                        low_index[key] = index[ref_key]
+
+                # Все ссылки ячейки обработаны
+                else:
+                    work_stack.pop()
+
+                    if work_stack:
+                        parent_key = work_stack[-1][0]
+                        if low_index[key] < low_index[parent_key]:
+                            low_index[parent_key] = low_index[key]
+
+                    # Ячейка является корнем компоненты
+                    if low_index[key] == index[key]:
+                        component = []
+                        while True:
+                            component_key = component_stack.pop()
+                            on_stack.discard(component_key)
+                            component.append(component_key)
+                            if component_key == key:
+                                break
+
+                        result.append(component)
+
+        return result
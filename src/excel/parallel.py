@@ -0,0 +1,246 @@
+"""
+Параллельный расчет листа.
+
+Выражения разбиваются на слабо связанные компоненты (группы выражений, не ссылающихся на выражения других групп),
+которые рассчитываются независимо в пуле процессов. Функции расчета не сериализуются:
+    * при запуске процессов через fork процессы наследуют лист целиком, в процесс передаются только индексы ячеек,
+    * иначе в процесс передается компактное описание выражений (см. get_calc_spec)
+      и значения влияющих ячеек вне пакета.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from excel.cell.expression_value import compile_spec, get_calc_spec
+from excel.cell.function_value import make_block_func
+from excel.graph import DependencyGraph
+from excel.sheet import calc_components
+from excel.storage import CellStorage, SparseCellStorage
+
+_BATCH_PER_WORKER = 4
+"""
+Кол-во пакетов на процесс (для выравнивания нагрузки между процессами)
+"""
+
+_fork_state: Optional[Tuple[CellStorage, DependencyGraph, Dict[int, Callable]]] = None
+"""
+Лист, наследуемый процессами пула при запуске через fork (см. _calc_forked_batch)
+"""
+
+_Payload = Tuple[List[Tuple[int, str, Tuple, Tuple[int, ...]]], List[Tuple[int, Union[int, str], bool]]]
+"""
+Пакет расчета: выражения (индекс ячейки, вид выражения, значения операндов, влияющие ячейки графа;
+для блока диапазона ключ блока, None, ключи дочерних ячеек и блоков и они же) и значения влияющих ячеек
+и блоков вне пакета (индекс ячейки, значение, признак ошибки вычисления)
+"""
+
+
+def get_weak_components(graph: DependencyGraph, key_list: List[int]) -> List[List[int]]:
+    """
+    Разбить ячейки с выражениями на слабо связанные компоненты (ссылки на ячейки без выражений не связывают ячейки).
+    Обход без рекурсии!
+
+    :param graph: Граф зависимостей
+    :param key_list: Ячейки с выражениями
+    :return: Список компонент, каждая компонента список ключей ячеек
+    """
+
+    parent_list: Dict[int, int] = {key: key for key in key_list}
+
+    def find(key: int) -> int:
+        while parent_list[key] != key:
+            parent_list[key] = parent_list[parent_list[key]]
+            key = parent_list[key]
+        return key
+
+    for key in key_list:
+        for ref_key in graph.get_precedents(key):
+            if ref_key in parent_list:
+                root, ref_root = find(key), find(ref_key)
+                if root != ref_root:
+                    parent_list[ref_root] = root
+
+    component_list: Dict[int, List[int]] = {}
+    for key in key_list:
+        component_list.setdefault(find(key), []).append(key)
+
+    return list(component_list.values())
+
+
+def calc_parallel(storage: CellStorage, graph: DependencyGraph, calc_func_list: Dict[int, Callable], workers: int,
+                  key_list: Iterable[int] = None):
+    """
+    Вычислить выражения ячеек в пуле процессов и записать результат в хранилище (см. calc_components).
+    Если выражения не разбиваются на несколько пакетов, расчет выполняется в текущем процессе.
+
+    :param storage: Хранилище значений ячеек
+    :param graph: Граф зависимостей
+    :param calc_func_list: Функции расчета выражений по индексу ячейки
+    :param workers: Кол-во процессов
+    :param key_list: Вычисляемые ячейки (ячейки без выражений пропускаются), по умолчанию все выражения.
+        Значения остальных влияющих ячеек должны быть уже вычислены.
+    """
+
+    if key_list is not None:
+        key_list = [key for key in key_list if key in calc_func_list]
+
+    batch_list = _split_batches(get_weak_components(graph, list(calc_func_list) if key_list is None else key_list),
+                                workers * _BATCH_PER_WORKER)
+
+    if len(batch_list) < 2:
+        calc_components(storage, graph, calc_func_list, graph.get_calc_order(key_list))
+        return
+
+    global _fork_state
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _fork_state = (storage, graph, calc_func_list)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                _merge(storage, batch_list, executor.map(_calc_forked_batch, batch_list))
+        finally:
+            _fork_state = None
+
+    else:
+        payload_list = [_make_payload(batch, storage, graph, calc_func_list) for batch in batch_list]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            _merge(storage, [[index for index, _, _, _ in payload[0]] for payload in payload_list],
+                   executor.map(_calc_batch, payload_list))
+
+
+def _merge(storage: CellStorage, batch_list: List[List[int]],
+           result_list: Iterable[Tuple[List[Union[int, str]], List[int]]]):
+    """
+    Записать результаты расчета пакетов в хранилище
+
+    :param storage: Хранилище значений ячеек
+    :param batch_list: Ячейки пакетов
+    :param result_list: Результаты расчета пакетов (см. _calc_batch)
+    """
+
+    for batch, (value_list, error_list) in zip(batch_list, result_list):
+        error_list = set(error_list)
+        for position, (index, value) in enumerate(zip(batch, value_list)):
+            if index < 0:
+                storage.aggregate_list[index] = value
+            elif position in error_list:
+                storage.set_error(index, value)
+            else:
+                storage.set_value(index, value)
+
+
+def _split_batches(component_list: List[List[int]], count: int) -> List[List[int]]:
+    """
+    Распределить компоненты по пакетам с примерно равным кол-вом ячеек (большие компоненты распределяются первыми)
+
+    :param component_list: Слабо связанные компоненты (см. get_weak_components)
+    :param count: Максимальное кол-во пакетов
+    """
+
+    batch_list: List[List[int]] = [[] for _ in range(min(count, len(component_list)))]
+
+    for component in sorted(component_list, key=len, reverse=True):
+        min(batch_list, key=len).extend(component)
+
+    return batch_list
+
+
+def _make_payload(batch: List[int], storage: CellStorage, graph: DependencyGraph,
+                  calc_func_list: Dict[int, Callable]) -> _Payload:
+    """
+    Сформировать пакет расчета
+
+    :param batch: Ячейки с выражениями
+    :param storage: Хранилище значений ячеек
+    :param graph: Граф зависимостей
+    :param calc_func_list: Функции расчета выражений по индексу ячейки
+    """
+
+    # Влияющие ячейки передаются из графа: операнды после некорректной ссылки в описании выражения не передаются,
+    # но связывают ячейку в графе (в том числе в цикл)
+    expression_list = [(index,) + (get_calc_spec(calc_func_list[index]) if index >= 0
+                                   else (None, graph.get_precedents(index))) + (graph.get_precedents(index),)
+                       for index in batch]
+
+    # Значения влияющих ячеек вне пакета: ячейки без выражений, уже вычисленные выражения и блоки диапазонов
+    # (пустые ячейки не передаются)
+    batch_key_list = set(batch)
+    value_list = {}
+    for index in batch:
+        for ref_index in graph.get_precedents(index):
+            if ref_index in batch_key_list:
+                continue
+            if ref_index < 0:
+                value_list[ref_index] = (ref_index, storage.aggregate_list[ref_index], False)
+            elif storage.type_list[ref_index] != CellStorage.EMPTY:
+                value_list[ref_index] = (ref_index, storage.get_value(ref_index),
+                                         storage.type_list[ref_index] == CellStorage.ERROR)
+
+    return expression_list, list(value_list.values())
+
+
+def _calc_forked_batch(batch: List[int]) -> Tuple[List, List[int]]:
+    """
+    Рассчитать пакет в процессе, унаследовавшем лист (см. _fork_state)
+
+    :param batch: Ячейки с выражениями
+    :return: Значения выражений в порядке пакета и позиции выражений с ошибкой вычисления (значение текст ошибки)
+    """
+
+    storage, graph, calc_func_list = _fork_state
+    calc_components(storage, graph, calc_func_list, graph.get_calc_order(batch))
+
+    return _get_result(storage, batch)
+
+
+def _get_result(storage: CellStorage, batch: List[int]) -> Tuple[List, List[int]]:
+    """
+    Получить результат расчета пакета
+
+    :param storage: Хранилище значений ячеек
+    :param batch: Ячейки (и блоки диапазонов) пакета
+    :return: Значения выражений (сводные значения блоков) в порядке пакета
+        и позиции выражений с ошибкой вычисления (значение текст ошибки)
+    """
+
+    return [storage.get_value(index) if index >= 0 else storage.aggregate_list[index] for index in batch], \
+        [position for position, index in enumerate(batch)
+         if index >= 0 and storage.type_list[index] == CellStorage.ERROR]
+
+
+def _calc_batch(payload: _Payload) -> Tuple[List, List[int]]:
+    """
+    Рассчитать пакет (выполняется в процессе пула)
+
+    :param payload: Пакет расчета (см. _make_payload)
+    :return: Значения выражений в порядке пакета и позиции выражений с ошибкой вычисления (значение текст ошибки)
+    """
+
+    expression_list, value_list = payload
+
+    storage = SparseCellStorage()
+    for index, value, is_error in value_list:
+        if index < 0:
+            storage.aggregate_list[index] = value
+        elif is_error:
+            storage.set_error(index, value)
+        else:
+            storage.set_value(index, value)
+
+    graph = DependencyGraph()
+    calc_func_list = {}
+    for index, shape, param_list, precedent_list in expression_list:
+        graph.set_precedents(index, precedent_list)
+
+        # Блок диапазона
+        if shape is None:
+            calc_func_list[index] = make_block_func(param_list)
+            continue
+
+        calc_func_list[index] = compile_spec(shape, param_list)
+        storage.set_expression(index)
+
+    calc_components(storage, graph, calc_func_list, graph.get_calc_order())
+
+    return _get_result(storage, [index for index, _, _, _ in expression_list])
@@ -0,0 +1,116 @@
+"""
+Индекс диапазонов.
+
+Диапазон столбца разбивается на выровненные блоки строк (отрезки дерева отрезков): блок уровня L
+содержит 2^L строк и начинается со строки, кратной 2^L. Блоки являются вершинами графа зависимостей,
+их сводные значения (см. function_value.aggregate) вычисляются один раз в порядке зависимостей
+и используются всеми пересекающимися диапазонами. Расчет функции диапазона из N строк обходится
+в O(log N) блоков и не более 2 * 2^MIN_LEVEL ячеек на столбец.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+from excel.cell.function_value import make_block_func
+from excel.graph import DependencyGraph
+
+
+class RangeIndex:
+    """
+    Блоки диапазонов листа (книги).
+
+    Ключи блоков отрицательные и не пересекаются с индексами ячеек в хранилище. Блок минимального уровня
+    ссылается на свои ячейки, блок более высокого уровня на два дочерних блока. Блоки создаются при первом
+    обращении к содержащему их диапазону и не удаляются.
+    """
+
+    MIN_LEVEL = 3
+    """
+    Уровень самого маленького блока (блоки меньшего размера заменяются ячейками)
+    """
+
+    def __init__(self, graph: DependencyGraph, calc_func_list: Dict[int, Callable]):
+        """
+        :param graph: Граф зависимостей
+        :param calc_func_list: Функции расчета выражений по индексу ячейки (функции расчета блоков добавляются туда же)
+        """
+
+        self._graph: DependencyGraph = graph
+        self._calc_func_list: Dict[int, Callable] = calc_func_list
+
+        # Ключи блоков по началу столбца, шагу строки, уровню и номеру блока на уровне
+        self._block_list: Dict[Tuple[int, int, int, int], int] = {}
+
+    def get_keys(self, column_start: int, line_size: int, width: int, row_start: int, row_end: int) -> Tuple[int, ...]:
+        """
+        Получить ячейки и блоки, покрывающие диапазон (недостающие блоки создаются)
+
+        :param column_start: Индекс ячейки первой строки первого столбца диапазона
+        :param line_size: Кол-во ячеек в строке (шаг индекса между строками)
+        :param width: Кол-во столбцов диапазона
+        :param row_start: Номер первой строки диапазона (0..)
+        :param row_end: Номер последней строки диапазона (включительно)
+        :return: Индексы ячеек и ключи блоков
+        """
+
+        key_list: List[int] = []
+        block_list = self._block_list
+
+        for column in range(column_start, column_start + width):
+            row = row_start
+            while row <= row_end:
+                # Самый большой выровненный блок, начинающийся со строки и не выходящий за диапазон
+                level = (row_end - row + 1).bit_length() - 1
+                if row and (row & -row).bit_length() - 1 < level:
+                    level = (row & -row).bit_length() - 1
+                size = 1 << level
+
+                if level >= self.MIN_LEVEL:
+                    key = block_list.get((column, line_size, level, row >> level))
+                    key_list.append(key if key is not None else self._get_block(column, line_size, level, row >> level))
+                else:
+                    key_list += range(column + row * line_size, column + (row + size) * line_size, line_size)
+
+                row += size
+
+        return tuple(key_list)
+
+    def _get_block(self, column: int, line_size: int, level: int, position: int) -> int:
+        """
+        Получить ключ блока (блок и недостающие дочерние блоки создаются снизу вверх, без рекурсии)
+
+        :param column: Индекс ячейки первой строки столбца
+        :param line_size: Кол-во ячеек в строке
+        :param level: Уровень блока
+        :param position: Номер блока на уровне
+        """
+
+        block_list = self._block_list
+
+        # Обход без рекурсии: блок создается после создания недостающих дочерних блоков
+        stack = [(level, position)]
+        while stack:
+            block_level, block_position = stack[-1]
+            block = (column, line_size, block_level, block_position)
+            if block in block_list:
+                stack.pop()
+                continue
+
+            if block_level == self.MIN_LEVEL:
+                row = block_position << block_level
+                child_list = tuple(range(column + row * line_size, column + (row + (1 << block_level)) * line_size,
+                                         line_size))
+            else:
+                child_block_list = [(column, line_size, block_level - 1, block_position * 2),
+                                    (column, line_size, block_level - 1, block_position * 2 + 1)]
+                missing_list = [child_block[2:] for child_block in child_block_list if child_block not in block_list]
+                if missing_list:
+                    stack += missing_list
+                    continue
+                child_list = tuple(block_list[child_block] for child_block in child_block_list)
+
+            key = block_list[block] = -len(block_list) - 1
+            self._graph.set_precedents(key, child_list)
+            self._calc_func_list[key] = make_block_func(child_list)
+            stack.pop()
+
+        return block_list[(column, line_size, level, position)]
@@ -3,25 +3,82 @@
 Предоставляется функциональность добавления расчетных строк с ячейками, с последующей механикой расчета.
 """
 
-from typing import Dict, Tuple, Union
+from collections.abc import Mapping
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from weakref import WeakValueDictionary
 
-from excel.cell.cell import CellValue
-from excel.cell.expression_value import ExpressionValue
+from excel.cell.expression_template import CalcFuncList, ExpressionTemplate, SharedCalcFunc, _SHARED_MAX_COUNT, \
+    _TEMPLATE_MAX_SKIP_COUNT
+from excel.cell.expression_value import ExpressionValue, _CalcExpError, has_condition
+from excel.cell.lexer import parse_cell_value
+from excel.explain import SheetExplain
+from excel.graph import DependencyGraph
+from excel.range_index import RangeIndex
+from excel.stats import SheetStats
+from excel.storage import CellStorage, NotCalculatedError, SparseCellStorage
+
+if TYPE_CHECKING:
+    from excel.workbook import Workbook
 
 
 class Sheet:
     """
-    Лист
+    Лист.
+
+    Значения ячеек хранятся построчно в колоночном хранилище (см. CellStorage), ключом ячейки является
+    ее индекс (см. SheetSize.get_index). Выражения хранятся отдельно в виде функций расчета
+    и ссылок в графе зависимостей, в хранилище после расчета записывается их результат.
+    Диапазоны функций ссылаются на общие блоки строк (см. RangeIndex), ключи блоков в графе отрицательные.
+    Для листов с большим кол-вом пустых ячеек используется разреженное хранилище (см. SparseCellStorage).
+
+    Лист книги (см. Workbook) использует общие для всех листов книги хранилище, функции расчета и граф
+    зависимостей, ячейки листа занимают в хранилище непрерывный диапазон индексов начиная с индекса первой ячейки.
     """
 
-    def __init__(self, size_line: str):
+    def __init__(self, size_line: str, sparse: bool = False, stats: bool = False):
         """
         :param size_line: Строка задающая размер листа
+        :param sparse: Хранить только заполненные ячейки (пустые ячейки не занимают память)
+        :param stats: Собирать статистику обработки (см. get_stats)
         :raise: ValueError
         """
 
         self._size: SheetSize = SheetSize.parser(size_line)
-        self._cell_list: Dict[Tuple[int, int], Union[CellValue, str, int]] = {}
+        self._storage: CellStorage = SparseCellStorage() if sparse else CellStorage()
+        self._calc_func_list: Dict[int, Callable] = CalcFuncList()
+        self._graph: DependencyGraph = DependencyGraph()
+        self._range_index: RangeIndex = RangeIndex(self._graph, self._calc_func_list)
+
+        # Состояние последнего расчета (для пересчета измененных ячеек)
+        self._calculated: bool = False
+        self._changed_key_list: Set[int] = set()
+
+        # Измененные ячейки, зависящие от которых ячейки еще не отмечены как не вычисленные (см. evaluate)
+        self._stale_key_list: Set[int] = set()
+
+        # Выданные значения расчета, отделяемые от хранилища перед изменением ячеек (см. SheetValues)
+        self._values_list: WeakValueDictionary = WeakValueDictionary()
+
+        self._stats: Optional[SheetStats] = SheetStats() if stats else None
+
+        # Последнее общее выражение каждого столбца (см. add_line), кол-во ячеек столбца, разбираемых
+        # без общего выражения, и следующее такое кол-во, общие выражения с циклом расчета в порядке создания
+        # (см. calc_all)
+        self._column_template_list: List[Optional[ExpressionTemplate]] = [None] * self._size.x
+        self._column_skip_list: List[int] = [0] * self._size.x
+        self._column_backoff_list: List[int] = [0] * self._size.x
+        self._template_list: List[ExpressionTemplate] = []
+
+        # Общие функции расчета по тексту выражения разобранных ячеек (см. SharedCalcFunc)
+        self._shared_list: Dict[str, SharedCalcFunc] = {}
+
+        # Книга листа (см. Workbook), имя листа в книге и индекс первой ячейки листа в хранилище
+        self._workbook: Optional['Workbook'] = None
+        self._name: Optional[str] = None
+        self._offset: int = 0
+
+        self._line_count: int = 0
 
     def get_size(self) -> 'SheetSize':
         """
@@ -30,6 +87,24 @@ class Sheet:
 
         return self._size
 
+    def get_stats(self) -> Optional[SheetStats]:
+        """
+        Получить статистику обработки листа
+        :return: Статистика, либо None если сбор статистики не включен
+        """
+
+        return self._stats
+
+    def explain(self) -> SheetExplain:
+        """
+        Проанализировать зависимости ячеек: длина цепочек, кол-во влияющих и зависимых ячеек (см. SheetExplain)
+        :raise: RuntimeError
+        """
+
+        self._check_init()
+
+        return SheetExplain(self._graph, self._get_cell_key)
+
     def add_line(self, line: str):
         """
         Добавить строку с ячейками
@@ -38,6 +113,8 @@ class Sheet:
         :raise: ValueError
         """
 
+        start_time = perf_counter() if self._stats is not None else 0.0
+
         error_text = f'Строка со значением ячеек должна содержать ' \
                      f'"{self._size.x}" выражений разделенных символом табуляции!'
 
@@ -48,55 +125,861 @@ class Sheet:
         if not (len(cell_value_list) == self._size.x):
             raise ValueError(error_text)
 
-        if len(self._cell_list) >= self._size.y * self._size.x:
+        if self._line_count >= self._size.y:
             raise ValueError('Достигнут предел размерности таблицы по вертикали!')
 
-        # Заполнить текущую строку ячейками
-        line_number = int(len(self._cell_list) / self._size.x) + 1
+        # Выражение, совпадающее со сдвинутым выражением ячейки выше, либо ячейки слева (см. ExpressionTemplate),
+        # повторно не разбирается. Если общее выражение столбца не совпало ни с одной ячейкой, следующие ячейки
+        # столбца разбираются без общих выражений (кол-во таких ячеек удваивается до совпадения).
+        # Выражение, текст которого совпадает с текстом разобранной ранее ячейки, также не разбирается
+        # (см. SharedCalcFunc)
+        y = self._line_count + 1
+        template_list = self._column_template_list
+        skip_list = self._column_skip_list
+        text_list: Dict[int, str] = {}
         for i, value in enumerate(cell_value_list):
-            self._cell_list[(i + 1, line_number)] = CellValue.parser(value)
+            if not value:
+                cell_value_list[i] = ''
+                continue
+
+            if value[0] == '=':
+                template = template_list[i] if not skip_list[i] else None
+                if template is None or not template.match(value, i + 1, y):
+                    template = cell_value_list[i - 1] if i else None
+                    if template.__class__ is not ExpressionTemplate or not template.match(value, i + 1, y):
+                        shared = self._get_shared(value)
+                        if shared is not None:
+                            cell_value_list[i] = shared
+                            continue
+
+                        text_list[i] = value
+                        expression = ExpressionValue(value)
+                        if skip_list[i]:
+                            skip_list[i] -= 1
+                            cell_value_list[i] = expression
+                            continue
+                        self._update_column_skip(i)
+                        template = template_list[i] = ExpressionTemplate.from_expression(value, expression, i + 1, y)
+                        if template is None:
+                            cell_value_list[i] = expression
+                            continue
+                template_list[i] = cell_value_list[i] = template
+            else:
+                cell_value_list[i] = parse_cell_value(value)
+
+        # Заполнить текущую строку ячейками (добавленные ячейки уже пустые, ячейки листа книги добавлены заранее)
+        start = self._offset + self._line_count * self._size.x
+        if self._workbook is None:
+            self._storage.extend(self._size.x)
+        self._line_count += 1
+        # Ячейки строки новые (без функций расчета), простые значения записываются в хранилище напрямую
+        set_value = self._storage.set_value
+        for i, cell_value in enumerate(cell_value_list):
+            if cell_value.__class__ is int or cell_value.__class__ is str:
+                if cell_value != '':
+                    set_value(start + i, cell_value)
+            else:
+                self._set_cell_value(start + i, cell_value, text_list.get(i))
 
-    def calculate(self) -> Dict[Tuple[int, int], Union[str, int]]:
+        if self._stats is not None:
+            for cell_value in cell_value_list:
+                self._add_cell_stats(cell_value)
+            self._stats.add_phase_time('add_line', perf_counter() - start_time)
+
+    def set_cell(self, key: Tuple[int, int], value: str):
+        """
+        Изменить значение ячейки.
+        Пересчет значений выполняется вызовом recalculate.
+
+        :param key: Координаты ячейки (x, y)
+        :param value: Строковое значение ячейки
+        :raise: ValueError, RuntimeError
+        """
+
+        self._check_init()
+
+        index = self._size.get_index(*key) if isinstance(key, tuple) and len(key) == 2 else None
+        if index is None:
+            raise ValueError(f'Ячейка "{key}" находится за пределами листа!')
+        index += self._offset
+
+        cell_value = parse_cell_value(value)
+        if self._stats is not None:
+            self._add_cell_stats(cell_value)
+
+        # Ячейки общих выражений вычисляются циклами только при первом расчете,
+        # текст выражения ячейки может измениться
+        self._clear_templates()
+        self._shared_list.clear()
+
+        detach_values(self._values_list, self._storage)
+
+        self._set_cell_value(index, cell_value)
+        self._changed_key_list.add(index)
+        self._stale_key_list.add(index)
+
+        # Строки замененных значений остаются в таблице строк хранилища
+        self._storage.compact_texts_if_needed()
+
+    def calculate(self, workers: int = None) -> 'SheetValues':
         """
         Рассчитать значения
+
+        :param workers: Кол-во процессов для параллельного расчета независимых групп ячеек (см. calc_parallel),
+            по умолчанию расчет выполняется в текущем процессе
         :return Ключом является кортеж (x, y), значением вычисленное выражение
         """
 
-        if not (len(self._cell_list) == (self._size.x * self._size.y)):
+        # Лист книги рассчитывается вместе с листами, на которые он ссылается (см. Workbook.calculate)
+        if self._workbook is not None:
+            return self._workbook.calculate(workers)[self._name]
+
+        self._check_init()
+        start_time = perf_counter() if self._stats is not None else 0.0
+
+        # Значения не выражений уже находятся в хранилище.
+        # Вычислить результат для всех выражений в порядке зависимостей.
+        if workers is not None and workers > 1:
+            from excel.parallel import calc_parallel
+
+            calc_parallel(self._storage, self._graph, self._calc_func_list, workers)
+            calc_order = self._graph.get_calc_order() if self._stats is not None else []
+        else:
+            calc_order = calc_all(self._storage, self._graph, self._calc_func_list,
+                                  self._template_list if not (self._calculated or self._stale_key_list) else [],
+                                  self._stats is not None)
+
+        self._calculated = True
+        self._clear_templates()
+        self._changed_key_list.clear()
+        self._stale_key_list.clear()
+
+        if self._stats is not None:
+            self._add_calc_stats(calc_order)
+            self._stats.add_phase_time('calculate', perf_counter() - start_time)
+
+        values = SheetValues(self._size, self._storage)
+        self._values_list[id(values)] = values
+
+        return values
+
+    def recalculate(self) -> Dict[Tuple[int, int], Union[str, int]]:
+        """
+        Пересчитать значения после изменения ячеек (см. set_cell).
+
+        Пересчитываются только измененные ячейки и ячейки, зависящие от них (транзитивно),
+        остальные значения сохраняются с предыдущего расчета.
+        Если расчет ранее не выполнялся, то выполняется полный расчет (см. calculate).
+
+        :return Значения пересчитанных ячеек. Ключом является кортеж (x, y), значением вычисленное выражение
+        """
+
+        # Для листа книги пересчитываются измененные ячейки всех листов (см. Workbook.recalculate)
+        if self._workbook is not None:
+            return self._workbook.recalculate().get(self._name, {})
+
+        if not self._calculated:
+            return dict(self.calculate())
+
+        start_time = perf_counter() if self._stats is not None else 0.0
+
+        dirty_key_list = get_dependent_cone(self._graph, self._changed_key_list)
+        calc_order = self._graph.get_calc_order(dirty_key_list)
+        self._calc(calc_order)
+        self._changed_key_list.clear()
+        self._stale_key_list.clear()
+
+        if self._stats is not None:
+            self._add_calc_stats(calc_order)
+            self._stats.add_phase_time('recalculate', perf_counter() - start_time)
+
+        return {self._size.get_key(index): self._storage.get_value(index) for index in dirty_key_list if index >= 0}
+
+    def get_value(self, key: Tuple[int, int]) -> Union[str, int]:
+        """
+        Получить значение ячейки с вычислением по требованию (см. evaluate)
+
+        :param key: Координаты ячейки (x, y)
+        :raise: ValueError, RuntimeError
+        """
+
+        return self.evaluate([key])[key]
+
+    def evaluate(self, key_list: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], Union[str, int]]:
+        """
+        Вычислить значения заданных ячеек по требованию.
+
+        Вычисляются только не вычисленные ранее ячейки, от которых (транзитивно) зависят заданные ячейки,
+        результат сохраняется и повторно не вычисляется. Ячейки не выбранных аргументов условных функций
+        (см. ConditionValue) не вычисляются. Изменения ячеек (см. set_cell) учитываются:
+        зависящие от них ячейки вычисляются заново при следующем обращении.
+
+        :param key_list: Координаты ячеек (x, y)
+        :return: Ключом является кортеж (x, y), значением вычисленное выражение
+        :raise: ValueError, RuntimeError
+        """
+
+        self._check_init()
+        start_time = perf_counter() if self._stats is not None else 0.0
+
+        index_list = {}
+        for key in key_list:
+            index = self._size.get_index(*key) if isinstance(key, tuple) and len(key) == 2 else None
+            if index is None:
+                raise ValueError(f'Ячейка "{key}" находится за пределами листа!')
+            index_list[key] = self._offset + index
+
+        # Отметить ячейки (и блоки диапазонов), зависящие от измененных, как не вычисленные
+        aggregate_list = self._storage.aggregate_list
+        if self._stale_key_list:
+            for index in get_dependent_cone(self._graph, self._stale_key_list) - self._stale_key_list:
+                if index < 0:
+                    aggregate_list.pop(index, None)
+                else:
+                    self._storage.set_expression(index)
+            self._stale_key_list.clear()
+
+        # Вычислить не вычисленные ячейки по мере обращения к ним (не выбранные аргументы условных функций
+        # не вычисляются)
+        type_list = self._storage.type_list
+        process_key_list = list(dict.fromkeys(index for index in index_list.values()
+                                              if type_list[index] == CellStorage.EXPRESSION))
+        calc_order = []
+        if process_key_list:
+            calculated_list, pending_list = calc_lazy(self._storage, self._graph, self._calc_func_list,
+                                                    process_key_list)
+            calc_order = [[index] for index in calculated_list]
+
+            # Циклы вычисляются в порядке графа зависимостей (как при полном расчете),
+            # вычисленные по требованию ячейки вычисляются заново. Ячейка, вычисленная по требованию
+            # из значения ячейки цикла, может входить в этот цикл, поэтому также вычисляется заново
+            if pending_list or self._has_circle_ref(calculated_list):
+                for index in calculated_list:
+                    if index < 0:
+                        aggregate_list.pop(index)
+                    else:
+                        self._storage.set_expression(index)
+                calc_order = self._get_cone_order(process_key_list)
+                self._calc(calc_order)
+
+        if self._stats is not None:
+            self._add_calc_stats(calc_order)
+            self._stats.add_phase_time('evaluate', perf_counter() - start_time)
+
+        return {key: self._storage.get_value(index) for key, index in index_list.items()}
+
+    def _has_circle_ref(self, key_list: List[int]) -> bool:
+        """
+        Ссылаются ли ячейки (и блоки диапазонов) на ячейку цикла, либо на блок с ошибкой вычисления
+        (ошибка блока может быть циклической ссылкой)
+
+        :param key_list: Вычисленные ячейки
+        """
+
+        # Без ячеек циклов (текст ошибки не интернирован) проверка не требуется
+        circle_ref_text = str(_CalcExpError.circle_ref())
+        if not self._storage.has_text(circle_ref_text):
+            return False
+
+        type_list = self._storage.type_list
+        aggregate_list = self._storage.aggregate_list
+
+        for index in key_list:
+            for ref_index in self._graph.get_precedents(index):
+                if ref_index < 0:
+                    if ref_index in aggregate_list and aggregate_list[ref_index][4]:
+                        return True
+                elif type_list[ref_index] == CellStorage.ERROR \
+                        and self._storage.get_value(ref_index) == circle_ref_text:
+                    return True
+
+        return False
+
+    def _get_cone_order(self, key_list: List[int]) -> List[List[int]]:
+        """
+        Получить порядок вычисления не вычисленных ячеек (и блоков диапазонов), от которых транзитивно зависят
+        заданные ячейки (см. DependencyGraph.get_calc_order). Обход без рекурсии!
+
+        Конус строится по всем ссылкам (в том числе через вычисленные ячейки), поэтому циклы совпадают с циклами
+        полного расчета. Вычисленные ячейки цикла с не вычисленными ячейками отмечаются как не вычисленные
+        (цикл вычисляется целиком, см. calc_components), компоненты из вычисленных ячеек пропускаются.
+
+        :param key_list: Не вычисленные ячейки
+        """
+
+        type_list = self._storage.type_list
+        aggregate_list = self._storage.aggregate_list
+
+        cone_key_list = set()
+        process_key_list = list(key_list)
+        while process_key_list:
+            index = process_key_list.pop()
+            if index not in cone_key_list:
+                cone_key_list.add(index)
+                process_key_list += self._graph.get_precedents(index)
+
+        calc_order = []
+        for component in self._graph.get_calc_order(cone_key_list):
+            if all(index in aggregate_list if index < 0 else type_list[index] != CellStorage.EXPRESSION
+                   for index in component):
+                continue
+
+            if len(component) > 1:
+                for index in component:
+                    if index < 0:
+                        aggregate_list.pop(index, None)
+                    else:
+                        self._storage.set_expression(index)
+
+            calc_order.append(component)
+
+        return calc_order
+
+    def _attach(self, workbook: 'Workbook', name: str, offset: int, storage: CellStorage, graph: DependencyGraph,
+                calc_func_list: Dict[int, Callable], range_index: RangeIndex, changed_key_list: Set[int],
+                stale_key_list: Set[int], values_list: WeakValueDictionary):
+        """
+        Присоединить лист к книге (см. Workbook.add_sheet): лист использует общее состояние расчета книги
+
+        :param workbook: Книга
+        :param name: Имя листа в книге
+        :param offset: Индекс первой ячейки листа в хранилище книги (ячейки листа уже добавлены в хранилище)
+        :param storage: Хранилище значений ячеек книги
+        :param graph: Граф зависимостей книги
+        :param calc_func_list: Функции расчета выражений книги
+        :param range_index: Блоки диапазонов книги
+        :param changed_key_list: Измененные ячейки книги (для пересчета)
+        :param stale_key_list: Измененные ячейки книги (для вычисления по требованию)
+        :param values_list: Выданные значения расчета книги
+        """
+
+        self._workbook = workbook
+        self._name = name
+        self._offset = offset
+        self._storage = storage
+        self._graph = graph
+        self._calc_func_list = calc_func_list
+        self._range_index = range_index
+        self._changed_key_list = changed_key_list
+        self._stale_key_list = stale_key_list
+        self._values_list = values_list
+
+    def _get_cell_key(self, index: int) -> Union[Tuple[int, int], Tuple[int, int, str], None]:
+        """
+        Получить ключ ячейки по индексу в хранилище: координаты (x, y),
+        для ячейки другого листа книги (x, y, имя листа)
+
+        :param index: Индекс ячейки
+        :return: Ключ ячейки, либо None для блока диапазона (см. RangeIndex)
+        """
+
+        if index < 0:
+            return None
+
+        if self._workbook is None:
+            return self._size.get_key(index)
+
+        key = self._workbook._get_cell_key(index)
+        return key[:2] if key[2] == self._name else key
+
+    def _get_range_keys(self, ref: Tuple) -> Optional[Tuple[int, ...]]:
+        """
+        Получить ячейки и блоки диапазона листа (см. RangeIndex.get_keys)
+
+        :param ref: Ключ диапазона (x1, y1, x2, y2), ключи другого вида (ссылки на другие листы) не корректны
+        :return: Индексы ячеек и ключи блоков, либо None для диапазона за пределами листа
+        """
+
+        if len(ref) != 4:
+            return None
+
+        x1, y1, x2, y2 = ref
+        if self._size.get_index(x1, y1) is None or self._size.get_index(x2, y2) is None:
+            return None
+
+        return self._range_index.get_keys(self._offset + x1 - 1, self._size.x, x2 - x1 + 1, y1 - 1, y2 - 1)
+
+    def _set_cell_value(self, index: int,
+                        cell_value: Union[int, str, ExpressionValue, ExpressionTemplate, SharedCalcFunc],
+                        text: str = None):
+        """
+        Задать значение ячейки (выражение компилируется в функцию расчета, ссылки добавляются в граф зависимостей)
+
+        :param index: Индекс ячейки
+        :param cell_value: Значение ячейки (см. parse_cell_value), общее выражение (см. ExpressionTemplate),
+            либо общая функция расчета ячейки с тем же текстом выражения (см. SharedCalcFunc)
+        :param text: Текст разобранного выражения (для поиска одинаковых выражений, см. _get_shared)
+        """
+
+        if cell_value.__class__ is SharedCalcFunc:
+            if self._stats is not None:
+                ref_count, not_valid_ref_count = cell_value.get_ref_count()
+                self._stats.ref_count += ref_count
+                self._stats.not_valid_ref_count += not_valid_ref_count
+
+            self._calc_func_list[index] = cell_value
+            self._graph.set_precedents(index, self._graph.get_precedents(cell_value.get_key()))
+            self._storage.set_expression(index)
+            return
+
+        template = None
+        if cell_value.__class__ is ExpressionTemplate:
+            # Ссылки ячейки общего выражения получаются сдвигом ссылок общего выражения
+            template = cell_value
+            cell_value = template.get_expression()
+            ref_list = template.get_ref_list(*self._size.get_key(index - self._offset))
+        elif cell_value.__class__ is ExpressionValue:
+            ref_list = {ref: ref for ref in cell_value.get_ref_list()}
+
+        error = None
+        if cell_value.__class__ is ExpressionValue and not ref_list:
+            # Выражение без ссылок вычисляется при разборе, ячейка хранится как значение
+            # (без функции расчета и без вершины графа зависимостей)
+            try:
+                cell_value = cell_value.compile(ref_list.__getitem__)(self._storage)
+            except _CalcExpError as e:
+                error = str(e)
+                if self._stats is not None:
+                    self._stats.error_count[error] = self._stats.error_count.get(error, 0) + 1
+
+        if cell_value.__class__ is ExpressionValue and error is None:
+            # Индексы ссылок (ячейки и блоки диапазонов) определяются один раз для компиляции и для графа зависимостей.
+            # Ссылки на другие листы определяются книгой, для листа вне книги они не корректны.
+            if self._workbook is None:
+                get_index = self._size.get_index
+                ref_index_list = {ref: get_index(cell_ref[0], cell_ref[1]) if len(cell_ref) == 2
+                                  else self._get_range_keys(cell_ref) for ref, cell_ref in ref_list.items()}
+            else:
+                get_ref_index = self._workbook._get_ref_index
+                ref_index_list = {ref: get_ref_index(self._name, cell_ref) for ref, cell_ref in ref_list.items()}
+
+            not_valid_ref_count = sum(1 for i in ref_index_list.values() if i is None)
+            if self._stats is not None:
+                self._stats.ref_count += len(ref_index_list)
+                self._stats.not_valid_ref_count += not_valid_ref_count
+
+            if text is not None:
+                if len(self._shared_list) >= _SHARED_MAX_COUNT:
+                    self._shared_list.clear()
+                self._shared_list[text] = SharedCalcFunc(index, len(ref_index_list), not_valid_ref_count)
+
+            precedent_list = []
+            for ref_index in ref_index_list.values():
+                if ref_index.__class__ is int:
+                    precedent_list.append(ref_index)
+                elif ref_index is not None:
+                    precedent_list += ref_index
+
+            # Функции расчета ячеек цикла расчета общего выражения не хранятся (см. CalcFuncList)
+            key_list = template.add_key(index, ref_index_list) if template is not None else []
+            if key_list:
+                for key in key_list:
+                    self._calc_func_list.set_template(key, template)
+                if len(template.get_keys()) == len(key_list):
+                    self._template_list.append(template)
+            else:
+                self._calc_func_list[index] = cell_value.compile(ref_index_list.__getitem__)
+            self._graph.set_precedents(index, precedent_list)
+            self._storage.set_expression(index)
+        else:
+            if self._calc_func_list.pop(index, None) is not None:
+                self._graph.remove(index)
+            if error is not None:
+                self._storage.set_error(index, error)
+            else:
+                self._storage.set_value(index, cell_value)
+
+    def _add_cell_stats(self, cell_value: Union[int, str, ExpressionValue, ExpressionTemplate, SharedCalcFunc]):
+        """
+        Учесть разобранное значение ячейки в статистике
+
+        :param cell_value: Значение ячейки (см. _set_cell_value)
+        """
+
+        if cell_value.__class__ is ExpressionValue or cell_value.__class__ is ExpressionTemplate \
+                or cell_value.__class__ is SharedCalcFunc:
+            self._stats.add_cell(SheetStats.EXPRESSION)
+        elif cell_value.__class__ is int:
+            self._stats.add_cell(SheetStats.NUMBER)
+        elif cell_value == '':
+            self._stats.add_cell(SheetStats.EMPTY)
+        else:
+            self._stats.add_cell(SheetStats.TEXT)
+
+    def _add_calc_stats(self, calc_order: List[List[int]]):
+        """
+        Учесть результат расчета в статистике: глубина вычисления, циклы и ошибки.
+        Глубина ячейки на единицу больше максимальной глубины влияющих ячеек, вычисленных в этом расчете
+        (блоки диапазонов глубину не увеличивают).
+
+        :param calc_order: Порядок вычисления (см. DependencyGraph.get_calc_order)
+        """
+
+        stats = self._stats
+        depth_list: Dict[int, int] = {}
+
+        for component in calc_order:
+            if self._graph.is_circle(component):
+                stats.circle_count += 1
+
+            for index in component:
+                depth_list[index] = (index >= 0) + max((depth_list.get(ref_index, 0)
+                                                        for ref_index in self._graph.get_precedents(index)), default=0)
+
+                if index >= 0 and self._storage.type_list[index] == CellStorage.ERROR:
+                    error_text = self._storage.get_value(index)
+                    stats.error_count[error_text] = stats.error_count.get(error_text, 0) + 1
+
+        stats.max_depth = max(stats.max_depth, max(depth_list.values(), default=0))
+
+    def _update_column_skip(self, i: int):
+        """
+        Задать кол-во ячеек столбца, разбираемых без общих выражений, перед созданием общего выражения ячейки
+
+        :param i: Индекс столбца
+        """
+
+        template = self._column_template_list[i]
+        if template is None:
+            return
+
+        if template.get_match_count():
+            self._column_backoff_list[i] = 0
+        else:
+            self._column_backoff_list[i] = min(2 * self._column_backoff_list[i] + 1, _TEMPLATE_MAX_SKIP_COUNT)
+            self._column_skip_list[i] = self._column_backoff_list[i]
+
+    def _get_shared(self, text: str) -> Optional[SharedCalcFunc]:
+        """
+        Получить общую функцию расчета по тексту выражения, разобранного ранее в другой ячейке.
+        Функция расчета первой ячейки заменяется общей при первом совпадении.
+
+        :param text: Текст выражения
+        :return: Общая функция расчета, либо None если выражение с таким текстом не разбиралось
+        """
+
+        shared = self._shared_list.get(text)
+        if shared is not None and not shared.is_bound():
+            shared.bind(self._calc_func_list[shared.get_key()])
+            self._calc_func_list[shared.get_key()] = shared
+
+        return shared
+
+    def _clear_templates(self):
+        """
+        Отказаться от вычисления ячеек общих выражений циклами (см. calc_all)
+        """
+
+        for template in self._template_list:
+            template.clear_keys()
+        self._template_list.clear()
+
+    def _check_init(self):
+        """
+        Проверить окончание инициализации (заданы все ячейки листа, для листа книги все ячейки всех листов книги)
+        :raise: RuntimeError
+        """
+
+        if self._workbook is not None:
+            self._workbook._check_init()
+            return
+
+        if not (self._line_count == self._size.y):
             raise RuntimeError(f'Инициализация не закончена. '
-                               f'Кол-во заданных ячеек "{len(self._cell_list)}" из "{self._size.x * self._size.y}"')
+                               f'Кол-во заданных ячеек "{self._line_count * self._size.x}" '
+                               f'из "{self._size.x * self._size.y}"')
+
+    def _calc(self, calc_order: List[List[int]]):
+        """
+        Вычислить выражения ячеек.
+        Все ячейки цикла получают "Циклическая ссылка", зависящие от них "Ошибка вычисления".
+
+        :param calc_order: Порядок вычисления (см. DependencyGraph.get_calc_order)
+        """
+
+        calc_components(self._storage, self._graph, self._calc_func_list, calc_order)
+
+
+def get_dependent_cone(graph: DependencyGraph, key_list: Set[int]) -> Set[int]:
+    """
+    Получить ячейки и все (транзитивно) зависящие от них ячейки.
+    Обход без рекурсии!
+
+    :param graph: Граф зависимостей
+    :param key_list: Индексы ячеек
+    """
 
-        sheet_cell_value = {}
+    dependent_key_list = set(key_list)
+    process_key_list = list(key_list)
+    while process_key_list:
+        for dependent_key in graph.get_dependents(process_key_list.pop()):
+            if dependent_key not in dependent_key_list:
+                dependent_key_list.add(dependent_key)
+                process_key_list.append(dependent_key)
 
-        # Вычислить результат для всех не выражений.
-        for key, cell_value in self._cell_list.items():
-            sheet_cell_value[key] = \
-                cell_value.get_value() if not isinstance(cell_value, ExpressionValue) else cell_value
+    return dependent_key_list
+
+
+def calc_components(storage: CellStorage, graph: DependencyGraph, calc_func_list: Dict[int, Callable],
+                    calc_order: List[List[int]]):
+    """
+    Вычислить выражения ячеек и записать результат в хранилище.
+    Все ячейки цикла получают "Циклическая ссылка", зависящие от них "Ошибка вычисления"
+    (цикл с условными функциями вычисляется по требованию, см. calc_lazy).
+    Сводные значения блоков диапазонов (отрицательные ключи, см. RangeIndex) записываются в CellStorage.aggregate_list,
+    блок цикла получает признак ошибки.
+
+    :param storage: Хранилище значений ячеек
+    :param graph: Граф зависимостей
+    :param calc_func_list: Функции расчета выражений по индексу ячейки
+    :param calc_order: Порядок вычисления (см. DependencyGraph.get_calc_order)
+    """
+
+    circle_ref_text = str(_CalcExpError.circle_ref())
+    aggregate_list = storage.aggregate_list
+
+    # Ячейки, вычисленные общими функциями расчета (значения копируются остальным ячейкам, см. SharedCalcFunc)
+    shared_key_list: Dict[SharedCalcFunc, int] = {}
+
+    for component in calc_order:
+        if len(component) == 1 and not graph.is_circle(component):
+            index = component[0]
+            calc_func = calc_func_list[index]
+            if index < 0:
+                aggregate_list[index] = calc_func(storage)
+                continue
+            try:
+                if calc_func.__class__ is SharedCalcFunc:
+                    storage.set_value(index, calc_func.calc(storage, index, shared_key_list))
+                else:
+                    storage.set_value(index, calc_func(storage))
+            except _CalcExpError as e:
+                storage.set_error(index, str(e))
+        else:
+            # Цикл через не выбранные аргументы условных функций циклом не является:
+            # ячейки, значения которых не зависят от цикла, вычисляются
+            if any(index >= 0 and has_condition(calc_func_list[index]) for index in component):
+                for index in component:
+                    if index < 0:
+                        aggregate_list.pop(index, None)
+                    else:
+                        storage.set_expression(index)
+                component = calc_lazy(storage, graph, calc_func_list, component, False)[1]
+
+            for index in component:
+                if index < 0:
+                    aggregate_list[index] = (0, 0, None, None, True)
+                else:
+                    storage.set_error(index, circle_ref_text)
+
+
+def calc_all(storage: CellStorage, graph: DependencyGraph, calc_func_list: Dict[int, Callable],
+             template_list: List[ExpressionTemplate], full_order: bool = False) -> List[List[int]]:
+    """
+    Вычислить выражения всех ячеек и записать результат в хранилище (см. calc_components).
+
+    Сначала ячейки общих выражений вычисляются циклами (см. ExpressionTemplate.calc) в порядке создания общих
+    выражений, ячейки со ссылками на не вычисленные выражения (и циклы) пропускаются. Остальные ячейки
+    вычисляются в порядке графа зависимостей, вычисленные циклами ячейки считаются вычисленными.
+    Значения ячеек, вычисленных ранее (см. calc_lazy), должны быть актуальны, такие ячейки вычисляются заново
+    в порядке графа зависимостей.
+
+    :param storage: Хранилище значений ячеек
+    :param graph: Граф зависимостей
+    :param calc_func_list: Функции расчета выражений по индексу ячейки
+    :param template_list: Общие выражения с циклом расчета
+    :param full_order: Вернуть порядок вычисления всех ячеек, включая вычисленные циклами (для статистики)
+    :return: Порядок вычисления (см. DependencyGraph.get_calc_order)
+    """
 
-        # Вычислить результат для всех выражений.
-        for key, cell_value in sheet_cell_value.items():
-            if isinstance(cell_value, ExpressionValue):
-                cell_value.calc(key, sheet_cell_value)
+    calculated_list: List[int] = []
+    for template in template_list:
+        calculated_list += template.calc(storage)
 
-        return sheet_cell_value
+    if not calculated_list:
+        calc_order = graph.get_calc_order()
+        calc_components(storage, graph, calc_func_list, calc_order)
+        return calc_order
+
+    calculated_key_list = set(calculated_list)
+    calc_order = graph.get_calc_order([index for index in calc_func_list if index not in calculated_key_list])
+    calc_components(storage, graph, calc_func_list, calc_order)
+
+    return [[index] for index in calculated_list] + calc_order if full_order else calc_order
+
+
+def calc_lazy(storage: CellStorage, graph: DependencyGraph, calc_func_list: Dict[int, Callable], key_list: List[int],
+              expand: bool = True) -> Tuple[List[int], List[int]]:
+    """
+    Вычислить выражения ячеек по требованию и записать результат в хранилище.
+
+    Выражение без условных функций вычисляется после вычисления всех его ссылок (см. DependencyGraph).
+    Выражение с условными функциями вычисляется сразу, а при обращении к не вычисленной ячейке
+    (см. NotCalculatedError) откладывается до ее вычисления, поэтому ячейки не выбранных аргументов
+    условных функций не вычисляются. Ячейки циклов (и ожидающие их ячейки) остаются не вычисленными.
+    Обход без рекурсии!
+
+    :param storage: Хранилище значений ячеек
+    :param graph: Граф зависимостей
+    :param calc_func_list: Функции расчета выражений по индексу ячейки
+    :param key_list: Ячейки (и блоки диапазонов), отмеченные как не вычисленные
+    :param expand: Вычислять не вычисленные ячейки, к которым происходит обращение, иначе только заданные ячейки
+    :return: Вычисленные ячейки в порядке вычисления и не вычисленные ячейки
+    """
+
+    type_list = storage.type_list
+    aggregate_list = storage.aggregate_list
+
+    active_key_list = set(key_list)
+    calculated_list: List[int] = []
+
+    # Ячейки, ожидающие вычисления ячейки, и кол-во не вычисленных ссылок ожидающего выражения без условных функций
+    waiting_list: Dict[int, List[int]] = {}
+    wait_count: Dict[int, int] = {}
+
+    process_key_list = list(reversed(key_list))
+    while process_key_list:
+        index = process_key_list.pop()
+        calc_func = calc_func_list[index]
+
+        ref_list = None
+        if index < 0 or not has_condition(calc_func):
+            ref_list = [ref_index for ref_index in graph.get_precedents(index)
+                        if (ref_index not in aggregate_list if ref_index < 0
+                            else type_list[ref_index] == CellStorage.EXPRESSION)]
+
+        if not ref_list:
+            try:
+                value = calc_func(storage)
+            except NotCalculatedError as e:
+                ref_list = [e.index]
+            except _CalcExpError as e:
+                storage.set_error(index, str(e))
+            else:
+                if index < 0:
+                    aggregate_list[index] = value
+                else:
+                    storage.set_value(index, value)
+
+        if ref_list:
+            # Отложить до вычисления ячеек, к которым происходит обращение
+            if len(ref_list) > 1:
+                wait_count[index] = len(ref_list)
+            for ref_index in ref_list:
+                waiting_list.setdefault(ref_index, []).append(index)
+                if expand and ref_index not in active_key_list:
+                    active_key_list.add(ref_index)
+                    process_key_list.append(ref_index)
+            continue
+
+        calculated_list.append(index)
+        for waiting_index in waiting_list.pop(index, ()):
+            count = wait_count.pop(waiting_index, 1) - 1
+            if count:
+                wait_count[waiting_index] = count
+            else:
+                process_key_list.append(waiting_index)
+
+    return calculated_list, [index for index in active_key_list
+                             if (index not in aggregate_list if index < 0
+                                 else type_list[index] == CellStorage.EXPRESSION)]
+
+
+def detach_values(values_list: WeakValueDictionary, storage: CellStorage):
+    """
+    Отделить выданные значения расчета от хранилища перед изменением ячеек (копирование при записи):
+    хранилище копируется один раз для всех значений, после чего значения не связаны с листом
+
+    :param values_list: Выданные значения расчета по id (см. SheetValues), список очищается
+    :param storage: Хранилище значений ячеек
+    """
+
+    if not values_list:
+        return
+
+    storage_copy = storage.copy()
+    for values in list(values_list.values()):
+        values._storage = storage_copy
+    values_list.clear()
+
+
+class SheetValues(Mapping):
+    """
+    Вычисленные значения листа.
+
+    Значения расчета, при котором они получены, без копирования (ключи ячеек не создаются заранее): значения
+    читаются из хранилища листа до первого изменения ячеек, перед изменением хранилище копируется
+    (см. detach_values). Ключом является кортеж (x, y), значением вычисленное выражение (ошибка вычисления
+    в виде текста).
+    """
+
+    def __init__(self, size: 'SheetSize', storage: CellStorage, offset: int = 0):
+        """
+        :param size: Размер листа
+        :param storage: Хранилище значений ячеек
+        :param offset: Индекс первой ячейки листа в хранилище (для листа книги)
+        """
+
+        self._size: SheetSize = size
+        self._storage: CellStorage = storage
+        self._offset: int = offset
+
+    def __getitem__(self, key: Tuple[int, int]) -> Union[str, int]:
+        index = self._size.get_index(*key) if isinstance(key, tuple) and len(key) == 2 else None
+        if index is None:
+            raise KeyError(key)
+
+        return self._storage.get_value(self._offset + index)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for y in range(1, self._size.y + 1):
+            for x in range(1, self._size.x + 1):
+                yield x, y
+
+    def __len__(self) -> int:
+        return self._size.y * self._size.x
+
+    def get_line(self, y: int) -> List[Union[str, int]]:
+        """
+        Получить значения строки
+        :param y: Номер строки (1..)
+        """
+
+        start = self._offset + (y - 1) * self._size.x
+        return [self._storage.get_value(index) for index in range(start, start + self._size.x)]
+
+    def format_line(self, y: int) -> str:
+        """
+        Получить строковое представление значений строки (разделенных символом табуляции)
+        :param y: Номер строки (1..)
+        """
+
+        return self._storage.format_line(self._offset + (y - 1) * self._size.x, self._size.x)
+
+    def format_lines(self) -> Iterator[str]:
+        """
+        Получить строковое представление значений всех строк по порядку (см. format_line).
+        Для разреженного листа перебираются только заполненные ячейки.
+        """
+
+        return self._storage.format_lines(self._size.x, self._offset, self._size.y * self._size.x)
 
 
 class SheetSize:
     """
     Размер листа.
 
-    Максимальные размеры листа расчитываются исходя из утверждения
-    'Ссылки на ячейки состоят из одной латинской буквы и следующей за ней цифры'.
+    Максимальные размеры листа соответствуют диапазону ссылок A1:XFD1048576.
     """
 
-    MAX_Y = 9
+    MAX_Y = 1048576
     """
-    Максимальный размер листа по вертикали (1-9)
+    Максимальный размер листа по вертикали (1-1048576)
     """
 
-    MAX_X = 26
+    MAX_X = 16384
     """
-    Максимальный размер листа по горизонтали (A-Z)
+    Максимальный размер листа по горизонтали (A-XFD)
     """
 
     def __init__(self, y: int, x: int):
@@ -129,6 +1012,30 @@ class SheetSize:
         """
         return self._x
 
+    def get_index(self, x: int, y: int) -> Union[int, None]:
+        """
+        Получить индекс ячейки (ячейки нумеруются построчно с 0)
+
+        :param x: Координата по горизонтали (1..)
+        :param y: Координата по вертикали (1..)
+        :return: Индекс, либо None для ячейки за пределами листа
+        """
+
+        if 0 < x <= self._x and 0 < y <= self._y:
+            return (y - 1) * self._x + x - 1
+
+        return None
+
+    def get_key(self, index: int) -> Tuple[int, int]:
+        """
+        Получить координаты ячейки по индексу (см. get_index)
+
+        :param index: Индекс ячейки
+        :rtype: tuple(int, int)
+        """
+
+        return index % self._x + 1, index // self._x + 1
+
     @classmethod
     def parser(cls, line: str) -> 'SheetSize':
         """
@@ -0,0 +1,82 @@
+"""
+Статистика обработки листа.
+Счетчики собираются только при включенной статистике (см. Sheet), в противном случае обработка не замедляется.
+"""
+
+from typing import Dict, Union
+
+
+class SheetStats:
+    """
+    Статистика листа.
+
+        * Кол-во разобранных ячеек по типам значений,
+        * Кол-во ссылок выражений (корректных и за пределами листа),
+        * Максимальная глубина вычисления (длина самой длинной цепочки зависимых выражений),
+        * Кол-во циклов и ячеек с ошибками вычисления (по тексту ошибки),
+        * Время этапов обработки в секундах (суммарно по всем вызовам).
+    """
+
+    NUMBER = 'number'
+    TEXT = 'text'
+    EMPTY = 'empty'
+    EXPRESSION = 'expression'
+
+    def __init__(self):
+        """
+        """
+
+        self.cell_count: Dict[str, int] = {self.NUMBER: 0, self.TEXT: 0, self.EMPTY: 0, self.EXPRESSION: 0}
+        self.ref_count: int = 0
+        self.not_valid_ref_count: int = 0
+        self.max_depth: int = 0
+        self.circle_count: int = 0
+        self.error_count: Dict[str, int] = {}
+        self.phase_time: Dict[str, float] = {}
+
+    def add_cell(self, cell_type: str):
+        """
+        Учесть разобранную ячейку
+
+        :param cell_type: Тип значения ячейки
+        """
+
+        self.cell_count[cell_type] += 1
+
+    def add_phase_time(self, phase: str, seconds: float):
+        """
+        Учесть время этапа
+
+        :param phase: Имя этапа
+        :param seconds: Время в секундах
+        """
+
+        self.phase_time[phase] = self.phase_time.get(phase, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Union[int, Dict]]:
+        """
+        Получить значения счетчиков
+        """
+
+        return {'cell_count': dict(self.cell_count),
+                'ref_count': self.ref_count,
+                'not_valid_ref_count': self.not_valid_ref_count,
+                'max_depth': self.max_depth,
+                'circle_count': self.circle_count,
+                'error_count': dict(self.error_count),
+                'phase_time': dict(self.phase_time)}
+
+    def format(self) -> str:
+        """
+        Получить строковое представление (строка на каждый счетчик, имя и значение разделены символом табуляции)
+        """
+
+        line_list = []
+        for name, value in self.to_dict().items():
+            if isinstance(value, dict):
+                line_list += [f'{name}.{key}\t{item:.6f}' if isinstance(item, float) else f'{name}.{key}\t{item}'
+                              for key, item in value.items()]
+            else:
+                line_list.append(f'{name}\t{value}')
+
+        return '\n'.join(line_list)
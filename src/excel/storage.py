@@ -0,0 +1,447 @@
+"""
+Хранилище значений ячеек листа.
+Значения хранятся по колонкам (в массивах) без создания объекта на каждую ячейку.
+"""
+
+import copy
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+_TEXT_COMPACT_MIN_COUNT = 1024
+"""
+Минимальное кол-во строк, добавленных в таблицу интернированных строк после уплотнения,
+при котором таблица уплотняется (см. CellStorage.compact_texts_if_needed)
+"""
+
+
+class NotCalculatedError(LookupError):
+    """
+    Обращение к не вычисленному выражению (ячейка типа CellStorage.EXPRESSION, либо отсутствующий блок диапазона).
+    Позволяет вычислять влияющие ячейки по требованию (см. calc_lazy)
+    """
+
+    def __init__(self, index: int):
+        """
+        :param index: Индекс ячейки (ключ блока диапазона)
+        """
+
+        super().__init__(index)
+        self.index: int = index
+
+
+class CellStorage:
+    """
+    Колоночное хранилище значений ячеек.
+
+    Для каждой ячейки (по индексу) хранится тип значения (массив байт) и целое число (массив int64):
+        * для чисел само значение,
+        * для текста и ошибок вычисления номер строки в таблице интернированных строк,
+        * числа за пределами int64 хранятся в отдельной таблице.
+    Выражения в хранилище не хранятся, до вычисления ячейка выражения имеет тип EXPRESSION.
+    Сводные значения блоков диапазонов (см. RangeIndex) хранятся отдельно по ключу блока,
+    до вычисления блок отсутствует.
+    """
+
+    EMPTY = 0
+    """
+    Пустое значение
+    """
+
+    NUMBER = 1
+    """
+    Число (int64)
+    """
+
+    TEXT = 2
+    """
+    Текст
+    """
+
+    ERROR = 3
+    """
+    Ошибка вычисления (текст ошибки)
+    """
+
+    BIG_NUMBER = 4
+    """
+    Число за пределами int64
+    """
+
+    EXPRESSION = 5
+    """
+    Не вычисленное выражение
+    """
+
+    _MIN_NUMBER = -2 ** 63
+    _MAX_NUMBER = 2 ** 63 - 1
+
+    def __init__(self):
+        """
+        """
+
+        self.type_list: bytearray = bytearray()
+        self.number_list: array = array('q')
+        self.text_list: List[str] = []
+
+        self.aggregate_list: Dict[int, Tuple] = {}
+
+        self._text_index: Dict[str, int] = {}
+        self._big_number_list: Dict[int, int] = {}
+
+        # Кол-во строк в таблице после последнего уплотнения
+        self._compact_text_count: int = 0
+
+    def __len__(self) -> int:
+        return len(self.type_list)
+
+    def extend(self, count: int):
+        """
+        Добавить пустые ячейки
+
+        :param count: Кол-во ячеек
+        """
+
+        self.type_list.extend(bytes(count))
+        self.number_list.extend(array('q', bytes(8 * count)))
+
+    def set_value(self, index: int, value: Union[int, str]):
+        """
+        Задать значение ячейки
+
+        :param index: Индекс ячейки
+        :param value: Число, либо текст (пустая строка соответствует пустому значению)
+        """
+
+        if self.type_list[index] == self.BIG_NUMBER:
+            del self._big_number_list[index]
+
+        if value.__class__ is int:
+            if self._MIN_NUMBER <= value <= self._MAX_NUMBER:
+                self.type_list[index] = self.NUMBER
+                self.number_list[index] = value
+            else:
+                self.type_list[index] = self.BIG_NUMBER
+                self._big_number_list[index] = value
+
+        elif value == '':
+            self.type_list[index] = self.EMPTY
+
+        else:
+            self.type_list[index] = self.TEXT
+            self.number_list[index] = self._intern(value)
+
+    def set_error(self, index: int, text: str):
+        """
+        Задать ошибку вычисления
+
+        :param index: Индекс ячейки
+        :param text: Текст ошибки
+        """
+
+        if self.type_list[index] == self.BIG_NUMBER:
+            del self._big_number_list[index]
+
+        self.type_list[index] = self.ERROR
+        self.number_list[index] = self._intern(text)
+
+    def set_expression(self, index: int):
+        """
+        Отметить ячейку как не вычисленное выражение
+
+        :param index: Индекс ячейки
+        """
+
+        if self.type_list[index] == self.BIG_NUMBER:
+            del self._big_number_list[index]
+
+        self.type_list[index] = self.EXPRESSION
+
+    def get_number(self, index: int) -> Union[int, None]:
+        """
+        Получить числовое значение ячейки
+
+        :param index: Индекс ячейки
+        :return: Число, либо None если значение ячейки не является числом
+        """
+
+        value_type = self.type_list[index]
+
+        if value_type == self.NUMBER:
+            return self.number_list[index]
+
+        if value_type == self.BIG_NUMBER:
+            return self._big_number_list[index]
+
+        return None
+
+    def get_value(self, index: int) -> Union[int, str, None]:
+        """
+        Получить значение ячейки.
+
+        :param index: Индекс ячейки
+        :return: Число, либо текст (для ошибки вычисления текст ошибки), для не вычисленного выражения None
+        """
+
+        value_type = self.type_list[index]
+
+        if value_type == self.NUMBER:
+            return self.number_list[index]
+
+        if value_type == self.TEXT or value_type == self.ERROR:
+            return self.text_list[self.number_list[index]]
+
+        if value_type == self.EMPTY:
+            return ''
+
+        if value_type == self.BIG_NUMBER:
+            return self._big_number_list[index]
+
+        return None
+
+    def format_line(self, start: int, count: int) -> str:
+        """
+        Получить строковое представление значений ячеек (разделенных символом табуляции)
+
+        :param start: Индекс первой ячейки
+        :param count: Кол-во ячеек
+        """
+
+        type_list = self.type_list
+        number_list = self.number_list
+        text_list = self.text_list
+
+        result = []
+        for index in range(start, start + count):
+            value_type = type_list[index]
+
+            if value_type == self.NUMBER:
+                result.append(str(number_list[index]))
+            elif value_type == self.TEXT or value_type == self.ERROR:
+                result.append(text_list[number_list[index]])
+            elif value_type == self.EMPTY:
+                result.append('')
+            else:
+                result.append(str(self.get_value(index)))
+
+        return '\t'.join(result)
+
+    def format_lines(self, line_size: int, start: int = 0, count: int = None) -> Iterator[str]:
+        """
+        Получить строковое представление значений строк (см. format_line)
+
+        :param line_size: Кол-во ячеек в строке
+        :param start: Индекс первой ячейки
+        :param count: Кол-во ячеек, по умолчанию до конца хранилища
+        """
+
+        end = len(self) if count is None else start + count
+        for line_start in range(start, end, line_size):
+            yield self.format_line(line_start, line_size)
+
+    def has_text(self, text: str) -> bool:
+        """
+        Есть ли строка в таблице интернированных строк (строка замененного значения остается в таблице
+        до уплотнения, см. compact_texts)
+
+        :param text: Строка
+        """
+
+        return text in self._text_index
+
+    def copy(self) -> 'CellStorage':
+        """
+        Получить копию хранилища (изменение ячеек хранилища не изменяет копию)
+        """
+
+        storage = copy.copy(self)
+        storage.type_list = copy.copy(self.type_list)
+        storage.number_list = copy.copy(self.number_list)
+        storage.text_list = self.text_list.copy()
+        storage.aggregate_list = self.aggregate_list.copy()
+        storage._text_index = self._text_index.copy()
+        storage._big_number_list = self._big_number_list.copy()
+
+        return storage
+
+    def compact_texts(self):
+        """
+        Удалить из таблицы интернированных строк строки, которые не являются значениями ячеек.
+        Строки перезаписанных значений остаются в таблице, при многократной перезаписи ячеек разным текстом
+        (см. Sheet.set_cell, StreamSheet) таблица уплотняется периодически (см. compact_texts_if_needed).
+        """
+
+        type_list = self.type_list
+        number_list = self.number_list
+        text_list = self.text_list
+
+        self.text_list = []
+        self._text_index = {}
+        for index in self._get_keys():
+            if type_list[index] == self.TEXT or type_list[index] == self.ERROR:
+                number_list[index] = self._intern(text_list[number_list[index]])
+
+        self._compact_text_count = len(self.text_list)
+
+    def compact_texts_if_needed(self):
+        """
+        Уплотнить таблицу строк (см. compact_texts), если после последнего уплотнения в нее добавлено больше строк,
+        чем осталось при уплотнении, и чем хранится ячеек (уплотнение перебирает ячейки, поэтому его время
+        распределяется по добавленным строкам)
+        """
+
+        added_count = len(self.text_list) - self._compact_text_count
+        if added_count > max(self._compact_text_count, len(self.type_list), _TEXT_COMPACT_MIN_COUNT):
+            self.compact_texts()
+
+    def _get_keys(self) -> Iterable[int]:
+        """
+        Получить индексы ячеек, которые могут быть заполнены
+        """
+
+        return range(len(self.type_list))
+
+    def _intern(self, text: str) -> int:
+        """
+        Получить номер строки в таблице интернированных строк (строка добавляется при отсутствии)
+
+        :param text: Строка
+        """
+
+        text_index = self._text_index.get(text)
+        if text_index is None:
+            text_index = self._text_index[text] = len(self.text_list)
+            self.text_list.append(text)
+
+        return text_index
+
+
+class _SparseList(dict):
+    """
+    Разреженный массив: отсутствующий индекс имеет значение по умолчанию (без добавления в словарь)
+    """
+
+    def __init__(self, default: int):
+        """
+        :param default: Значение по умолчанию
+        """
+
+        super().__init__()
+        self._default: int = default
+
+    def __missing__(self, index: int) -> int:
+        return self._default
+
+
+class SparseCellStorage(CellStorage):
+    """
+    Разреженное хранилище значений ячеек.
+
+    Хранятся только заполненные ячейки (пустые ячейки отсутствуют), поэтому память и время
+    зависят от кол-ва заполненных ячеек, а не от размера листа. Ссылка на отсутствующую ячейку
+    читается как пустое значение. Массивы типов и значений заменяются словарями с тем же доступом по индексу.
+    """
+
+    def __init__(self):
+        """
+        """
+
+        super().__init__()
+
+        self.type_list: _SparseList = _SparseList(self.EMPTY)
+        self.number_list: _SparseList = _SparseList(0)
+
+        self._size: int = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def extend(self, count: int):
+        """
+        Добавить пустые ячейки (ячейки не создаются, увеличивается только размер)
+
+        :param count: Кол-во ячеек
+        """
+
+        self._size += count
+
+    def set_value(self, index: int, value: Union[int, str]):
+        """
+        Задать значение ячейки (пустое значение удаляет ячейку)
+
+        :param index: Индекс ячейки
+        :param value: Число, либо текст (пустая строка соответствует пустому значению)
+        """
+
+        if value == '':
+            self.remove(index)
+        else:
+            super().set_value(index, value)
+
+    def remove(self, index: int):
+        """
+        Удалить ячейку (ячейка становится пустой)
+
+        :param index: Индекс ячейки
+        """
+
+        if self.type_list.pop(index, self.EMPTY) == self.BIG_NUMBER:
+            del self._big_number_list[index]
+        self.number_list.pop(index, None)
+
+    def format_line(self, start: int, count: int) -> str:
+        """
+        Получить строковое представление значений ячеек (разделенных символом табуляции)
+
+        :param start: Индекс первой ячейки
+        :param count: Кол-во ячеек
+        """
+
+        type_list = self.type_list
+        return '\t'.join(str(self.get_value(index)) if index in type_list else ''
+                         for index in range(start, start + count))
+
+    def format_lines(self, line_size: int, start: int = 0, count: int = None) -> Iterator[str]:
+        """
+        Получить строковое представление значений строк.
+        Перебираются только заполненные ячейки (по возрастанию индекса), пустые ячейки и строки
+        добавляются разделителями без обращения к хранилищу.
+
+        :param line_size: Кол-во ячеек в строке
+        :param start: Индекс первой ячейки
+        :param count: Кол-во ячеек, по умолчанию до конца хранилища
+        """
+
+        end = self._size if count is None else start + count
+        if start == 0 and end >= self._size:
+            index_list = sorted(self.type_list)
+        else:
+            index_list = sorted(index for index in self.type_list if start <= index < end)
+
+        empty_line = '\t' * (line_size - 1)
+        i = 0
+
+        for line_start in range(start, end, line_size):
+            line_end = line_start + line_size
+
+            if i == len(index_list) or index_list[i] >= line_end:
+                yield empty_line
+                continue
+
+            result = []
+            position = line_start
+            while i < len(index_list) and index_list[i] < line_end:
+                index = index_list[i]
+                result.append('\t' * (index - position))
+                result.append(str(self.get_value(index)))
+                position = index
+                i += 1
+
+            result.append('\t' * (line_end - 1 - position))
+            yield ''.join(result)
+
+    def _get_keys(self) -> Iterable[int]:
+        """
+        Получить индексы заполненных ячеек
+        """
+
+        return self.type_list.keys()
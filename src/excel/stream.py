@@ -0,0 +1,155 @@
+"""
+Потоковый ввод и вывод строк листа.
+Входной поток читается большими блоками байт, строки выделяются из декодированного блока одним разбиением,
+строки результата записываются в выходной поток пачками (без вызова записи на каждую строку).
+Файл может читаться через отображение в память (mmap) без загрузки файла целиком.
+"""
+
+import codecs
+import mmap
+from typing import BinaryIO, Iterable, Iterator, Optional, TextIO
+
+_READ_CHUNK_SIZE = 1 << 20
+"""
+Размер блока чтения входного потока (байт)
+"""
+
+_WRITE_LINE_COUNT = 4096
+"""
+Кол-во строк, записываемых в выходной поток одной операцией записи
+"""
+
+
+class LineReader:
+    """
+    Чтение строк из двоичного потока блоками.
+
+    Строки возвращаются без символа конца строки, концы строк \\r\\n и \\r считаются концом строки \\n
+    (как при чтении текстового потока, например функцией input).
+    """
+
+    def __init__(self, stream: BinaryIO, encoding: str = 'utf-8', errors: str = 'strict',
+                 chunk_size: int = _READ_CHUNK_SIZE):
+        """
+        :param stream: Двоичный поток
+        :param encoding: Кодировка потока
+        :param errors: Обработка ошибок декодирования (см. codecs)
+        :param chunk_size: Размер блока чтения (байт)
+        """
+
+        self._stream: BinaryIO = stream
+        self._decoder: codecs.IncrementalDecoder = codecs.getincrementaldecoder(encoding)(errors)
+        self._chunk_size: int = chunk_size
+        self._line_iter: Iterator[str] = self._read_lines()
+
+    def __iter__(self) -> Iterator[str]:
+        return self._line_iter
+
+    def read_line(self) -> str:
+        """
+        Прочитать следующую строку
+        :raise: EOFError
+        """
+
+        line = next(self._line_iter, None)
+        if line is None:
+            raise EOFError('Достигнут конец входного потока!')
+
+        return line
+
+    def _read_lines(self) -> Iterator[str]:
+        """
+        Прочитать строки потока до конца.
+        Незаконченная строка блока (и символ \\r в конце блока) переносится в следующий блок.
+        """
+
+        rest = ''
+        while True:
+            chunk = self._stream.read(self._chunk_size)
+            text = rest + self._decoder.decode(chunk, not chunk)
+
+            # Символ \r в конце блока может быть началом \r\n
+            carriage = '\r' if chunk and text[-1:] == '\r' else ''
+            if carriage:
+                text = text[:-1]
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+            line_list = text.split('\n')
+            rest = line_list.pop() + carriage
+            yield from line_list
+
+            if not chunk:
+                break
+
+        if rest:
+            yield rest
+
+
+class MappedLineReader(LineReader):
+    """
+    Чтение строк файла, отображенного в память (см. LineReader).
+
+    Файл не загружается целиком: блоки читаются из отображения по мере разбора строк, прочитанные страницы
+    файла вытесняются системой. Пустой файл (не отображается в память) читается как обычный файл.
+    """
+
+    def __init__(self, path: str, encoding: str = 'utf-8', errors: str = 'strict',
+                 chunk_size: int = _READ_CHUNK_SIZE):
+        """
+        :param path: Путь к файлу
+        :param encoding: Кодировка файла
+        :param errors: Обработка ошибок декодирования (см. codecs)
+        :param chunk_size: Размер блока чтения (байт)
+        :raise: OSError
+        """
+
+        self._file: BinaryIO = open(path, 'rb')
+        self._map: Optional[mmap.mmap] = None
+        try:
+            if self._file.seek(0, 2):
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    self._map.madvise(mmap.MADV_SEQUENTIAL)
+            self._file.seek(0)
+        except BaseException:
+            self._file.close()
+            raise
+
+        super().__init__(self._map if self._map is not None else self._file, encoding, errors, chunk_size)
+
+    def __enter__(self) -> 'MappedLineReader':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Закрыть отображение и файл
+        """
+
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def write_lines(stream: TextIO, line_iter: Iterable[str]):
+    """
+    Записать строки в текстовый поток (каждая строка завершается символом \\n)
+
+    :param stream: Текстовый поток
+    :param line_iter: Строки
+    """
+
+    line_list = []
+    for line in line_iter:
+        line_list.append(line)
+        if len(line_list) >= _WRITE_LINE_COUNT:
+            line_list.append('')
+            stream.write('\n'.join(line_list))
+            line_list.clear()
+
+    if line_list:
+        line_list.append('')
+        stream.write('\n'.join(line_list))
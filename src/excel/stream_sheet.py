@@ -0,0 +1,198 @@
+"""
+Потоковый расчет листа.
+Для листов, выражения которых ссылаются только на ячейки своей строки и нескольких предшествующих строк:
+строка вычисляется сразу при добавлении, хранятся только строки окна ссылок.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from excel.cell.expression_template import ExpressionTemplate
+from excel.cell.expression_value import ExpressionValue
+from excel.cell.lexer import parse_cell_value
+from excel.graph import DependencyGraph
+from excel.sheet import SheetSize, calc_components
+from excel.storage import CellStorage
+
+
+class StreamSheet:
+    """
+    Лист с потоковым расчетом.
+
+    Выражение может ссылаться на ячейки своей строки и не более window предшествующих строк (ссылками и диапазонами),
+    ссылка на последующую строку, либо на строку раньше окна является ошибкой разбора. Ссылки за пределами листа
+    и на другие листы не корректны (как и для Sheet).
+
+    Строка вычисляется при добавлении (ячейки предшествующих строк уже вычислены), результат совпадает с расчетом
+    листа целиком (см. Sheet). Строки окна хранятся в хранилище по кругу: строка, на которую больше не могут
+    ссылаться, перезаписывается следующей, поэтому память не зависит от кол-ва строк листа.
+    """
+
+    def __init__(self, size_line: str, window: int):
+        """
+        :param size_line: Строка задающая размер листа
+        :param window: Кол-во предшествующих строк, на ячейки которых могут ссылаться выражения
+        :raise: ValueError
+        """
+
+        self._size: SheetSize = SheetSize.parser(size_line)
+
+        if not (isinstance(window, int) and window >= 0):
+            raise ValueError('Кол-во строк окна потокового расчета должно быть неотрицательным!')
+        self._window: int = window
+
+        # Строки окна и добавляемая строка
+        self._row_count: int = min(window + 1, self._size.y)
+        self._storage: CellStorage = CellStorage()
+        self._storage.extend(self._row_count * self._size.x)
+
+        # Последнее общее выражение каждого столбца (см. ExpressionTemplate)
+        self._column_template_list: List[Optional[ExpressionTemplate]] = [None] * self._size.x
+
+        self._line_count: int = 0
+
+    def get_size(self) -> SheetSize:
+        """
+        Получить размер листа
+        """
+
+        return self._size
+
+    def add_line(self, line: str):
+        """
+        Добавить строку с ячейками и вычислить ее
+
+        :param line: Строка со значениями в ячейках
+        :raise: ValueError
+        """
+
+        error_text = f'Строка со значением ячеек должна содержать ' \
+                     f'"{self._size.x}" выражений разделенных символом табуляции!'
+
+        if not isinstance(line, str):
+            raise ValueError(error_text)
+
+        value_list = line.split('\t')
+        if not (len(value_list) == self._size.x):
+            raise ValueError(error_text)
+
+        if self._line_count >= self._size.y:
+            raise ValueError('Достигнут предел размерности таблицы по вертикали!')
+
+        y = self._line_count + 1
+        start = self._get_start(y)
+        storage = self._storage
+        template_list = self._column_template_list
+
+        # Строка разбирается целиком до изменения хранилища (ошибка разбора не портит строки окна)
+        cell_value_list: List[Union[int, str, None]] = []
+        calc_func_list: Dict[int, Callable] = {}
+        graph = DependencyGraph()
+        for i, value in enumerate(value_list):
+            if not value or value[0] != '=':
+                cell_value_list.append(parse_cell_value(value))
+                continue
+            cell_value_list.append(None)
+
+            # Выражение, совпадающее со сдвинутым выражением ячейки выше, повторно не разбирается
+            template = template_list[i]
+            if template is not None and template.match(value, i + 1, y):
+                expression = template.get_expression()
+                ref_list = template.get_ref_list(i + 1, y)
+            else:
+                expression = ExpressionValue(value)
+                template_list[i] = ExpressionTemplate.from_expression(value, expression, i + 1, y)
+                ref_list = {ref: ref for ref in expression.get_ref_list()}
+
+            ref_index_list = {ref: self._get_ref_index(cell_ref, y) for ref, cell_ref in ref_list.items()}
+
+            precedent_list = []
+            for ref_index in ref_index_list.values():
+                if ref_index.__class__ is int:
+                    precedent_list.append(ref_index)
+                elif ref_index is not None:
+                    precedent_list += ref_index
+
+            calc_func_list[start + i] = expression.compile(ref_index_list.__getitem__)
+            graph.set_precedents(start + i, precedent_list)
+
+        # Все ячейки строки перезаписываются до расчета (в том числе ячейки строки, вышедшей из окна)
+        for i, cell_value in enumerate(cell_value_list):
+            if cell_value is None:
+                storage.set_expression(start + i)
+            else:
+                storage.set_value(start + i, cell_value)
+
+        self._line_count += 1
+
+        # Ссылки на предшествующие строки вычислены, граф содержит только выражения строки
+        calc_components(storage, graph, calc_func_list, graph.get_calc_order())
+
+        # Строки перезаписанных строк окна остаются в таблице строк хранилища
+        storage.compact_texts_if_needed()
+
+    def get_line(self) -> List[Union[str, int]]:
+        """
+        Получить значения последней добавленной строки (см. SheetValues.get_line)
+        :raise: RuntimeError
+        """
+
+        start = self._get_start(self._get_last_line())
+        return [self._storage.get_value(index) for index in range(start, start + self._size.x)]
+
+    def format_line(self) -> str:
+        """
+        Получить строковое представление значений последней добавленной строки (см. SheetValues.format_line)
+        :raise: RuntimeError
+        """
+
+        return self._storage.format_line(self._get_start(self._get_last_line()), self._size.x)
+
+    def _get_last_line(self) -> int:
+        """
+        Получить номер последней добавленной строки (1..)
+        :raise: RuntimeError
+        """
+
+        if not self._line_count:
+            raise RuntimeError('Не добавлено ни одной строки!')
+
+        return self._line_count
+
+    def _get_start(self, y: int) -> int:
+        """
+        Получить индекс первой ячейки строки в хранилище
+
+        :param y: Номер строки (1..)
+        """
+
+        return (y - 1) % self._row_count * self._size.x
+
+    def _get_ref_index(self, ref: Tuple, y: int) -> Union[int, Tuple[int, ...], None]:
+        """
+        Получить индекс ячейки ссылки, либо индексы ячеек диапазона в хранилище
+
+        :param ref: Ключ ссылки (x, y), либо диапазона (x1, y1, x2, y2), ключи другого вида (ссылки на другие листы)
+            не корректны
+        :param y: Номер строки выражения (1..)
+        :return: Индекс ячейки, индексы ячеек диапазона, либо None для ссылки за пределами листа
+        :raise: ValueError
+        """
+
+        if len(ref) == 2:
+            corner_list = [ref]
+        elif len(ref) == 4:
+            corner_list = [ref[:2], ref[2:]]
+        else:
+            return None
+
+        for ref_x, ref_y in corner_list:
+            if self._size.get_index(ref_x, ref_y) is None:
+                return None
+            if not (y - self._window <= ref_y <= y):
+                raise ValueError(f'Ссылка строки "{y}" на строку "{ref_y}" за пределами окна потокового расчета!')
+
+        if len(ref) == 2:
+            return self._get_start(ref[1]) + ref[0] - 1
+
+        x1, y1, x2, y2 = ref
+        return tuple(self._get_start(ref_y) + ref_x - 1 for ref_y in range(y1, y2 + 1) for ref_x in range(x1, x2 + 1))
@@ -0,0 +1,260 @@
+"""
+Механика книги.
+Книга объединяет несколько листов, выражения листа могут ссылаться на ячейки других листов (например Sheet2!B3).
+"""
+
+import re
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+from weakref import WeakValueDictionary
+
+from excel.cell.expression_template import CalcFuncList
+from excel.cell.ref_value import RefValue
+from excel.graph import DependencyGraph
+from excel.explain import SheetExplain
+from excel.range_index import RangeIndex
+from excel.sheet import Sheet, SheetSize, SheetValues, calc_all, calc_components, get_dependent_cone
+from excel.storage import CellStorage, SparseCellStorage
+
+
+class Workbook:
+    """
+    Книга.
+
+    Ячейки всех листов хранятся в общем хранилище (см. CellStorage), каждому листу выделяется непрерывный
+    диапазон индексов. Выражения всех листов образуют один граф зависимостей, поэтому ссылки между листами
+    (в том числе циклические) обрабатываются так же, как ссылки внутри листа.
+    При пересчете вычисляются только ячейки, зависящие от измененных, т.е. только затронутые листы.
+    Независимые группы ячеек (в том числе независимые листы) могут рассчитываться параллельно (см. calc_parallel).
+
+    Ссылка на лист, не добавленный в книгу к моменту задания выражения, не корректна (#RefNotValid),
+    поэтому листы добавляются до заполнения строк.
+    """
+
+    _name_pattern = re.compile(RefValue.SHEET_NAME_PATTERN)
+
+    def __init__(self, sparse: bool = False):
+        """
+        :param sparse: Хранить только заполненные ячейки (см. SparseCellStorage)
+        """
+
+        self._storage: CellStorage = SparseCellStorage() if sparse else CellStorage()
+        self._calc_func_list: Dict[int, Callable] = CalcFuncList()
+        self._graph: DependencyGraph = DependencyGraph()
+        self._range_index: RangeIndex = RangeIndex(self._graph, self._calc_func_list)
+
+        # Листы по имени в порядке добавления и индексы первых ячеек листов в хранилище
+        self._sheet_list: Dict[str, Sheet] = {}
+        self._offset_list: Dict[str, int] = {}
+
+        # Индексы первых ячеек листов по возрастанию и имена листов в том же порядке (для поиска листа по индексу)
+        self._start_list: List[int] = []
+        self._name_list: List[str] = []
+
+        # Состояние последнего расчета (общее для всех листов книги)
+        self._calculated: bool = False
+        self._changed_key_list: Set[int] = set()
+        self._stale_key_list: Set[int] = set()
+        self._values_list: WeakValueDictionary = WeakValueDictionary()
+
+    def add_sheet(self, name: str, size_line: str) -> Sheet:
+        """
+        Добавить лист.
+        Строки листа добавляются вызовом Sheet.add_line.
+
+        :param name: Имя листа (латинские буквы, цифры и символ _, не начинается с цифры)
+        :param size_line: Строка задающая размер листа
+        :return: Лист
+        :raise: ValueError
+        """
+
+        if not (isinstance(name, str) and self._name_pattern.fullmatch(name)):
+            raise ValueError(f'Имя листа "{name}" должно состоять из латинских букв, цифр и символа _ '
+                             f'и не начинаться с цифры!')
+
+        if name in self._sheet_list:
+            raise ValueError(f'Лист "{name}" уже добавлен в книгу!')
+
+        sheet = Sheet(size_line)
+        size = sheet.get_size()
+
+        # Ячейки листа добавляются в хранилище сразу, строки листа заполняют их по мере добавления
+        offset = len(self._storage)
+        self._storage.extend(size.y * size.x)
+
+        sheet._attach(self, name, offset, self._storage, self._graph, self._calc_func_list, self._range_index,
+                      self._changed_key_list, self._stale_key_list, self._values_list)
+
+        self._sheet_list[name] = sheet
+        self._offset_list[name] = offset
+        self._start_list.append(offset)
+        self._name_list.append(name)
+
+        return sheet
+
+    def get_sheet(self, name: str) -> Sheet:
+        """
+        Получить лист
+
+        :param name: Имя листа
+        :raise: ValueError
+        """
+
+        sheet = self._sheet_list.get(name)
+        if sheet is None:
+            raise ValueError(f'Лист "{name}" не найден!')
+
+        return sheet
+
+    def get_sheet_names(self) -> List[str]:
+        """
+        Получить имена листов в порядке добавления
+        """
+
+        return list(self._sheet_list)
+
+    def explain(self) -> SheetExplain:
+        """
+        Проанализировать зависимости ячеек всех листов (см. SheetExplain), ключ ячейки (x, y, имя листа)
+        :raise: RuntimeError
+        """
+
+        self._check_init()
+
+        return SheetExplain(self._graph, self._get_cell_key)
+
+    def set_cell(self, name: str, key: Tuple[int, int], value: str):
+        """
+        Изменить значение ячейки листа (см. Sheet.set_cell).
+        Пересчет значений выполняется вызовом recalculate.
+
+        :param name: Имя листа
+        :param key: Координаты ячейки (x, y)
+        :param value: Строковое значение ячейки
+        :raise: ValueError, RuntimeError
+        """
+
+        self.get_sheet(name).set_cell(key, value)
+
+    def calculate(self, workers: int = None) -> Dict[str, SheetValues]:
+        """
+        Рассчитать значения всех листов
+
+        :param workers: Кол-во процессов для параллельного расчета независимых групп ячеек (см. calc_parallel),
+            по умолчанию расчет выполняется в текущем процессе
+        :return: Значения листов (см. SheetValues) по имени листа
+        :raise: RuntimeError
+        """
+
+        self._check_init()
+
+        if workers is not None and workers > 1:
+            from excel.parallel import calc_parallel
+
+            calc_parallel(self._storage, self._graph, self._calc_func_list, workers)
+        else:
+            calc_all(self._storage, self._graph, self._calc_func_list,
+                     [template for sheet in self._sheet_list.values() for template in sheet._template_list]
+                     if not (self._calculated or self._stale_key_list) else [])
+
+        self._calculated = True
+        for sheet in self._sheet_list.values():
+            sheet._clear_templates()
+        self._changed_key_list.clear()
+        self._stale_key_list.clear()
+
+        result = {name: SheetValues(sheet.get_size(), self._storage, self._offset_list[name])
+                  for name, sheet in self._sheet_list.items()}
+        self._values_list.update((id(values), values) for values in result.values())
+
+        return result
+
+    def recalculate(self, workers: int = None) -> Dict[str, Dict[Tuple[int, int], Union[str, int]]]:
+        """
+        Пересчитать значения после изменения ячеек (см. set_cell).
+
+        Пересчитываются только измененные ячейки и ячейки всех листов, зависящие от них (транзитивно),
+        остальные значения сохраняются с предыдущего расчета.
+        Если расчет ранее не выполнялся, то выполняется полный расчет (см. calculate).
+
+        :param workers: Кол-во процессов для параллельного расчета (см. calculate)
+        :return: Значения пересчитанных ячеек по имени листа (только затронутые листы).
+            Ключом является кортеж (x, y), значением вычисленное выражение
+        :raise: RuntimeError
+        """
+
+        if not self._calculated:
+            return {name: dict(values) for name, values in self.calculate(workers).items()}
+
+        dirty_key_list = get_dependent_cone(self._graph, self._changed_key_list)
+
+        if workers is not None and workers > 1:
+            from excel.parallel import calc_parallel
+
+            calc_parallel(self._storage, self._graph, self._calc_func_list, workers, dirty_key_list)
+        else:
+            calc_components(self._storage, self._graph, self._calc_func_list,
+                            self._graph.get_calc_order(dirty_key_list))
+
+        self._changed_key_list.clear()
+        self._stale_key_list.clear()
+
+        result: Dict[str, Dict[Tuple[int, int], Union[str, int]]] = {}
+        for index in dirty_key_list:
+            if index < 0:
+                continue
+            x, y, name = self._get_cell_key(index)
+            result.setdefault(name, {})[(x, y)] = self._storage.get_value(index)
+
+        return result
+
+    def _get_ref_index(self, name: str, ref: Tuple) -> Union[int, Tuple[int, ...], None]:
+        """
+        Получить индекс ячейки в хранилище по ключу ссылки (см. RefValue.get_ref_key),
+        либо ячейки и блоки диапазона по ключу диапазона (см. RangeValue.get_ref_key)
+
+        :param name: Имя листа выражения (для ссылки на ячейку того же листа)
+        :param ref: Координаты (x, y), либо (x, y, имя листа), для диапазона (x1, y1, x2, y2[, имя листа])
+        :return: Индекс (ячейки и блоки для диапазона), либо None для ячейки за пределами листа
+            или ссылки на отсутствующий лист
+        """
+
+        if len(ref) == 3 or len(ref) == 5:
+            name = ref[-1]
+            if name not in self._sheet_list:
+                return None
+
+        if len(ref) > 3:
+            return self._sheet_list[name]._get_range_keys(ref[:4])
+
+        index = self._sheet_list[name].get_size().get_index(ref[0], ref[1])
+        return None if index is None else self._offset_list[name] + index
+
+    def _get_cell_key(self, index: int) -> Optional[Tuple[int, int, str]]:
+        """
+        Получить ключ ячейки (x, y, имя листа) по индексу в хранилище
+
+        :param index: Индекс ячейки
+        :return: Ключ ячейки, либо None для блока диапазона (см. RangeIndex)
+        """
+
+        if index < 0:
+            return None
+
+        position = bisect_right(self._start_list, index) - 1
+        name = self._name_list[position]
+        x, y = self._sheet_list[name].get_size().get_key(index - self._start_list[position])
+
+        return x, y, name
+
+    def _check_init(self):
+        """
+        Проверить окончание инициализации (заданы все ячейки всех листов)
+        :raise: RuntimeError
+        """
+
+        for name, sheet in self._sheet_list.items():
+            size: SheetSize = sheet.get_size()
+            if sheet._line_count != size.y:
+                raise RuntimeError(f'Инициализация листа "{name}" не закончена. '
+                                   f'Кол-во заданных строк "{sheet._line_count}" из "{size.y}"')
@@ -0,0 +1,60 @@
+import pytest
+
+from benchmark.generators import GENERATOR_LIST, chain, get_column_name
+from benchmark.suite import PHASE_LIST, run
+from excel.sheet import Sheet
+
+
+class TestGetColumnName:
+    @pytest.mark.parametrize('value', [(1, 'A'), (26, 'Z'), (27, 'AA'), (702, 'ZZ'), (16384, 'XFD')])
+    def test_1(self, value):
+        """
+        Буквенное обозначение столбца.
+        :param tuple value: Номер столбца, обозначение.
+        """
+
+        assert get_column_name(value[0]) == value[1]
+
+
+class TestGenerators:
+    @pytest.mark.parametrize('name', list(GENERATOR_LIST))
+    def test_1(self, name):
+        """
+        Генератор формирует корректный лист.
+        :param str name: Имя генератора.
+        """
+
+        lines = GENERATOR_LIST[name](*([3, 4] if name != 'chain' else [3]))
+
+        sheet = Sheet(lines[0])
+        for line in lines[1:]:
+            sheet.add_line(line)
+
+        assert len(sheet.calculate()) == sheet.get_size().y * sheet.get_size().x
+
+    def test_2(self):
+        """
+        Результат расчета цепочки ссылок.
+        """
+
+        lines = chain(100)
+
+        sheet = Sheet(lines[0])
+        for line in lines[1:]:
+            sheet.add_line(line)
+
+        assert sheet.calculate()[(1, 100)] == 100
+
+
+class TestSuiteRun:
+    def test_1(self):
+        """
+        Замер всех этапов сценария.
+        """
+
+        result = run(['chain', 'mostly_empty_sparse'], scale=0.001)
+
+        for case in result['cases'].values():
+            assert list(case['phases']) == PHASE_LIST
+            for phase in case['phases'].values():
+                assert phase['time'] >= 0 and phase['peak_memory'] > 0
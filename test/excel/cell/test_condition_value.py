@@ -0,0 +1,31 @@
+import pytest
+
+from excel.cell.condition_value import ConditionValue
+
+
+class TestConditionValue:
+    @pytest.mark.parametrize('value', [None, '', 'IF', 'IF()', 'IF(1)', 'IF(1, 2, 3, 4)', 'CHOOSE(1)',
+                                       'SUM(1, 2)', 'IF(1, 2', 'IF(1,, 2)', 'IF(1, IF(1, 2), 3)', 'IF(A0, 1)'])
+    def test_1(self, value):
+        """
+        Не корректное создание экземпляра класса.
+        :param value: Значение.
+        """
+
+        with pytest.raises(ValueError):
+            ConditionValue(value)
+
+    @pytest.mark.parametrize('value', [('IF(A1>0, 1)', 'IF', 2, [(1, 1)]),
+                                       ('if( A1 , SUM(B1:B3) , Sheet2!C1*2 )', 'IF', 3,
+                                        [(1, 1), (2, 1, 2, 3), (3, 1, 'Sheet2')]),
+                                       ('Choose(A1, 1, 2, C3, 4)', 'CHOOSE', 5, [(1, 1), (3, 3)])])
+    def test_2(self, value):
+        """
+        Корректное создание экземпляра класса.
+        :param tuple value: Значение, имя функции, кол-во аргументов и ссылки.
+        """
+
+        condition = ConditionValue(value[0])
+        assert condition.get_value()[0] == value[1]
+        assert len(condition.get_value()[1]) == value[2]
+        assert condition.get_ref_list() == value[3]
@@ -0,0 +1,184 @@
+import pytest
+
+from excel.cell.expression_template import CalcFuncList, ExpressionTemplate, SharedCalcFunc
+from excel.cell.expression_value import ExpressionValue, _CalcExpError as CalcExpError, get_calc_spec, has_condition
+from excel.storage import CellStorage
+
+
+def make_template(value: str, x: int, y: int) -> ExpressionTemplate:
+    return ExpressionTemplate.from_expression(value, ExpressionValue(value), x, y)
+
+
+class TestExpressionTemplate:
+    @pytest.mark.parametrize('value', [('=A2*B2+SUM(A2:B3)-5', 3, 2, True),
+                                       ('=A5*B5+SUM(A5:B6)-5', 3, 5, True),
+                                       ('=B1*C1+SUM(B1:C2)-5', 4, 1, True),
+                                       ('=AA3*AB3+SUM(AA3:AB4)-5', 29, 3, True),
+                                       ('=A2*B2+SUM(A2:B3)-6', 3, 2, False),
+                                       ('=A2*B2+SUM(A2:B3)-5', 3, 3, False),
+                                       ('=A2*B2+SUM(A2:B3)-5', 4, 2, False),
+                                       ('=A2 * B2+SUM(A2:B3)-5', 3, 2, False),
+                                       ('=a2*B2+SUM(A2:B3)-5', 3, 2, False)])
+    def test_1(self, value):
+        """
+        Совпадение выражения ячейки со сдвинутым общим выражением (без разбора).
+        :param tuple value: Выражение, координаты ячейки и признак совпадения.
+        """
+
+        template = make_template('=A1*B1+SUM(A1:B2)-5', 3, 1)
+        assert template.match(*value[:3]) == value[3]
+
+    def test_2(self):
+        """
+        Сдвиг за пределы листа (левее первого столбца, выше первой строки) не совпадает, регистр букв сохраняется.
+        """
+
+        template = make_template('=b2+a3', 3, 3)
+        assert template.match('=b1+a2', 3, 2)
+        assert not template.match('=b0+a1', 3, 1)
+        assert not template.match('=A2+0', 2, 3)
+        assert make_template('=1+2', 1, 1).match('=1+2', 5, 7)
+
+    def test_3(self):
+        """
+        Выражения со ссылками на другие листы и длинные выражения общими не являются.
+        """
+
+        assert make_template('=' + '+'.join(f'A{row}' for row in range(1, 1000)), 2, 1) is None
+        assert make_template('=Sheet2!A1+1', 1, 1) is None
+        assert make_template('=SUM(Sheet2!A1:A3)', 1, 1) is None
+
+    def test_4(self):
+        """
+        Ссылки ячейки получаются сдвигом ссылок общего выражения.
+        """
+
+        template = make_template('=A1+IF(B1>0, SUM(A1:B3), C2)', 4, 1)
+        assert template.get_ref_list(4, 1) == {(1, 1): (1, 1), (2, 1): (2, 1), (1, 1, 2, 3): (1, 1, 2, 3),
+                                               (3, 2): (3, 2)}
+        assert template.get_ref_list(5, 3) == {(1, 1): (2, 3), (2, 1): (3, 3), (1, 1, 2, 3): (2, 3, 3, 5),
+                                               (3, 2): (4, 4)}
+        assert template.get_expression().get_ref_list() == [(1, 1), (2, 1), (1, 1, 2, 3), (3, 2)]
+
+    def test_5(self):
+        """
+        Цикл расчета: первая ячейка добавляется вместе со второй, ячейки вычисляются в порядке добавления,
+        ячейки со ссылками на не вычисленные выражения и уже вычисленные ячейки пропускаются,
+        ошибки вычисления записываются в хранилище.
+        """
+
+        storage = CellStorage()
+        storage.extend(8)
+        for index, value in enumerate([1, 2, 0, 'Text', 5]):
+            storage.set_value(index, value)
+        for index in range(5, 8):
+            storage.set_expression(index)
+
+        # Ячейка i ссылается на ячейки i - 5 и i - 4: =A1/B1
+        template = make_template('=A1/B1', 3, 1)
+        assert template.add_key(7, {(1, 1): 2, (2, 1): 3}) == []
+        assert template.add_key(5, {(1, 1): 0, (2, 1): 1}) == [7, 5]
+        assert template.add_key(6, {(1, 1): 1, (2, 1): 2}) == [6]
+        assert template.add_key(4, {(1, 1): None, (2, 1): 0}) == []
+        assert list(template.get_keys()) == [7, 5, 6]
+
+        assert template.calc(storage) == [7, 5, 6]
+        assert [storage.get_value(index) for index in range(5, 8)] == [0, '#CalcError', '#CalcError']
+        assert template.calc(storage) == []
+
+        assert get_calc_spec(template.compile(7)) == ('R/R', (2, 3))
+        template.clear_keys()
+        assert list(template.get_keys()) == []
+
+    def test_6(self):
+        """
+        Цикл расчета только для выражений из чисел и ссылок.
+        """
+
+        template = make_template('=SUM(A1:A2)+1', 2, 1)
+        assert template.add_key(1, {(1, 1, 1, 2): (0, 2)}) == []
+        assert template.add_key(2, {(1, 1, 1, 2): (1, 3)}) == []
+        assert template.calc(CellStorage()) == []
+
+
+class TestCalcFuncList:
+    def test_1(self):
+        """
+        Функции ячеек общего выражения не хранятся, компилируются при обращении и учитываются при переборе.
+        """
+
+        template = make_template('=A1+1', 2, 1)
+        template.add_key(1, {(1, 1): 0})
+        template.add_key(3, {(1, 1): 2})
+        assert list(template.get_keys()) == [1, 3]
+
+        def calc_func(storage: CellStorage) -> int:
+            return 0
+
+        calc_func_list = CalcFuncList()
+        calc_func_list[-1] = calc_func
+        calc_func_list.set_template(1, template)
+        calc_func_list.set_template(3, template)
+
+        assert list(calc_func_list) == [-1, 1, 3] and len(calc_func_list) == 3
+        assert 3 in calc_func_list and 2 not in calc_func_list
+        assert get_calc_spec(calc_func_list[3]) == ('R+N', (2, 1))
+        assert calc_func_list.get(2) is None and calc_func_list.get(-1) is calc_func
+        assert [index for index, _ in calc_func_list.items()] == [-1, 1, 3]
+        with pytest.raises(KeyError):
+            calc_func_list[2]
+
+        calc_func_list[3] = calc_func
+        assert calc_func_list[3] is calc_func and len(calc_func_list) == 3
+
+        assert get_calc_spec(calc_func_list.pop(1)) == ('R+N', (0, 1))
+        assert calc_func_list.pop(1, None) is None
+        assert list(calc_func_list) == [-1, 3]
+
+
+class TestSharedCalcFunc:
+    def test_1(self):
+        """
+        Выражение вычисляется один раз в расчете, значение и ошибка вычисления копируются.
+        """
+
+        storage = CellStorage()
+        storage.extend(4)
+        storage.set_value(0, 5)
+        for index in range(1, 4):
+            storage.set_expression(index)
+
+        call_list = []
+
+        def calc_func(v: CellStorage) -> int:
+            call_list.append(1)
+            return v.get_value(0) * 2
+
+        shared = SharedCalcFunc(1, 1, 0)
+        assert not shared.is_bound()
+        shared.bind(calc_func)
+        assert shared.is_bound() and shared.get_key() == 1 and shared.get_ref_count() == (1, 0)
+
+        calculated_list = {}
+        assert shared.calc(storage, 1, calculated_list) == 10
+        storage.set_value(1, 10)
+        assert shared.calc(storage, 2, calculated_list) == 10
+        assert len(call_list) == 1
+
+        storage.set_error(1, '#RefNotValid')
+        with pytest.raises(CalcExpError, match='#RefNotValid'):
+            shared.calc(storage, 3, calculated_list)
+
+        # Новый расчет
+        assert shared.calc(storage, 3, {}) == 10 and shared(storage) == 10
+        assert len(call_list) == 3
+
+    def test_2(self):
+        """
+        Вид выражения общей функции совпадает с видом функции первой ячейки.
+        """
+
+        shared = SharedCalcFunc(1, 1, 0)
+        shared.bind(ExpressionValue('=A1+1').compile(lambda ref: 0))
+        assert get_calc_spec(shared) == ('R+N', (0, 1))
+        assert not has_condition(shared)
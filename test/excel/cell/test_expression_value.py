@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from excel.cell.number_value import NumberValue
@@ -5,15 +7,53 @@ from excel.cell.ref_value import RefValue
 
 from excel.cell.expression_value import _Operator as Operator
 from excel.cell.expression_value import _CalcExpError as CalcExpError
-from excel.cell.expression_value import _calc_exp_wo_ref as calc_exp_wo_ref
-from excel.cell.expression_value import ExpressionValue
+from excel.cell.expression_value import ExpressionValue, compile_spec, get_calc_spec
+from excel.storage import CellStorage
+
+
+def calc(exp_str, sheet_cell_value):
+    """
+    Скомпилировать и вычислить выражение.
+    :param str exp_str: Выражение.
+    :param dict sheet_cell_value: Значения листа (ссылки на отсутствующие ячейки не корректны).
+    """
+
+    key_list = list(sheet_cell_value)
+
+    storage = CellStorage()
+    storage.extend(len(key_list))
+    for index, key in enumerate(key_list):
+        if isinstance(sheet_cell_value[key], CalcExpError):
+            storage.set_error(index, str(sheet_cell_value[key]))
+        else:
+            storage.set_value(index, sheet_cell_value[key])
+
+    calc_func = ExpressionValue(exp_str).compile(lambda key: key_list.index(key) if key in key_list else None)
+    return calc_func(storage)
+
+
+def fold(exp):
+    """
+    Вычислить выражение без ссылок слева направо (эталон для скомпилированного выражения).
+    :param list exp: Числа, разделенные операторами.
+    """
+
+    result = exp[0]
+    for i in range(1, len(exp), 2):
+        result = Operator.exec(exp[i], result, exp[i + 1])
+
+    return int(result)
 
 
 class TestExpressionValue:
     @pytest.mark.parametrize('value', ['', 'a9', 'None',
                                        '1', '10000', '0',
                                        '=-1', '=+', '=-', '=*', '=/',
-                                       '==', '=1+', '=1+A+2', '=Z*1'
+                                       '==', '=1+', '=1+A+2', '=Z*1',
+                                       '=Sheet2!', '=Sheet2!1', '=!A1', '=Sheet2!!A1', '=1Sheet!A1',
+                                       '=AVG(A1:B2)', '=SUM()', '=SUM(A0:B1)', '=SUM(A1:)', '=SUM(1)', '=SUM(A1',
+                                       '=A1<', '=A1=<B1', '=A1<>', '=IF(A1)', '=IF(1, 2, 3, 4)', '=CHOOSE(1)',
+                                       '=IF(1, IF(1, 2), 3)', '=IF(1,, 2)', '=MAX(A1, 1)', '=IF(A0, 1)', '=IF(1, 2'
                                        ])
     def test_1(self, value):
         """
@@ -45,11 +85,11 @@ class TestExpressionValue:
         result_value = ExpressionValue(value[0]).get_value()[0]
         assert isinstance(result_value, value[1]) and result_value.get_value() == value[2]
 
-    @pytest.mark.parametrize('o_1', ['100', 'A1'])
+    @pytest.mark.parametrize('o_1', ['100', 'A1', 'Sheet2!A1'])
     @pytest.mark.parametrize('o_2', ['+', '-', '*', '/'])
     @pytest.mark.parametrize('o_3', ['2', 'z9'])
     @pytest.mark.parametrize('o_4', ['+', '-', '*', '/'])
-    @pytest.mark.parametrize('o_5', ['0', 'b3'])
+    @pytest.mark.parametrize('o_5', ['0', 'b3', 's_1!b3'])
     @pytest.mark.parametrize('o_len', [3, 5])
     def test_4(self, o_1, o_2, o_3, o_4, o_5, o_len):
         """
@@ -62,42 +102,184 @@ class TestExpressionValue:
         with pytest.raises(ValueError):
             ExpressionValue('=' + ''.join([o_1, o_2, o_3, o_4, o_5][:o_len - 1]))
 
+    def test_5(self):
+        """
+        Ссылки выражения, в том числе на ячейки других листов.
+        """
+
+        assert ExpressionValue('=Sheet2!B3+A1*s_1!c2').get_ref_list() == [(2, 3, 'Sheet2'), (1, 1), (3, 2, 's_1')]
 
-class TestCalcExpWoRef:
-    @pytest.mark.parametrize('value', [None,
-                                       1,
-                                       '',
-                                       [],
-                                       "'Text",
-                                       [1, '+'],
-                                       [1, 2, '-'],
-                                       ['*', 1, 2],
-                                       [1, '+', '0'],
-                                       [1.1, '+', 0]])
-    def test_1(self, value):
+    def test_6(self):
         """
-        Не корректное выражение.
-        :param value: Значение.
+        Ссылки выражения с функциями диапазонов.
         """
 
-        with pytest.raises(CalcExpError):
-            calc_exp_wo_ref(value)
-
-    @pytest.mark.parametrize('value', [([None], None),
-                                       (['1'], '1'),
-                                       ([''], ''),
-                                       ([1], 1),
-                                       ([1.9], 1),
-                                       ([-1], -1),
-                                       ([-1.9], -1),
-                                       ([5, '-', 2, '+', 1, '*', 3, '/', 2], 6)])
+        assert ExpressionValue('=SUM(B2:A1)+count(Sheet2!C3)*A1').get_ref_list() == \
+               [(1, 1, 2, 2), (3, 3, 3, 3, 'Sheet2'), (1, 1)]
+
+    def test_7(self):
+        """
+        Ссылки выражения с условными функциями (ссылки всех аргументов).
+        """
+
+        assert ExpressionValue('=A1+if(B1>=0, SUM(C1:C2), Sheet2!D1) * Choose(A1, 1, E5)').get_ref_list() == \
+               [(1, 1), (2, 1), (3, 1, 3, 2), (4, 1, 'Sheet2'), (1, 1), (5, 5)]
+
+    def test_8(self):
+        """
+        Одинаковые операнды разных выражений (в том числе аргументов условных функций) являются одним объектом,
+        операнды не хранят атрибуты в словаре.
+        """
+
+        item_list = ExpressionValue('=A1+7*SUM(B1:B5)+Sheet2!C3').get_value()
+        other_item_list = ExpressionValue('=Sheet2!C3-IF(A1, 7, SUM(B1:B5))-A1').get_value()
+        arg_list = other_item_list[2].get_value()[1]
+
+        assert other_item_list[0] is item_list[6] and other_item_list[4] is item_list[0]
+        assert arg_list[0][0] is item_list[0] and arg_list[1][0] is item_list[2] and arg_list[2][0] is item_list[4]
+        assert not any(hasattr(item, '__dict__') for item in item_list[0::2] + other_item_list[0::2])
+
+
+class TestExpressionValueCompile:
+    @pytest.mark.parametrize('o_1', ['100', 'A1'])
+    @pytest.mark.parametrize('o_2', ['+', '-', '*', '/'])
+    @pytest.mark.parametrize('o_3', ['2', 'B1'])
+    @pytest.mark.parametrize('o_4', ['+', '-', '*', '/'])
+    @pytest.mark.parametrize('o_5', ['3', 'C1'])
+    @pytest.mark.parametrize('o_len', [1, 3, 5])
+    def test_1(self, o_1, o_2, o_3, o_4, o_5, o_len):
+        """
+        Результат скомпилированного выражения совпадает с интерпретацией.
+        """
+
+        sheet_cell_value = {(1, 1): 7, (2, 1): -3, (3, 1): 5}
+        exp_str = ''.join([o_1, o_2, o_3, o_4, o_5][:o_len])
+
+        exp = [sheet_cell_value[RefValue(v).get_value()] if v[0].isalpha() else v if v in Operator.All else int(v)
+               for v in [o_1, o_2, o_3, o_4, o_5][:o_len]]
+
+        assert calc('=' + exp_str, sheet_cell_value) == fold(exp)
+
+    @pytest.mark.parametrize('value', [('=', {}, CalcExpError.calc_exp()),
+                                       ('=A1', {(1, 1): 'Text'}, 'Text'),
+                                       ('=A1', {(1, 1): CalcExpError.circle_ref()}, CalcExpError.calc_exp()),
+                                       ('=A1+1', {(1, 1): 'Text'}, CalcExpError.calc_exp()),
+                                       ('=A1+1', {(1, 1): ''}, CalcExpError.calc_exp()),
+                                       ('=A1*2', {(1, 1): 2 ** 70}, 2 ** 71),
+                                       ('=1/A1', {(1, 1): 0}, CalcExpError.calc_exp()),
+                                       ('=A1+Z9', {(1, 1): 'Text'}, CalcExpError.not_valid_ref()),
+                                       ('=A1+Z9', {(1, 1): CalcExpError.calc_exp()}, CalcExpError.calc_exp()),
+                                       ('=Z9+A1', {(1, 1): CalcExpError.calc_exp()}, CalcExpError.not_valid_ref()),
+                                       ('=A1>2', {(1, 1): 3}, 1),
+                                       ('=A1<=2+5', {(1, 1): 3}, 5),
+                                       ('=A1<>3=0', {(1, 1): 3}, 1),
+                                       ('=A1=B1', {(1, 1): 'Text', (2, 1): 'Text'}, CalcExpError.calc_exp()),
+                                       ('=IF(A1>0, A1, B1)', {(1, 1): 3, (2, 1): 'Text'}, 3),
+                                       ('=IF(A1>0, A1, B1)', {(1, 1): -3, (2, 1): 'Text'}, 'Text'),
+                                       ('=IF(A1, 1/A1)', {(1, 1): 0}, 0),
+                                       ('=IF(A1, 1, 2)', {(1, 1): 'Text'}, CalcExpError.calc_exp()),
+                                       ('=IF(A1=0, 0, 10/A1)+1', {(1, 1): 0}, 1),
+                                       ('=IF(A1=0, 0, B1)+1', {(1, 1): 1, (2, 1): 'Text'}, CalcExpError.calc_exp()),
+                                       ('=IF(1, A1, Z9)', {(1, 1): CalcExpError.circle_ref()}, CalcExpError.calc_exp()),
+                                       ('=IF(0, A1, Z9)', {(1, 1): 1}, CalcExpError.not_valid_ref()),
+                                       ('=CHOOSE(A1, 1/0, 20, Z9)*2', {(1, 1): 2}, 40),
+                                       ('=CHOOSE(A1, 1, 2)', {(1, 1): 3}, CalcExpError.calc_exp()),
+                                       ('=CHOOSE(A1, 1, 2)', {(1, 1): 0}, CalcExpError.calc_exp()),
+                                       ('=Z9+IF(A1, 1, 2)', {(1, 1): 1}, CalcExpError.not_valid_ref()),
+                                       ('=IF(A1, 1, 2)+Z9', {(1, 1): 'Text'}, CalcExpError.calc_exp())])
     def test_2(self, value):
         """
-        Корректное выражение.
-        :param value: Значение.
+        Значения ссылок и ошибки вычисления.
+        :param tuple value: Выражение, значения листа и результат.
+        """
+
+        if isinstance(value[2], CalcExpError):
+            with pytest.raises(CalcExpError) as e:
+                calc(value[0], value[1])
+            assert str(e.value) == str(value[2])
+        else:
+            assert calc(value[0], value[1]) == value[2]
+
+
+    @pytest.mark.parametrize('operand_count', [33, 1000])
+    @pytest.mark.parametrize('value', [(7, 'A1'),
+                                       ('Text', CalcExpError.calc_exp()),
+                                       (CalcExpError.circle_ref(), CalcExpError.calc_exp())])
+    def test_3(self, operand_count, value):
+        """
+        Длинное выражение (вычисляется сверткой).
+        :param int operand_count: Кол-во операндов.
+        :param tuple value: Значение ячейки A1 и результат (ссылка на результат вычисления без ссылок).
         """
 
-        assert calc_exp_wo_ref(value[0]) == value[1]
+        item_list = []
+        for i in range(operand_count):
+            item_list += [['A1', '2', '3'][i % 3], ['+', '-', '*', '/'][i % 4]]
+        item_list = item_list[:-1]
+
+        if isinstance(value[1], CalcExpError):
+            with pytest.raises(CalcExpError) as e:
+                calc('=' + ''.join(item_list), {(1, 1): value[0]})
+            assert str(e.value) == str(value[1])
+        else:
+            exp = [value[0] if v == 'A1' else v if v in Operator.All else int(v) for v in item_list]
+            assert calc('=' + ''.join(item_list), {(1, 1): value[0]}) == fold(exp)
+
+    @pytest.mark.parametrize('value', [(5, '>=80', 1), (5, '<80', 0), (5, '', 80), (-5, '', CalcExpError.calc_exp())])
+    def test_4(self, value):
+        """
+        Длинное выражение с условными функциями и сравнением (вычисляется сверткой).
+        :param tuple value: Значение ячейки A1, окончание выражения и результат.
+        """
+
+        exp_str = '=' + '+'.join(['IF(A1>0, 2, 1/0)'] * 40) + value[1]
+
+        if isinstance(value[2], CalcExpError):
+            with pytest.raises(CalcExpError):
+                calc(exp_str, {(1, 1): value[0]})
+        else:
+            assert calc(exp_str, {(1, 1): value[0]}) == value[2]
+
+
+class TestGetCalcSpec:
+    @pytest.mark.parametrize('value', [('=', ('', ())),
+                                       ('=5', ('N', (5,))),
+                                       ('=A1+2*B3', ('R+N*R', (0, 2, 1))),
+                                       ('=A1+Z9/B3', ('R+X/R', (0, None, None))),
+                                       ('=' + '+'.join(['A1'] * 40), ('+'.join('R' * 40), (0,) * 40)),
+                                       ('=A1<>B3<=2>=1', ('R!R{N}N', (0, 1, 2, 1))),
+                                       ('=5+Z9', ('N+X', (None, None))),
+                                       ('=Z9', ('X', (None,))),
+                                       ('=12*3+4-A1', ('N-R', (40, 0))),
+                                       ('=2*3/0+A1', ('N/N+R', (6, 0, 0))),
+                                       ('=2<3*A1+1', ('N*R+N', (1, 0, 1)))])
+    def test_1(self, value):
+        """
+        Описание функции расчета и повторная компиляция по описанию.
+        :param tuple value: Выражение и описание (вид выражения, значения операндов).
+        """
+
+        ref_key = {(1, 1): 0, (2, 3): 1}
+        calc_func = ExpressionValue(value[0]).compile(ref_key.get)
+
+        assert get_calc_spec(calc_func) == value[1]
+        assert get_calc_spec(compile_spec(*value[1])) == value[1]
+
+    def test_2(self):
+        """
+        Условная функция сохраняется в описании и передается в другой процесс по описанию аргументов.
+        """
+
+        ref_key = {(1, 1): 0, (2, 3): 1}
+        shape, param_list = get_calc_spec(ExpressionValue('=2*IF(A1, B3, Z9)').compile(ref_key.get))
+        assert shape == 'N*C'
+        assert param_list[1].get_precedents() == [0, 1]
+
+        storage = CellStorage()
+        storage.extend(2)
+        storage.set_value(0, 1)
+        storage.set_value(1, 5)
+        assert compile_spec(shape, pickle.loads(pickle.dumps(param_list)))(storage) == 10
 
 
 class TestOperatorExec:
@@ -110,7 +292,13 @@ class TestOperatorExec:
                                         (Operator.Divide, 2, 1, 2),
                                         (Operator.Divide, 2, 3, 0),
                                         (Operator.Divide, 2, -3, 0),
-                                        (Operator.Divide, 5, -2, -2)])
+                                        (Operator.Divide, 5, -2, -2),
+                                        (Operator.Equal, 2, 2, 1),
+                                        (Operator.NotEqual, 2, 2, 0),
+                                        (Operator.Less, 1, 2, 1),
+                                        (Operator.Greater, 1, 2, 0),
+                                        (Operator.LessEqual, 2, 2, 1),
+                                        (Operator.GreaterEqual, 1, 2, 0)])
     def test_1(self, params):
         """
         Оператор "Плюс".
@@ -118,3 +306,15 @@ class TestOperatorExec:
         """
 
         assert Operator.exec(*(list(params[:3]))) == params[3]
+
+    @pytest.mark.parametrize('params', [(Operator.Divide, 1, 0),
+                                        (Operator.Plus, 1, '1'),
+                                        ('%', 1, 1)])
+    def test_2(self, params):
+        """
+        Ошибка выполнения оператора.
+        :param tuple params: Оператор и операнды.
+        """
+
+        with pytest.raises(CalcExpError):
+            Operator.exec(*params)
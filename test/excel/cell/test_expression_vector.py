@@ -0,0 +1,93 @@
+import pytest
+
+from excel.cell.expression_value import compile_keys_spec
+from excel.cell.expression_vector import calc_keys_vector
+from excel.storage import CellStorage, SparseCellStorage
+
+numpy = pytest.importorskip('numpy')
+
+COUNT = 100
+"""
+Кол-во ячеек группы (больше минимального кол-ва ячеек векторного расчета)
+"""
+
+
+def make_storage(storage: CellStorage, left_list: list, right_list: list) -> CellStorage:
+    """
+    Хранилище: значения левых операндов, значения правых операндов и не вычисленные выражения
+    (ячейка i ссылается на ячейки i - 2 * COUNT и i - COUNT)
+    """
+
+    storage.extend(3 * COUNT)
+    for index, value in enumerate(left_list + right_list):
+        storage.set_value(index, value)
+    for index in range(2 * COUNT, 3 * COUNT):
+        storage.set_expression(index)
+
+    return storage
+
+
+class TestCalcKeysVector:
+    @pytest.mark.parametrize('shape', ['R+R', 'R-R*N', 'R/R', 'R*R/N', 'R<R', 'R!R-N', 'R}R+R', 'N-R/R', 'R'])
+    def test_1(self, shape):
+        """
+        Векторный расчет совпадает с расчетом циклом: не числовые операнды, деление на ноль, числа за пределами
+        точного представления float64 и переполнение int64 вычисляются циклом.
+        :param str shape: Вид выражения.
+        """
+
+        value_list = [0, 1, -1, 3, -7, 1000, 2 ** 40, 2 ** 53 + 1, -2 ** 62, 2 ** 63 - 1, 10 ** 30, 'Text', '']
+        left_list = [value_list[i % len(value_list)] for i in range(COUNT)]
+        right_list = [value_list[i * 7 % len(value_list)] for i in range(COUNT)]
+
+        operand_list = shape[0::2]
+        param_list = tuple(3 if operand == 'N' else -2 * COUNT if i == operand_list.index('R') else -COUNT
+                           for i, operand in enumerate(operand_list))
+        key_list = range(2 * COUNT, 3 * COUNT)
+
+        storage = make_storage(CellStorage(), left_list, right_list)
+        calc_keys = compile_keys_spec(shape, param_list)
+        assert sorted(calc_keys(storage, key_list)) == list(key_list)
+
+        vector_storage = make_storage(CellStorage(), left_list, right_list)
+        calculated_list = calc_keys_vector(vector_storage, shape, param_list, key_list)
+        assert 0 < len(calculated_list) < COUNT
+        assert sorted(calculated_list + calc_keys(vector_storage, key_list)) == list(key_list)
+
+        assert [vector_storage.get_value(index) for index in key_list] == \
+               [storage.get_value(index) for index in key_list]
+
+    def test_2(self):
+        """
+        Ячейки, ссылающиеся на ячейки группы, вычисляются следующими проходами,
+        длинная цепочка ссылок остается для расчета циклом.
+        """
+
+        storage = make_storage(CellStorage(), list(range(COUNT)), list(range(COUNT)))
+        storage.extend(COUNT)
+        for index in range(3 * COUNT, 4 * COUNT):
+            storage.set_expression(index)
+
+        # Ячейка i ссылается на ячейку i - COUNT: два уровня по COUNT ячеек
+        key_list = range(2 * COUNT, 4 * COUNT)
+        assert sorted(calc_keys_vector(storage, 'R*N', (-COUNT, 2), key_list[::-1])) == list(key_list)
+        assert [storage.get_value(index) for index in (2 * COUNT + 5, 3 * COUNT + 5)] == [10, 20]
+
+        # Цепочка: ячейка i ссылается на ячейку i - 1
+        storage = make_storage(CellStorage(), [], [])
+        assert calc_keys_vector(storage, 'R+N', (-1, 1), range(2 * COUNT, 3 * COUNT)) == []
+
+    def test_3(self):
+        """
+        Разреженное хранилище, малое кол-во ячеек, выражения без ссылок и с большими числами векторно не вычисляются.
+        """
+
+        left_list = list(range(COUNT))
+        assert calc_keys_vector(make_storage(SparseCellStorage(), left_list, left_list), 'R+R',
+                                (-2 * COUNT, -COUNT), range(2 * COUNT, 3 * COUNT)) == []
+        assert calc_keys_vector(make_storage(CellStorage(), left_list, left_list), 'R+R',
+                                (-2 * COUNT, -COUNT), range(2 * COUNT, 2 * COUNT + 10)) == []
+        assert calc_keys_vector(make_storage(CellStorage(), left_list, left_list), 'N+N',
+                                (1, 2), range(2 * COUNT, 3 * COUNT)) == []
+        assert calc_keys_vector(make_storage(CellStorage(), left_list, left_list), 'R+N',
+                                (-COUNT, 2 ** 60), range(2 * COUNT, 3 * COUNT)) == []
@@ -0,0 +1,69 @@
+import pytest
+
+from excel.cell.function_value import FunctionValue, aggregate, make_block_func
+from excel.storage import CellStorage, NotCalculatedError
+
+
+class TestFunctionValue:
+    @pytest.mark.parametrize('value', [None, '', 'SUM', 'SUM()', 'SUM(A1:B2', 'AVG(A1:B2)', 'SUM(1)',
+                                       'SUM(A1:B2)+1', 'SUM((A1:B2))'])
+    def test_1(self, value):
+        """
+        Не корректное создание экземпляра класса.
+        :param value: Значение.
+        """
+
+        with pytest.raises(ValueError):
+            FunctionValue(value)
+
+    @pytest.mark.parametrize('value', [('SUM(A1:B2)', 'SUM', (1, 1, 2, 2)),
+                                       ('min( a1 )', 'MIN', (1, 1, 1, 1)),
+                                       ('Max(Sheet2!C3:A1)', 'MAX', (1, 1, 3, 3, 'Sheet2')),
+                                       ('COUNT(A1:A100)', 'COUNT', (1, 1, 1, 100))])
+    def test_2(self, value):
+        """
+        Корректное создание экземпляра класса.
+        :param tuple value: Значение.
+        """
+
+        function = FunctionValue(value[0])
+        assert function.get_value()[0] == value[1]
+        assert function.get_ref_key() == value[2]
+
+
+class TestAggregate:
+    def test_1(self):
+        """
+        Сводные значения: учитываются только числа, ошибка вычисления отмечается признаком.
+        """
+
+        storage = CellStorage()
+        storage.extend(6)
+        for index, value in enumerate([3, -2, 'Text', '', 2 ** 64]):
+            storage.set_value(index, value)
+        storage.set_error(5, '#CalcError')
+
+        assert aggregate(storage, (0, 1, 2, 3)) == (1, 2, -2, 3, False)
+        assert aggregate(storage, (2, 3)) == (0, 0, None, None, False)
+
+        storage.aggregate_list[-1] = make_block_func((0, 1, 4))(storage)
+        assert storage.aggregate_list[-1] == (2 ** 64 + 1, 3, -2, 2 ** 64, False)
+        assert aggregate(storage, (-1, 5)) == (2 ** 64 + 1, 3, -2, 2 ** 64, True)
+
+    def test_2(self):
+        """
+        Обращение к не вычисленному выражению, либо к не вычисленному блоку.
+        """
+
+        storage = CellStorage()
+        storage.extend(2)
+        storage.set_value(0, 1)
+        storage.set_expression(1)
+
+        with pytest.raises(NotCalculatedError) as e:
+            aggregate(storage, (0, 1))
+        assert e.value.index == 1
+
+        with pytest.raises(NotCalculatedError) as e:
+            aggregate(storage, (0, -1))
+        assert e.value.index == -1
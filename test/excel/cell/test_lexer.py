@@ -0,0 +1,62 @@
+import pytest
+
+from excel.cell.expression_value import ExpressionValue
+from excel.cell.lexer import parse_cell_value
+from excel.cell.number_value import NumberValue
+from excel.cell.ref_value import RefValue
+
+
+class TestParseCellValue:
+    @pytest.mark.parametrize('value', ['-1',
+                                       None,
+                                       1,
+                                       'Sample',
+                                       ' 1',
+                                       '1.5',
+                                       '²',
+                                       '=X',
+                                       '=A0',
+                                       '=1+',
+                                       '=+1',
+                                       '=1 2',
+                                       '= '])
+    def test_1(self, value):
+        """
+        Не корректное значение ячейки.
+        :param value: Значение.
+        """
+
+        with pytest.raises(ValueError):
+            parse_cell_value(value)
+
+    @pytest.mark.parametrize('value', [('1', 1),
+                                       ('0', 0),
+                                       ('99999999999999999999', 99999999999999999999),
+                                       ('', ''),
+                                       ("'", ''),
+                                       ("'Sample", 'Sample'),
+                                       ("'=1", '=1')])
+    def test_2(self, value):
+        """
+        Простые значения разбираются без создания объекта значения.
+        :param tuple value: Значение, ожидаемый результат.
+        """
+
+        result = parse_cell_value(value[0])
+        assert result == value[1] and result.__class__ is value[1].__class__
+
+    @pytest.mark.parametrize('value', [('=', []),
+                                       ('=1', [(NumberValue, 1)]),
+                                       ('= a9 ', [(RefValue, (1, 9))]),
+                                       ('=AB12 * 3-c1', [(RefValue, (28, 12)), '*', (NumberValue, 3),
+                                                         '-', (RefValue, (3, 1))])])
+    def test_3(self, value):
+        """
+        Разбор выражения.
+        :param tuple value: Значение, ожидаемые элементы выражения.
+        """
+
+        result = parse_cell_value(value[0])
+        assert isinstance(result, ExpressionValue)
+        assert [item if isinstance(item, str) else (item.__class__, item.get_value())
+                for item in result.get_value()] == value[1]
@@ -0,0 +1,32 @@
+import pytest
+
+from excel.cell.range_value import RangeValue
+
+
+class TestRangeValue:
+    @pytest.mark.parametrize('value', [None, '', 'A0:B1', 'A1:B0', 'A1:', ':B1', 'A1:B', '1A:B2', 'A1:Sheet2!B2',
+                                       'A1:B2:C3', 'A1 :B2'])
+    def test_1(self, value):
+        """
+        Не корректное создание экземпляра класса.
+        :param value: Значение.
+        """
+
+        with pytest.raises(ValueError):
+            RangeValue(value)
+
+    @pytest.mark.parametrize('value', [('A1:B10', ((1, 1), (2, 10)), (1, 1, 2, 10)),
+                                       ('b10:a1', ((1, 1), (2, 10)), (1, 1, 2, 10)),
+                                       ('A10:B1', ((1, 1), (2, 10)), (1, 1, 2, 10)),
+                                       ('C3', ((3, 3), (3, 3)), (3, 3, 3, 3)),
+                                       ('Sheet2!A1:A5', ((1, 1), (1, 5)), (1, 1, 1, 5, 'Sheet2'))])
+    def test_2(self, value):
+        """
+        Корректное создание экземпляра класса, углы приводятся к левому верхнему и правому нижнему.
+        :param tuple value: Значение.
+        """
+
+        range_value = RangeValue(value[0])
+        assert range_value.get_value() == value[1]
+        assert range_value.get_ref_key() == value[2]
+        assert RangeValue.from_key(*value[2]).get_ref_key() == value[2]
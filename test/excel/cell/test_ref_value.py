@@ -8,7 +8,16 @@ class TestRefValue:
                                        0,
                                        '1A',
                                        '',
-                                       'A11'])
+                                       'A',
+                                       '1',
+                                       'A1B',
+                                       'A-1',
+                                       'Ä1',
+                                       'A1 ',
+                                       '!A1',
+                                       '1Sheet!A1',
+                                       'Sheet-2!A1',
+                                       'Sheet!A0'])
     def test_1(self, value):
         """
         Не корректное создание экземпляра класса.
@@ -19,7 +28,11 @@ class TestRefValue:
             RefValue(value)
 
     @pytest.mark.parametrize('value', [('A1', (1, 1)),
-                                       ('z9', (26, 9))])
+                                       ('z9', (26, 9)),
+                                       ('A11', (1, 11)),
+                                       ('AA1', (27, 1)),
+                                       ('ab1234', (28, 1234)),
+                                       ('XFD1048576', (16384, 1048576))])
     def test_2(self, value):
         """
         Корректное создание экземпляра класса.
@@ -27,3 +40,16 @@ class TestRefValue:
         """
 
         assert RefValue(value[0]).get_value() == value[1]
+
+    @pytest.mark.parametrize('value', [('A1', None, (1, 1)),
+                                       ('Sheet2!B3', 'Sheet2', (2, 3, 'Sheet2')),
+                                       ('_data_1!ab12', '_data_1', (28, 12, '_data_1'))])
+    def test_3(self, value):
+        """
+        Ссылка на ячейку другого листа.
+        :param tuple value: Значение.
+        """
+
+        ref = RefValue(value[0])
+        assert ref.get_sheet() == value[1] and ref.get_ref_key() == value[2]
+        assert ref.get_value() == value[2][:2]
@@ -0,0 +1,80 @@
+import pytest
+
+from excel.sheet import Sheet
+
+
+def explain(*line_list: str):
+    """
+    Анализ зависимостей листа из строк.
+    :param line_list: Строки листа.
+    """
+
+    sheet = Sheet(f'{len(line_list)}\t{line_list[0].count(chr(9)) + 1}')
+    for line in line_list:
+        sheet.add_line(line)
+
+    return sheet.explain()
+
+
+class TestSheetExplain:
+    def test_1(self):
+        """
+        Анализ до окончания инициализации.
+        """
+
+        with pytest.raises(RuntimeError):
+            Sheet('1\t1').explain()
+
+    def test_2(self):
+        """
+        Показатели ячеек.
+        """
+
+        result = explain('1\t=A1+1\t=A1*B1', '=C1+B1\t=A2+A2\t')
+
+        assert [(cell.depth, cell.fan_in, cell.fan_out, cell.precedent_count) for cell in
+                [result.get_cell(key) for key in [(1, 1), (2, 1), (3, 1), (1, 2), (2, 2)]]] == \
+               [(0, 0, 2, 0), (1, 1, 2, 1), (2, 2, 1, 2), (3, 2, 1, 3), (4, 1, 0, 4)]
+        assert result.get_longest_chain() == [(2, 2), (1, 2), (3, 1), (2, 1)]
+        assert result.get_cell((2, 2)).get_name() == 'B2'
+
+        with pytest.raises(KeyError):
+            result.get_cell((3, 2))
+
+    def test_3(self):
+        """
+        Ячейки цикла зависят от всех ячеек цикла.
+        """
+
+        result = explain('1\t=C1+A1\t=B1\t=C1')
+
+        for key in [(2, 1), (3, 1)]:
+            assert result.get_cell(key).depth == 1 and result.get_cell(key).precedent_count == 3
+        assert result.get_cell((4, 1)).depth == 2 and result.get_cell((4, 1)).precedent_count == 3
+
+    def test_4(self):
+        """
+        Самые дорогие ячейки и строковое представление отчета.
+        """
+
+        result = explain(*['1' if y == 1 else f'=A{y - 1}' for y in range(1, 101)])
+
+        assert [cell.get_name() for cell in result.get_top(2)] == ['A100', 'A99']
+        assert len(result.get_cell_list()) == 100
+
+        lines = result.format(2).split('\n')
+        assert lines[0] == 'cells\t100'
+        assert lines[1].startswith('longest_chain\t99\tA100 <- A99')
+        assert lines[-1] == 'A99\t98\t1\t1\t98'
+
+    def test_5(self):
+        """
+        Блоки диапазонов в кол-ве прямых влияющих и зависимых ячеек заменяются ячейками и выражениями.
+        """
+
+        result = explain(*[f'{y}\t=SUM(A1:A40)\t=SUM(A3:A20)' if y == 1 else
+                           f'{y}\t=SUM(A2:A9)\t=MAX(A5:A30)' if y == 2 else f'{y}\t\t' for y in range(1, 41)])
+
+        assert [result.get_cell(key).fan_in for key in [(2, 1), (3, 1), (2, 2), (3, 2)]] == [40, 18, 8, 26]
+        assert [result.get_cell(key).fan_out for key in [(1, 1), (1, 2), (1, 5), (1, 35)]] == [1, 2, 4, 1]
+        assert max(cell.fan_in for cell in result.get_cell_list()) == 40
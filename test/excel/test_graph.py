@@ -0,0 +1,56 @@
+import pytest
+
+from excel.graph import DependencyGraph
+
+
+class TestDependencyGraphCalcOrder:
+    """
+    Порядок вычисления.
+    """
+
+    @pytest.mark.parametrize('length', [1, 2, 1000])
+    def test_1(self, length):
+        """
+        Цепочка ссылок. Влияющие ячейки вычисляются раньше зависимых.
+        :param int length: Длина цепочки.
+        """
+
+        graph = DependencyGraph({i: [i + 1] for i in range(length)})
+
+        order = graph.get_calc_order()
+        assert order == [[i] for i in range(length - 1, -1, -1)]
+        assert not any(graph.is_circle(component) for component in order)
+
+    def test_2(self):
+        """
+        Выявление циклов. Ячейка ссылающаяся на саму себя, цикл из нескольких ячеек и ячейка зависящая от цикла.
+        """
+
+        graph = DependencyGraph({'A': ['A'], 'B': ['C'], 'C': ['D'], 'D': ['B'], 'E': ['B', 'X']})
+
+        order = graph.get_calc_order()
+        assert [sorted(component) for component in order] == [['A'], ['B', 'C', 'D'], ['E']]
+        assert [graph.is_circle(component) for component in order] == [True, True, False]
+
+
+class TestDependencyGraphSetPrecedents:
+    """
+    Изменение связей.
+    """
+
+    def test_1(self):
+        """
+        Замена и удаление влияющих ячеек.
+        """
+
+        graph = DependencyGraph({'A': ['B', 'C', 'B']})
+        assert graph.get_precedents('A') == ('B', 'C')
+        assert graph.get_dependents('B') == {'A'}
+
+        graph.set_precedents('A', ['C'])
+        assert graph.get_dependents('B') == set()
+        assert graph.get_dependents('C') == {'A'}
+
+        graph.remove('A')
+        assert graph.get_precedents('A') == ()
+        assert graph.get_dependents('C') == set()
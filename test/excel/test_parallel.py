@@ -0,0 +1,118 @@
+import multiprocessing
+
+from excel.cell.expression_value import _CalcExpError as CalcExpError
+from excel.graph import DependencyGraph
+from excel.parallel import _calc_batch, _make_payload, get_weak_components
+from excel.sheet import Sheet
+
+LINE_LIST = ["1\t=A1+1\t'Sample\t=E1\t=D1",
+             "=A1*2\t=C1\t=B2+A2\t=99999999999*99999999999\t=F1",
+             "=A3\t=B3+1\t=C3/0\t=D2-1\t"]
+"""
+Лист с независимыми группами выражений: цепочки, циклы, ошибки, текст, большие числа и некорректные ссылки
+"""
+
+
+def make_sheet() -> Sheet:
+    """
+    Создать лист из LINE_LIST.
+    """
+
+    sheet = Sheet('3\t5')
+    for line in LINE_LIST:
+        sheet.add_line(line)
+
+    return sheet
+
+
+class TestGetWeakComponents:
+    def test_1(self):
+        """
+        Ссылки на ячейки без выражений не связывают выражения.
+        """
+
+        graph = DependencyGraph({1: [0], 2: [0], 3: [2], 4: [5], 5: [4], 6: [6]})
+
+        assert sorted(sorted(component) for component in get_weak_components(graph, [1, 2, 3, 4, 5, 6])) == \
+               [[1], [2, 3], [4, 5], [6]]
+
+
+class TestCalcParallel:
+    def test_1(self):
+        """
+        Параллельный расчет совпадает с расчетом в текущем процессе.
+        """
+
+        assert dict(make_sheet().calculate(workers=2)) == dict(make_sheet().calculate())
+
+    def test_2(self):
+        """
+        Расчет пакета по описанию выражений (без наследования листа процессом).
+        """
+
+        sheet = make_sheet()
+        result = dict(make_sheet().calculate())
+
+        batch = list(sheet._calc_func_list)
+        value_list, error_list = _calc_batch(_make_payload(batch, sheet._storage, sheet._graph, sheet._calc_func_list))
+
+        assert {sheet._size.get_key(index): value for index, value in zip(batch, value_list)} == \
+               {sheet._size.get_key(index): result[sheet._size.get_key(index)] for index in batch}
+        assert sorted(sheet._size.get_key(batch[position]) for position in error_list) == \
+               [(1, 3), (2, 3), (3, 2), (3, 3), (4, 1), (5, 1), (5, 2)]
+
+    def test_3(self):
+        """
+        Параллельный расчет функций диапазонов (блоки диапазонов рассчитываются вместе с ячейками).
+        """
+
+        def make_range_sheet() -> Sheet:
+            sheet = Sheet('20\t3')
+            for y in range(1, 21):
+                sheet.add_line(f'{y}\t=SUM(A1:A{y})\t=MAX(A1:B{y})' if y < 20 else '=1/0\t=SUM(A1:A20)\t=COUNT(A1:A20)')
+            return sheet
+
+        assert dict(make_range_sheet().calculate(workers=2)) == dict(make_range_sheet().calculate())
+
+    def test_4(self):
+        """
+        Расчет пакета с условными функциями по описанию выражений, цикл через не выбранный аргумент.
+        """
+
+        def make_condition_sheet() -> Sheet:
+            sheet = Sheet('2\t3')
+            sheet.add_line('=IF(C1>0, 5, B1)\t=A1+1\t1')
+            sheet.add_line('=CHOOSE(C1, B1*2, Z9)\t=IF(A2>B1, A2, Z9)+F1\t=A2<>10')
+            return sheet
+
+        sheet = make_condition_sheet()
+        result = dict(make_condition_sheet().calculate())
+        assert dict(make_condition_sheet().calculate(workers=2)) == result
+
+        batch = list(sheet._calc_func_list)
+        value_list, _ = _calc_batch(_make_payload(batch, sheet._storage, sheet._graph, sheet._calc_func_list))
+        assert {sheet._size.get_key(index): value for index, value in zip(batch, value_list)} == \
+               {sheet._size.get_key(index): result[sheet._size.get_key(index)] for index in batch}
+
+    def test_5(self, monkeypatch):
+        """
+        Расчет пакетов в процессах, запущенных через spawn (по описанию выражений): цикл через ячейку,
+        ссылка которой на другую ячейку цикла следует за некорректной ссылкой.
+        """
+
+        def make_cycle_sheet() -> Sheet:
+            sheet = Sheet('15\t6')
+            for y in range(1, 16):
+                sheet.add_line(f'{y}\t=A{y}*2\t\t\t\t' + (f'=F{y + 1}/F{y - 2}/E{y - 1}+G{y - 1}' if y >= 13 else ''))
+            return sheet
+
+        result = dict(make_cycle_sheet().calculate())
+        assert [result[(6, y)] for y in range(13, 16)] == [str(CalcExpError.circle_ref())] * 3
+
+        sheet = make_cycle_sheet()
+        batch = list(sheet._calc_func_list)
+        value_list, _ = _calc_batch(_make_payload(batch, sheet._storage, sheet._graph, sheet._calc_func_list))
+        assert value_list == [result[sheet._size.get_key(index)] for index in batch]
+
+        monkeypatch.setattr(multiprocessing, 'get_all_start_methods', lambda: ['spawn'])
+        assert dict(make_cycle_sheet().calculate(workers=2)) == result
@@ -0,0 +1,58 @@
+import pytest
+
+from excel.graph import DependencyGraph
+from excel.range_index import RangeIndex
+
+
+def expand(range_index: RangeIndex, key_list):
+    """
+    Получить ячейки, покрываемые ячейками и блоками.
+    :param RangeIndex range_index: Индекс диапазонов.
+    :param key_list: Индексы ячеек и ключи блоков.
+    """
+
+    cell_list = []
+    process_key_list = list(key_list)
+    while process_key_list:
+        key = process_key_list.pop()
+        if key >= 0:
+            cell_list.append(key)
+        else:
+            process_key_list += range_index._graph.get_precedents(key)
+
+    return sorted(cell_list)
+
+
+class TestRangeIndex:
+    @pytest.mark.parametrize('row_start, row_end', [(0, 0), (0, 7), (0, 100), (3, 4), (5, 1000), (17, 63), (64, 64)])
+    def test_1(self, row_start, row_end):
+        """
+        Ячейки и блоки покрывают диапазон столбца ровно один раз, кол-во элементов логарифмическое.
+        :param int row_start: Первая строка.
+        :param int row_end: Последняя строка.
+        """
+
+        range_index = RangeIndex(DependencyGraph(), {})
+        key_list = range_index.get_keys(2, 5, 1, row_start, row_end)
+
+        assert expand(range_index, key_list) == list(range(2 + row_start * 5, 2 + (row_end + 1) * 5, 5))
+        assert len(key_list) <= 2 * (1 << RangeIndex.MIN_LEVEL) + 2 * (row_end + 1).bit_length()
+
+    def test_2(self):
+        """
+        Пересекающиеся диапазоны используют общие блоки, у каждого блока функция расчета.
+        """
+
+        graph = DependencyGraph()
+        calc_func_list = {}
+        range_index = RangeIndex(graph, calc_func_list)
+
+        key_list = range_index.get_keys(0, 2, 2, 0, 63)
+        assert expand(range_index, key_list) == list(range(128))
+        assert len(key_list) == 2
+
+        block_count = len(calc_func_list)
+        assert set(range_index.get_keys(0, 2, 1, 0, 31)) < set(calc_func_list)
+        assert range_index.get_keys(0, 2, 1, 0, 63) == key_list[:1]
+        assert len(calc_func_list) == block_count
+        assert all(key < 0 for key in calc_func_list)
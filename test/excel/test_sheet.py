@@ -1,8 +1,16 @@
+import itertools
+
 import pytest
 
-from excel.cell.cell import CellValue
 from excel.cell.expression_value import _CalcExpError as CalcExpError
-from excel.sheet import Sheet, SheetSize
+from excel.sheet import Sheet, SheetSize, SheetValues
+from excel.storage import CellStorage
+
+SIZE_Y = 9
+SIZE_X = 26
+"""
+Размер листа для проверки вложенных вычислений (ссылки из одной буквы и цифры)
+"""
 
 
 class TestSheetConstructor:
@@ -60,12 +68,12 @@ class TestSheetAddLine:
         sheet = Sheet('2\t1')
 
         sheet.add_line('')
-        assert len(sheet._cell_list) == 1
-        assert isinstance(sheet._cell_list[(1, 1)], CellValue)
+        assert len(sheet._storage) == 1
+        assert sheet._storage.type_list[0] == CellStorage.EMPTY
 
-        sheet.add_line('')
-        assert len(sheet._cell_list) == 2
-        assert isinstance(sheet._cell_list[(1, 2)], CellValue)
+        sheet.add_line('=A1')
+        assert len(sheet._storage) == 2
+        assert sheet._storage.type_list[1] == CellStorage.EXPRESSION
 
 
 class TestSheetCalculate:
@@ -87,7 +95,7 @@ class TestSheetCalculate:
         with pytest.raises(RuntimeError):
             sheet.calculate()
 
-    @pytest.mark.parametrize('size_y', [1, 2, SheetSize.MAX_Y])
+    @pytest.mark.parametrize('size_y', [1, 2, SIZE_Y])
     def test_2(self, size_y):
         """
         Циклическое вычисление.
@@ -103,7 +111,7 @@ class TestSheetCalculate:
 
         result = sheet.calculate()
         for y in range(0, size_y):
-            assert result[(1, y + 1)] == str(CalcExpError.circle_ref()) if y == size_y else str(CalcExpError.calc_exp())
+            assert result[(1, y + 1)] == str(CalcExpError.circle_ref())
             assert result[(2, y + 1)] == 1
 
     def test_3(self):
@@ -111,27 +119,26 @@ class TestSheetCalculate:
         Максимальная циклическая вложенность\зависимость. =A2, =A3, ..., =Z8, =A1
         """
 
-        sheet = Sheet(f'{SheetSize.MAX_Y}\t{SheetSize.MAX_X}')
+        sheet = Sheet(f'{SIZE_Y}\t{SIZE_X}')
         for y in range(1, sheet.get_size().y + 1):
             line = [f'={chr(ord("A") + x)}{y}' for x in range(1, sheet.get_size().x)]
 
             # Добавить цикличность
-            line.append('=A1' if y == SheetSize.MAX_Y else f'=A{y + 1}')
+            line.append('=A1' if y == SIZE_Y else f'=A{y + 1}')
 
             sheet.add_line('\t'.join(line))
 
         result = sheet.calculate()
         for y in range(0, sheet.get_size().y):
             for x in range(0, sheet.get_size().x):
-                assert result[(x + 1, y + 1)] == \
-                       str(CalcExpError.circle_ref()) if y == sheet.get_size().y else str(CalcExpError.calc_exp())
+                assert result[(x + 1, y + 1)] == str(CalcExpError.circle_ref())
 
     def test_4(self):
         """
         Максимальное циклическое вычисление. =A2 + 1, =A3 + 1, ..., =Z8 + 1, =1
         """
 
-        sheet = Sheet(f'{SheetSize.MAX_Y}\t{SheetSize.MAX_X}')
+        sheet = Sheet(f'{SIZE_Y}\t{SIZE_X}')
         for y in range(1, sheet.get_size().y + 1):
             line = [f'={chr(ord("A") + x)}{y}+1' for x in range(1, sheet.get_size().x)]
 
@@ -181,6 +188,725 @@ class TestSheetCalculate:
         assert result[(2, 3)] == ''
         assert result[(3, 3)] == str(CalcExpError.not_valid_ref())
 
+    def test_7(self):
+        """
+        Ячейки зависящие от цикла (но не входящие в него) получают "Ошибка вычисления".
+        """
+
+        sheet = Sheet('1\t4')
+        sheet.add_line('=B1\t=C1\t=B1\t=A1+1')
+
+        result = sheet.calculate()
+        assert result[(1, 1)] == str(CalcExpError.calc_exp())
+        assert result[(2, 1)] == str(CalcExpError.circle_ref())
+        assert result[(3, 1)] == str(CalcExpError.circle_ref())
+        assert result[(4, 1)] == str(CalcExpError.calc_exp())
+
+    def test_8(self):
+        """
+        Повторный расчет без повторного разбора.
+        """
+
+        sheet = Sheet('3\t3')
+        sheet.add_line("=A1\t=3-1*2+1\t'Sample")
+        sheet.add_line("=C1\t=A2-7/2\t=B1-8/2")
+        sheet.add_line("'\t=A3\t=B4")
+
+        result = dict(sheet.calculate())
+        assert sheet.calculate() == result
+        assert result[(1, 1)] == str(CalcExpError.circle_ref())
+        assert result[(3, 2)] == -1
+
+    def test_9(self):
+        """
+        Ссылки из нескольких букв и цифр, длинная цепочка ссылок.
+        """
+
+        sheet = Sheet('1000\t30')
+        for y in range(1, 1001):
+            sheet.add_line('\t'.join([str(y)] * 28 + ['=AB1' if y == 1 else f'=AC{y - 1}+AB{y}', f'=AE{y}']))
+
+        result = sheet.calculate()
+        assert result[(29, 1000)] == 1000 * 1001 // 2
+        assert result[(30, 1000)] == str(CalcExpError.not_valid_ref())
+        assert result.get_line(1) == [1] * 29 + [str(CalcExpError.not_valid_ref())]
+
+        with pytest.raises(KeyError):
+            _ = result[(31, 1)]
+
+    def test_10(self):
+        """
+        Выражения без ссылок вычисляются при разборе: значение (в том числе ошибка) доступно до расчета,
+        функция расчета не хранится, ячейка не добавляется в граф зависимостей.
+        """
+
+        sheet = Sheet('2\t2', stats=True)
+        sheet.add_line('=12*3+4\t=2/0')
+        sheet.add_line('=IF(1>2, 1/0, 7)\t=A1+B1')
+
+        assert sheet._storage.get_value(0) == 40
+        assert sheet._storage.get_value(1) == str(CalcExpError.calc_exp())
+        assert sheet._storage.get_value(2) == 7
+        assert set(sheet._calc_func_list) == {3}
+        assert list(sheet._graph.get_precedents(3)) == [0, 1]
+        assert sheet.get_stats().cell_count['expression'] == 4
+
+        result = sheet.calculate()
+        assert result.get_line(1) == [40, str(CalcExpError.calc_exp())]
+        assert result.get_line(2) == [7, str(CalcExpError.calc_exp())]
+        assert sheet.get_stats().error_count == {str(CalcExpError.calc_exp()): 2}
+
+        sheet.set_cell((2, 1), '=5-1')
+        assert sheet.recalculate() == {(2, 1): 4, (2, 2): 44}
+
+
+class TestSheetSetCell:
+    """
+    Изменить значение ячейки.
+    """
+
+    def test_1(self):
+        """
+        Не корректное изменение значения.
+        """
+
+        sheet = Sheet('1\t2')
+        with pytest.raises(RuntimeError):
+            sheet.set_cell((1, 1), '1')
+
+        sheet.add_line('1\t2')
+        for key, value in [((3, 1), '1'), ((1, 2), '1'), ((1, 1), 'Sample')]:
+            with pytest.raises(ValueError):
+                sheet.set_cell(key, value)
+
+    def test_2(self):
+        """
+        Таблица строк хранилища не растет при многократном изменении ячейки разным текстом.
+        """
+
+        sheet = Sheet('1\t2')
+        sheet.add_line("'Sample\t=A1")
+        sheet.calculate()
+
+        for i in range(5000):
+            sheet.set_cell((1, 1), f"'Text {i}")
+            assert sheet.recalculate() == {(1, 1): f'Text {i}', (2, 1): f'Text {i}'}
+
+        assert len(sheet._storage.text_list) < 2000
+
+
+class TestSheetRecalculate:
+    """
+    Пересчитать значения после изменения ячеек.
+    """
+
+    def test_1(self):
+        """
+        Пересчет без предварительного расчета равносилен полному расчету.
+        """
+
+        sheet = Sheet('1\t2')
+        sheet.add_line('1\t=A1+1')
+        sheet.set_cell((1, 1), '5')
+
+        assert sheet.recalculate() == {(1, 1): 5, (2, 1): 6}
+
+    def test_2(self):
+        """
+        Пересчитываются только измененная ячейка и зависящие от нее ячейки.
+        """
+
+        sheet = Sheet('2\t3')
+        sheet.add_line('1\t=A1+1\t=B1*2')
+        sheet.add_line('7\t=A2\t=C1+B2')
+        sheet.calculate()
+
+        sheet.set_cell((1, 1), '10')
+        assert sheet.recalculate() == {(1, 1): 10, (2, 1): 11, (3, 1): 22, (3, 2): 29}
+
+        sheet.set_cell((2, 2), "'Sample")
+        assert sheet.recalculate() == {(2, 2): 'Sample', (3, 2): str(CalcExpError.calc_exp())}
+
+        assert sheet.recalculate() == {}
+
+    def test_3(self):
+        """
+        Появление и устранение циклической ссылки.
+        """
+
+        sheet = Sheet('1\t3')
+        sheet.add_line('=B1\t=C1\t1')
+        sheet.calculate()
+
+        sheet.set_cell((3, 1), '=A1')
+        assert sheet.recalculate() == {(1, 1): str(CalcExpError.circle_ref()),
+                                       (2, 1): str(CalcExpError.circle_ref()),
+                                       (3, 1): str(CalcExpError.circle_ref())}
+
+        sheet.set_cell((2, 1), '=2')
+        assert sheet.recalculate() == {(1, 1): 2, (2, 1): 2, (3, 1): 2}
+
+    def test_4(self):
+        """
+        Результат пересчета совпадает с полным расчетом.
+        """
+
+        sheet = Sheet(f'{SIZE_Y}\t{SIZE_X}')
+        for y in range(1, SIZE_Y + 1):
+            sheet.add_line('\t'.join([f'={chr(ord("A") + x)}{y}+1' for x in range(1, SIZE_X)] +
+                                      ['=1' if y == SIZE_Y else f'=A{y + 1}+1']))
+        sheet.calculate()
+
+        sheet.set_cell((SIZE_X, SIZE_Y), '=100')
+        sheet.set_cell((1, 1), '=B2')
+        sheet.recalculate()
+
+        assert sheet.recalculate() == {}
+
+        result = dict(SheetValues(sheet.get_size(), sheet._storage))
+        assert sheet.calculate() == result
+
+    def test_5(self):
+        """
+        Значения предыдущего расчета не изменяются при изменении ячеек и пересчете.
+        """
+
+        sheet = Sheet('1\t3')
+        sheet.add_line("1\t=A1+1\t'Sample")
+        result = sheet.calculate()
+
+        sheet.set_cell((1, 1), '=C1')
+        sheet.set_cell((3, 1), "'Text")
+        assert dict(result) == {(1, 1): 1, (2, 1): 2, (3, 1): 'Sample'}
+
+        sheet.recalculate()
+        assert list(result.format_lines()) == ['1\t2\tSample']
+        assert dict(sheet.calculate()) == {(1, 1): 'Text', (2, 1): str(CalcExpError.calc_exp()), (3, 1): 'Text'}
+
+
+class TestSheetEvaluate:
+    """
+    Вычисление значений по требованию.
+    """
+
+    def test_1(self):
+        """
+        Не корректное обращение.
+        """
+
+        sheet = Sheet('1\t2')
+        with pytest.raises(RuntimeError):
+            sheet.get_value((1, 1))
+
+        sheet.add_line('1\t=A1')
+        for key in [(3, 1), (1, 2), None]:
+            with pytest.raises(ValueError):
+                sheet.evaluate([key])
+
+    def test_2(self):
+        """
+        Вычисляются только влияющие ячейки, результат совпадает с полным расчетом.
+        """
+
+        line_list = ['1\t=A1+1\t=C1', '=B1*2\t=A1-1\t=B2+A2', '=A3\t=B3\t=B2/0']
+
+        sheet = Sheet('3\t3')
+        for line in line_list:
+            sheet.add_line(line)
+
+        assert sheet.get_value((2, 2)) == 0
+        assert sheet._storage.get_value(sheet._size.get_index(2, 1)) is None
+        assert sheet._storage.get_value(sheet._size.get_index(3, 3)) is None
+
+        assert sheet.evaluate([(3, 2), (3, 1), (1, 1)]) == \
+               {(3, 2): 4, (3, 1): str(CalcExpError.circle_ref()), (1, 1): 1}
+        assert sheet.evaluate([(1, 3), (3, 3)]) == {(1, 3): str(CalcExpError.circle_ref()),
+                                                   (3, 3): str(CalcExpError.calc_exp())}
+
+        full_sheet = Sheet('3\t3')
+        for line in line_list:
+            full_sheet.add_line(line)
+        assert sheet.evaluate(full_sheet.calculate()) == dict(full_sheet.calculate())
+
+    def test_3(self):
+        """
+        Вычисленные значения сохраняются и повторно не вычисляются.
+        """
+
+        sheet = Sheet('1\t3')
+        sheet.add_line('1\t=A1+1\t=B1+1')
+
+        # Вызовы функций расчета
+        call_list = []
+        for index, calc_func in list(sheet._calc_func_list.items()):
+            sheet._calc_func_list[index] = lambda storage, i=index, f=calc_func: call_list.append(i) or f(storage)
+
+        assert sheet.get_value((3, 1)) == 3
+        assert sheet.get_value((2, 1)) == 2
+        assert sheet.get_value((3, 1)) == 3
+        assert call_list == [1, 2]
+
+    def test_4(self):
+        """
+        Изменение ячеек учитывается при следующем обращении.
+        """
+
+        sheet = Sheet('2\t2')
+        sheet.add_line('1\t=A1+1')
+        sheet.add_line('=B1*2\t=A2')
+        sheet.calculate()
+
+        sheet.set_cell((1, 1), '5')
+        assert sheet.get_value((2, 2)) == 12
+        assert sheet.recalculate() == {(1, 1): 5, (2, 1): 6, (1, 2): 12, (2, 2): 12}
+
+        sheet.set_cell((2, 1), '=A1')
+        assert sheet.get_value((2, 1)) == 5
+        assert sheet.get_value((1, 2)) == 10
+
+    def test_5(self):
+        """
+        Вычисление любого подмножества ячеек совпадает с полным расчетом, в том числе когда часть ячеек
+        вычислена предыдущими обращениями: цикл с условной функцией через диапазоны, зависящие от цикла ячейки,
+        изменение ячейки, создающее цикл.
+        """
+
+        line_list = ['=1+A4*B1\t=MAX(A3:B3)/1-SUM(B3:B1)', '2\t=B3', '=CHOOSE(A4, A1, 0)\t3', '9\t=MAX(A3:B2)+A4+A3']
+
+        def make_sheet() -> Sheet:
+            sheet = Sheet('4\t2')
+            for line in line_list:
+                sheet.add_line(line)
+            return sheet
+
+        edit_sheet = make_sheet()
+        edit_sheet.set_cell((2, 3), '=A2+B2')
+
+        result = dict(make_sheet().calculate())
+        edit_result = dict(edit_sheet.calculate())
+        key_list = list(result)
+
+        for count in range(1, len(key_list) + 1):
+            for part in itertools.combinations(key_list, count):
+                sheet = make_sheet()
+                assert sheet.evaluate(part) == {key: result[key] for key in part}
+                assert sheet.evaluate(key_list) == result
+
+                sheet.set_cell((2, 3), '=A2+B2')
+                assert sheet.evaluate(part) == {key: edit_result[key] for key in part}
+                assert sheet.evaluate(reversed(key_list)) == edit_result
+
+
+class TestSheetSparse:
+    """
+    Разреженный лист (хранятся только заполненные ячейки).
+    """
+
+    def test_1(self):
+        """
+        Результат расчета совпадает с обычным листом.
+        """
+
+        line_list = ["=A1\t=3-1*2+1\t'Sample\t", "=C1\t=A2-7/2\t=B1-8/2\t=D1", "'\t=A3\t=B4\t=D2+1"]
+
+        sheet = Sheet('3\t4')
+        sparse_sheet = Sheet('3\t4', sparse=True)
+        for line in line_list:
+            sheet.add_line(line)
+            sparse_sheet.add_line(line)
+
+        result = sheet.calculate()
+        sparse_result = sparse_sheet.calculate()
+
+        assert dict(sparse_result) == dict(result)
+        assert sparse_result[(4, 2)] == ''
+        assert sparse_result[(4, 3)] == str(CalcExpError.calc_exp())
+        for y in range(1, 4):
+            assert sparse_result.format_line(y) == result.format_line(y)
+        assert list(sparse_result.format_lines()) == list(result.format_lines())
+
+    def test_2(self):
+        """
+        Пустые ячейки не хранятся.
+        """
+
+        sheet = Sheet('1000\t100', sparse=True)
+        for y in range(1, 1001):
+            sheet.add_line('\t'.join(['=A1+1' if y == 1000 else ''] + [''] * 98 + [str(y)]))
+
+        result = sheet.calculate()
+        assert len(sheet._storage.type_list) == 1001
+        assert len(result) == 100000
+        assert result[(1, 1000)] == str(CalcExpError.calc_exp())
+        assert result[(100, 1000)] == 1000
+        assert result.format_line(1) == '\t' * 99 + '1'
+        assert list(result.format_lines())[999] == f'{CalcExpError.calc_exp()}' + '\t' * 99 + '1000'
+
+    def test_3(self):
+        """
+        Очистка ячейки удаляет ее из хранилища.
+        """
+
+        sheet = Sheet('1\t3', sparse=True)
+        sheet.add_line('1\t=A1\t=B1+1')
+        sheet.calculate()
+
+        sheet.set_cell((1, 1), '')
+        assert sheet.recalculate() == {(1, 1): '', (2, 1): '', (3, 1): str(CalcExpError.calc_exp())}
+        assert 0 not in sheet._storage.type_list
+
+        sheet.set_cell((2, 1), '')
+        assert sheet.recalculate() == {(2, 1): '', (3, 1): str(CalcExpError.calc_exp())}
+        assert sheet.calculate().format_line(1) == f'\t\t{CalcExpError.calc_exp()}'
+
+
+class TestSheetStats:
+    """
+    Статистика обработки листа.
+    """
+
+    def test_1(self):
+        """
+        Статистика по умолчанию не собирается.
+        """
+
+        assert Sheet('1\t1').get_stats() is None
+
+    def test_2(self):
+        """
+        Счетчики разбора и расчета.
+        """
+
+        sheet = Sheet('3\t3', stats=True)
+        sheet.add_line("=A1\t=3-1*2+1\t'Sample")
+        sheet.add_line("=C1\t=A2-7/2\t=B1-8/2")
+        sheet.add_line("'\t=A3\t=B4")
+        sheet.calculate()
+
+        stats = sheet.get_stats()
+        assert stats.cell_count == {'number': 0, 'text': 1, 'empty': 1, 'expression': 7}
+        assert stats.ref_count == 6 and stats.not_valid_ref_count == 1
+        assert stats.circle_count == 1
+        assert stats.error_count == {str(CalcExpError.circle_ref()): 1,
+                                     str(CalcExpError.calc_exp()): 1,
+                                     str(CalcExpError.not_valid_ref()): 1}
+        assert stats.max_depth == 2
+        assert set(stats.phase_time) == {'add_line', 'calculate'}
+
+    def test_3(self):
+        """
+        Глубина вычисления цепочки ссылок и пересчет.
+        """
+
+        sheet = Sheet('100\t1', stats=True)
+        for y in range(1, 101):
+            sheet.add_line('1' if y == 1 else f'=A{y - 1}+1')
+        sheet.calculate()
+        assert sheet.get_stats().max_depth == 99
+
+        sheet.set_cell((1, 100), '')
+        sheet.recalculate()
+        assert sheet.get_stats().cell_count['empty'] == 1
+        assert 'recalculate' in sheet.get_stats().phase_time
+
+
+class TestSheetRange:
+    """
+    Функции диапазонов.
+    """
+
+    @pytest.mark.parametrize('sparse', [False, True])
+    def test_1(self, sparse):
+        """
+        Функции учитывают только числа, текст и пустые ячейки пропускаются, результат используется в выражении.
+        :param sparse: Разреженный лист.
+        """
+
+        sheet = Sheet('3\t4', sparse=sparse)
+        sheet.add_line("1\t=A1*5\t'Text\t=SUM(A1:C3)")
+        sheet.add_line("=2-10\t\t=B1\t=MIN(C3:A1)*2+MAX(A1:C3)")
+        sheet.add_line("\t=COUNT(A1:C2)\t=sum(A2)\t=MAX(C1)+MIN(C1)+count(D2)")
+
+        assert sheet.calculate().get_line(1) == [1, 5, 'Text', -1]
+        assert sheet.calculate().get_line(2) == [-8, '', 5, -11]
+        assert sheet.calculate().get_line(3) == ['', 4, -8, 1]
+
+    def test_2(self):
+        """
+        Ошибки: диапазон за пределами листа, ошибка ячейки диапазона (COUNT ее пропускает), цикл через диапазон.
+        """
+
+        sheet = Sheet('2\t3')
+        sheet.add_line('=1/0\t=SUM(A1)\t=COUNT(A1:A2)')
+        sheet.add_line('=SUM(A1:D1)\t=SUM(B1:C2)\t2')
+
+        assert sheet.calculate().get_line(1) == [str(CalcExpError.calc_exp()), str(CalcExpError.calc_exp()), 0]
+        assert sheet.calculate().get_line(2) == [str(CalcExpError.not_valid_ref()),
+                                                 str(CalcExpError.circle_ref()), 2]
+
+    def test_3(self):
+        """
+        Длинный столбец: функции пересекающихся диапазонов совпадают с прямым расчетом, пересчет и вычисление
+        по требованию после изменения ячейки диапазона.
+        """
+
+        size = 300
+        sheet = Sheet(f'{size}\t3')
+        for y in range(1, size + 1):
+            sheet.add_line(f'{y * 7 % 101}\t=SUM(A1:A{y})\t=MAX(A{(y + 1) // 2}:A{y})-MIN(A{(y + 1) // 2}:A{y})')
+
+        value_list = [y * 7 % 101 for y in range(1, size + 1)]
+        result = sheet.calculate()
+        for y in range(1, size + 1):
+            part = value_list[(y + 1) // 2 - 1:y]
+            assert result[(2, y)] == sum(value_list[:y]) and result[(3, y)] == max(part) - min(part)
+
+        sheet.set_cell((1, 200), '1000')
+        result = sheet.recalculate()
+        assert result[(2, size)] == sum(value_list) - value_list[199] + 1000
+        assert (2, 199) not in result and (1, 200) in result
+
+        sheet.set_cell((1, 100), '0')
+        assert sheet.get_value((2, 150)) == sum(value_list[:150]) - value_list[99]
+        assert sheet.get_value((2, size)) == sum(value_list) - value_list[99] - value_list[199] + 1000
+
+    def test_4(self):
+        """
+        Статистика и анализ зависимостей не учитывают блоки диапазонов.
+        """
+
+        sheet = Sheet('40\t2', stats=True)
+        for y in range(1, 41):
+            sheet.add_line(f'{y}\t=SUM(A1:A{y})' if y > 1 else '1\t=A1')
+        sheet.calculate()
+
+        assert sheet.get_stats().max_depth == 1
+        assert sheet.get_stats().ref_count == 40
+
+        explain = sheet.explain()
+        assert explain.get_cell((2, 40)).precedent_count == 40
+        assert explain.get_cell((2, 40)).depth == 1
+        assert all(cell.key[0] in (1, 2) for cell in explain.get_cell_list())
+
+
+class TestSheetCondition:
+    """
+    Условные функции и операторы сравнения.
+    """
+
+    @pytest.mark.parametrize('sparse', [False, True])
+    def test_1(self, sparse):
+        """
+        Вычисляется только выбранный аргумент: ошибки остальных аргументов на результат не влияют.
+        :param sparse: Разреженный лист.
+        """
+
+        sheet = Sheet('2\t4', sparse=sparse)
+        sheet.add_line('10\t0\t=IF(B1=0, 0, A1/B1)\t=A1>B1')
+        sheet.add_line("'Text\t=CHOOSE(D1+1, A2, A1*2, 1/0)\t=IF(A1<>10, A2, B2+1)\t=IF(B1, A1)")
+
+        assert sheet.calculate().get_line(1) == [10, 0, 0, 1]
+        assert sheet.calculate().get_line(2) == ['Text', 20, 21, 0]
+
+        sheet.set_cell((4, 1), '=A1<B1')
+        assert sheet.recalculate() == {(4, 1): 0, (2, 2): 'Text', (3, 2): str(CalcExpError.calc_exp())}
+
+    def test_2(self):
+        """
+        Вычисление по требованию не вычисляет ячейки не выбранных аргументов, результат совпадает с полным расчетом.
+        """
+
+        line_list = ['1\t=IF(A1>0, A2, B2)', '=A3+1\t=B3+1', '=A4*2\t=B4*2', '5\t=A4/0']
+
+        sheet = Sheet('4\t2')
+        for line in line_list:
+            sheet.add_line(line)
+
+        assert sheet.get_value((2, 1)) == 11
+        assert all(sheet._storage.get_value(sheet._size.get_index(2, y)) is None for y in range(2, 5))
+
+        full_sheet = Sheet('4\t2')
+        for line in line_list:
+            full_sheet.add_line(line)
+        assert sheet.evaluate(full_sheet.calculate()) == dict(full_sheet.calculate())
+
+        sheet.set_cell((1, 1), '0')
+        assert sheet.get_value((2, 1)) == str(CalcExpError.calc_exp())
+        assert sheet._storage.get_value(sheet._size.get_index(1, 3)) == 10
+
+    @pytest.mark.parametrize('workers', [None, 2])
+    def test_3(self, workers):
+        """
+        Цикл только через не выбранный аргумент циклом не является.
+        :param workers: Кол-во процессов.
+        """
+
+        def make_sheet(condition: str) -> Sheet:
+            sheet = Sheet('2\t3')
+            sheet.add_line(f'=IF(C1>0, 5, B1)\t=A1+1\t{condition}')
+            sheet.add_line('=A2\t=A1*2\t=IF(1, C2, A1)')
+            return sheet
+
+        circle_text = str(CalcExpError.circle_ref())
+
+        assert make_sheet('1').calculate(workers).get_line(1) == [5, 6, 1]
+        assert make_sheet('1').calculate(workers).get_line(2) == [circle_text, 10, circle_text]
+        assert make_sheet('1').get_value((2, 2)) == 10
+        assert make_sheet('1').evaluate([(2, 1), (3, 2)]) == {(2, 1): 6, (3, 2): circle_text}
+
+        sheet = make_sheet('1')
+        sheet.calculate(workers)
+        sheet.set_cell((3, 1), '0')
+        assert sheet.recalculate() == {(3, 1): 0, (1, 1): circle_text, (2, 1): circle_text,
+                                       (2, 2): str(CalcExpError.calc_exp()), (3, 2): circle_text}
+
+        assert make_sheet('0').get_value((2, 1)) == circle_text
+        assert make_sheet('0').get_value((2, 2)) == str(CalcExpError.calc_exp())
+
+    def test_4(self):
+        """
+        Значения цикла с условной функцией не зависят от порядка вычисления по требованию
+        и совпадают с полным расчетом (в том числе после изменения ячейки).
+        """
+
+        def make_sheet(edit: bool) -> Sheet:
+            sheet = Sheet('2\t3')
+            sheet.add_line('=1+B1\t=B1+A2\t=2+COUNT(A1:B1)')
+            sheet.add_line('=CHOOSE(9, A1, 0)\t=IF(A2, C1, 4)\t=C2')
+            if edit:
+                sheet.set_cell((2, 1), '=A2')
+            return sheet
+
+        result = dict(make_sheet(False).calculate())
+        edit_result = dict(make_sheet(True).calculate())
+        assert result[(1, 1)] == result[(2, 1)] == str(CalcExpError.circle_ref())
+
+        for key_list in itertools.permutations(result):
+            sheet = make_sheet(False)
+            assert {key: sheet.get_value(key) for key in key_list} == result
+
+            sheet.set_cell((2, 1), '=A2')
+            assert {key: sheet.get_value(key) for key in key_list} == edit_result
+
+
+class TestSheetTemplate:
+    """
+    Общие выражения (заполнение столбца вниз и строки вправо).
+    """
+
+    @pytest.mark.parametrize('sparse', [False, True])
+    def test_1(self, sparse):
+        """
+        Совпадающие со сдвигом выражения используют общее выражение, ячейки вычисляются циклами,
+        результат совпадает с расчетом отдельных выражений.
+        :param sparse: Разреженный лист.
+        """
+
+        line_list = ['1\t=A1*2\t=B1+A1\t=C1+B1\t=SUM(A1:B1)',
+                     '2\t=A2*2\t=B2+A2\t=C2+B2\t=SUM(A2:B2)',
+                     "'Text\t=A3*2\t=B3+A3\t=C3+B3\t=SUM(A3:B3)",
+                     '4\t=A4*2\t=B4+A4\t7\t=SUM(A4:B4)']
+
+        sheet = Sheet('4\t5', sparse=sparse)
+        for line in line_list:
+            sheet.add_line(line)
+
+        # Циклы расчета общих выражений: B1 (столбец B), C1 (C1:D1, столбец C, D2:D3).
+        # Общее выражение E1 (столбец E) содержит функцию диапазона, ячейки вычисляются отдельно
+        assert len(sheet._template_list) == 2
+        assert len(sheet._calc_func_list._template_list) == 11
+
+        error_text = str(CalcExpError.calc_exp())
+        result = sheet.calculate()
+        assert result.get_line(1) == [1, 2, 3, 5, 3]
+        assert result.get_line(2) == [2, 4, 6, 10, 6]
+        assert result.get_line(3) == ['Text', error_text, error_text, error_text, error_text]
+        assert result.get_line(4) == [4, 8, 12, 7, 12]
+        assert sheet._template_list == []
+
+        sheet.set_cell((1, 2), '3')
+        assert sheet.recalculate() == {(1, 2): 3, (2, 2): 6, (3, 2): 9, (4, 2): 15, (5, 2): 9}
+
+    def test_2(self):
+        """
+        Циклы, ссылки за пределы листа и ссылки на выражения без общего выражения вычисляются в порядке графа
+        зависимостей.
+        """
+
+        sheet = Sheet('3\t3')
+        sheet.add_line('=A1+1\t=C1+1\t=SUM(A1:A3)')
+        sheet.add_line('=A2+1\t=C2+1\t=A2')
+        sheet.add_line('=B4+1\t=C3+1\t=B3')
+
+        circle_text = str(CalcExpError.circle_ref())
+        result = sheet.calculate()
+        assert result.get_line(1) == [circle_text, str(CalcExpError.calc_exp()), str(CalcExpError.calc_exp())]
+        assert result.get_line(2) == [circle_text, str(CalcExpError.calc_exp()), str(CalcExpError.calc_exp())]
+        assert result.get_line(3) == [str(CalcExpError.not_valid_ref()), circle_text, circle_text]
+
+    def test_3(self):
+        """
+        Изменение ячейки и вычисление по требованию до полного расчета.
+        """
+
+        sheet = Sheet('3\t2')
+        for y in range(1, 4):
+            sheet.add_line(f'{y}\t=A{y}*10')
+
+        sheet.set_cell((2, 2), '=A2')
+        assert sheet._template_list == []
+        assert sheet.calculate().get_line(2) == [2, 2]
+
+        sheet = Sheet('3\t2')
+        for y in range(1, 4):
+            sheet.add_line(f'{y}\t=B{y + 1}+A{y}' if y < 3 else '3\t=1/0')
+
+        assert sheet.get_value((2, 2)) == str(CalcExpError.calc_exp())
+        assert sheet.calculate().get_line(1) == [1, str(CalcExpError.calc_exp())]
+
+    def test_4(self):
+        """
+        После общих выражений без совпадений ячейки столбца разбираются без общих выражений
+        (1, 3, 7 ... ячеек), после совпадения общие выражения используются для каждой ячейки.
+        """
+
+        sheet = Sheet('20\t1')
+        for y in range(1, 21):
+            sheet.add_line(f'=5+{y}' if y < 8 else f'=A{y - 1}+1')
+
+        # Общие выражения A1, A2, A4, A8 (без совпадений в A1:A15), A9:A15 разбираются отдельно,
+        # общее выражение A8 совпадает с A16:A20
+        assert sheet._column_backoff_list == [7]
+        assert len(sheet._template_list) == 1
+        assert len(sheet._calc_func_list._template_list) == 6
+        assert sheet.calculate().get_line(20) == [25]
+
+    def test_5(self):
+        """
+        Одинаковые выражения разных ячеек используют одну функцию расчета, в том числе ячейка цикла
+        и зависящая от цикла ячейка. Изменение первой ячейки не влияет на остальные ячейки.
+        """
+
+        sheet = Sheet('3\t3', stats=True)
+        sheet.add_line('1\t=SUM(A1:A3)*2\t=B2+1')
+        sheet.add_line('2\t=SUM(A1:A3)*2\t=C2+1')
+        sheet.add_line('3\t=C2+1\t=SUM(A1:A3)*2')
+
+        calc_func_list = sheet._calc_func_list
+        assert calc_func_list[1] is calc_func_list[4] is calc_func_list[8]
+        assert calc_func_list[5] is calc_func_list[7]
+        assert sheet.get_stats().ref_count == 6
+
+        circle_text = str(CalcExpError.circle_ref())
+        result = sheet.calculate()
+        assert result.get_line(1) == [1, 12, 13]
+        assert result.get_line(2) == [2, 12, circle_text]
+        assert result.get_line(3) == [3, str(CalcExpError.calc_exp()), 12]
+
+        sheet.set_cell((2, 1), '=A1')
+        sheet.set_cell((1, 1), '4')
+        assert sheet.recalculate() == {(1, 1): 4, (2, 1): 4, (2, 2): 18, (3, 1): 19, (3, 3): 18}
+
 
 class TestSheetSizeConstructor:
     """
@@ -218,6 +944,31 @@ class TestSheetSizeConstructor:
         assert sheet_size.x == size_x
 
 
+class TestSheetSizeGetIndex:
+    """
+    Индекс ячейки.
+    """
+
+    @pytest.mark.parametrize('key', [(1, 1), (3, 1), (1, 2), (3, 2)])
+    def test_1(self, key):
+        """
+        Индекс ячейки в пределах листа.
+        :param tuple key: Координаты ячейки.
+        """
+
+        sheet_size = SheetSize(2, 3)
+        assert sheet_size.get_key(sheet_size.get_index(*key)) == key
+
+    @pytest.mark.parametrize('key', [(0, 1), (1, 0), (4, 1), (1, 3)])
+    def test_2(self, key):
+        """
+        Ячейка за пределами листа.
+        :param tuple key: Координаты ячейки.
+        """
+
+        assert SheetSize(2, 3).get_index(*key) is None
+
+
 class TestSheetSizeParser:
     """
     Разбор.
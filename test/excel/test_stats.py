@@ -0,0 +1,36 @@
+from excel.stats import SheetStats
+
+
+class TestSheetStats:
+    """
+    Статистика листа.
+    """
+
+    def test_1(self):
+        """
+        Накопление счетчиков.
+        """
+
+        stats = SheetStats()
+        stats.add_cell(SheetStats.NUMBER)
+        stats.add_cell(SheetStats.NUMBER)
+        stats.add_phase_time('calculate', 0.5)
+        stats.add_phase_time('calculate', 0.25)
+
+        result = stats.to_dict()
+        assert result['cell_count'] == {'number': 2, 'text': 0, 'empty': 0, 'expression': 0}
+        assert result['phase_time'] == {'calculate': 0.75}
+
+    def test_2(self):
+        """
+        Строковое представление.
+        """
+
+        stats = SheetStats()
+        stats.error_count['#CalcError'] = 1
+        stats.add_phase_time('add_line', 1)
+
+        lines = stats.format().split('\n')
+        assert 'cell_count.number\t0' in lines
+        assert 'error_count.#CalcError\t1' in lines
+        assert 'phase_time.add_line\t1.000000' in lines
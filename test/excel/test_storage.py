@@ -0,0 +1,205 @@
+import pytest
+
+from excel.storage import CellStorage, SparseCellStorage
+
+
+class TestCellStorageSetValue:
+    """
+    Задать значение ячейки.
+    """
+
+    @pytest.mark.parametrize('value', [('', CellStorage.EMPTY),
+                                       (0, CellStorage.NUMBER),
+                                       (-2 ** 63, CellStorage.NUMBER),
+                                       (2 ** 63, CellStorage.BIG_NUMBER),
+                                       ('Sample', CellStorage.TEXT)])
+    def test_1(self, value):
+        """
+        Тип и значение ячейки.
+        :param tuple value: Значение и тип.
+        """
+
+        storage = CellStorage()
+        storage.extend(2)
+        storage.set_value(1, value[0])
+
+        assert storage.type_list[1] == value[1]
+        assert storage.get_value(1) == value[0]
+        assert storage.get_number(1) == (value[0] if isinstance(value[0], int) else None)
+        assert storage.get_value(0) == ''
+
+    def test_2(self):
+        """
+        Одинаковые строки хранятся в таблице строк один раз.
+        """
+
+        storage = CellStorage()
+        storage.extend(3)
+        storage.set_value(0, 'Sample')
+        storage.set_value(1, 'Sample')
+        storage.set_error(2, '#CalcError')
+
+        assert storage.text_list == ['Sample', '#CalcError']
+        assert storage.has_text('#CalcError') and not storage.has_text('#CircleRef')
+        assert storage.type_list[2] == CellStorage.ERROR
+        assert storage.get_number(2) is None
+
+    def test_3(self):
+        """
+        Замена значения.
+        """
+
+        storage = CellStorage()
+        storage.extend(1)
+        storage.set_value(0, 2 ** 64)
+        storage.set_expression(0)
+        assert storage.get_value(0) is None
+
+        storage.set_value(0, 1)
+        assert storage.get_value(0) == 1
+
+
+class TestCellStorageFormatLine:
+    """
+    Строковое представление значений.
+    """
+
+    def test_1(self):
+        """
+        Значения всех типов.
+        """
+
+        storage = CellStorage()
+        storage.extend(6)
+        for index, value in enumerate([1, '', 'Sample', 2 ** 64]):
+            storage.set_value(index, value)
+        storage.set_error(4, '#CircleRef')
+        storage.set_value(5, -1)
+
+        assert storage.format_line(0, 6) == f'1\t\tSample\t{2 ** 64}\t#CircleRef\t-1'
+        assert storage.format_line(4, 1) == '#CircleRef'
+        assert list(storage.format_lines(3)) == ['1\t\tSample', f'{2 ** 64}\t#CircleRef\t-1']
+        assert list(storage.format_lines(2, 2, 4)) == [f'Sample\t{2 ** 64}', '#CircleRef\t-1']
+
+
+class TestSparseCellStorage:
+    """
+    Разреженное хранилище.
+    """
+
+    def test_1(self):
+        """
+        Хранятся только заполненные ячейки, отсутствующие ячейки пустые.
+        """
+
+        storage = SparseCellStorage()
+        storage.extend(6)
+        storage.set_value(1, 2 ** 64)
+        storage.set_value(4, 'Sample')
+        storage.set_expression(5)
+
+        assert len(storage) == 6
+        assert sorted(storage.type_list) == [1, 4, 5]
+        assert storage.get_value(0) == '' and storage.get_number(0) is None
+        assert storage.get_number(1) == 2 ** 64
+
+        storage.set_value(1, '')
+        storage.set_error(5, '#CalcError')
+        assert sorted(storage.type_list) == [4, 5]
+        assert storage.get_value(1) == ''
+        assert storage.get_value(5) == '#CalcError'
+
+    def test_2(self):
+        """
+        Строковое представление значений.
+        """
+
+        storage = SparseCellStorage()
+        storage.extend(12)
+        storage.set_value(1, 1)
+        storage.set_value(3, 'Sample')
+        storage.set_value(6, -1)
+
+        assert storage.format_line(0, 4) == '\t1\t\tSample'
+        assert storage.format_line(2, 4) == '\tSample\t\t'
+        assert list(storage.format_lines(4)) == ['\t1\t\tSample', '\t\t-1\t', '\t\t\t']
+        assert list(storage.format_lines(1))[:4] == ['', '1', '', 'Sample']
+        assert list(storage.format_lines(2, 2, 6)) == ['\tSample', '\t', '-1\t']
+        assert list(storage.format_lines(4, 4)) == ['\t\t-1\t', '\t\t\t']
+
+
+class TestCellStorageCompactTexts:
+    """
+    Уплотнение таблицы строк.
+    """
+
+    @pytest.mark.parametrize('storage_class', [CellStorage, SparseCellStorage])
+    def test_1(self, storage_class):
+        """
+        В таблице остаются только строки значений ячеек, значения ячеек не изменяются.
+        :param type storage_class: Класс хранилища.
+        """
+
+        storage = storage_class()
+        storage.extend(4)
+        for text in ['First', 'Second', 'Sample']:
+            storage.set_value(0, text)
+        storage.set_error(1, '#CalcError')
+        storage.set_value(2, 'Sample')
+        storage.set_value(3, 1)
+        storage.set_error(3, '#CircleRef')
+        storage.set_value(3, 2)
+
+        storage.compact_texts()
+
+        assert sorted(storage.text_list) == ['#CalcError', 'Sample']
+        assert [storage.get_value(index) for index in range(4)] == ['Sample', '#CalcError', 'Sample', 2]
+
+        storage.set_value(3, 'Sample')
+        assert len(storage.text_list) == 2
+
+    @pytest.mark.parametrize('storage_class', [CellStorage, SparseCellStorage])
+    def test_2(self, storage_class):
+        """
+        При многократной замене значения разным текстом таблица строк уплотняется.
+        :param type storage_class: Класс хранилища.
+        """
+
+        storage = storage_class()
+        storage.extend(2)
+        storage.set_value(1, 'Sample')
+        for i in range(10000):
+            storage.set_value(0, f'Text {i}')
+            storage.compact_texts_if_needed()
+
+        assert len(storage.text_list) <= 1026
+        assert [storage.get_value(index) for index in range(2)] == ['Text 9999', 'Sample']
+
+
+class TestCellStorageCopy:
+    """
+    Копия хранилища.
+    """
+
+    @pytest.mark.parametrize('storage_class', [CellStorage, SparseCellStorage])
+    def test_1(self, storage_class):
+        """
+        Изменение ячеек хранилища не изменяет копию.
+        :param type storage_class: Класс хранилища.
+        """
+
+        storage = storage_class()
+        storage.extend(3)
+        storage.set_value(0, 'Sample')
+        storage.set_value(1, 2 ** 64)
+        storage.set_error(2, '#CalcError')
+
+        storage_copy = storage.copy()
+        storage.set_value(0, 'Text')
+        storage.set_value(1, 1)
+        storage.set_expression(2)
+        storage.compact_texts()
+
+        assert isinstance(storage_copy, storage_class)
+        assert [storage_copy.get_value(index) for index in range(3)] == ['Sample', 2 ** 64, '#CalcError']
+        assert [storage.get_value(index) for index in range(3)] == ['Text', 1, None]
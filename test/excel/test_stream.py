@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+from excel.stream import LineReader, MappedLineReader, write_lines
+
+
+class TestLineReader:
+    """
+    Чтение строк двоичного потока блоками.
+    """
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1 << 20])
+    @pytest.mark.parametrize('value', [('2\t1\n1\n=A1\n', ['2\t1', '1', '=A1']),
+                                       ('2\t1\r\n1\r\n=A1', ['2\t1', '1', '=A1']),
+                                       ("1\r\r\n'Тест\t\rЯ", ['1', '', "'Тест\t", 'Я']),
+                                       ('\n\n', ['', '']),
+                                       ('', [])])
+    def test_1(self, chunk_size, value):
+        """
+        Строки не зависят от размера блока: концы строк \\r\\n и символы кодировки разделены границей блока.
+        :param int chunk_size: Размер блока.
+        :param tuple value: Содержимое потока и строки.
+        """
+
+        reader = LineReader(io.BytesIO(value[0].encode('utf-8')), chunk_size=chunk_size)
+        assert list(reader) == value[1]
+
+    def test_2(self):
+        """
+        Чтение по одной строке, конец потока.
+        """
+
+        reader = LineReader(io.BytesIO('1\t2\n3'.encode('utf-8')))
+        assert reader.read_line() == '1\t2'
+        assert reader.read_line() == '3'
+
+        with pytest.raises(EOFError):
+            reader.read_line()
+
+
+class TestWriteLines:
+    """
+    Запись строк пачками.
+    """
+
+    @pytest.mark.parametrize('count', [0, 1, 4096, 10000])
+    def test_1(self, count):
+        """
+        Каждая строка завершается символом конца строки.
+        :param int count: Кол-во строк.
+        """
+
+        stream = io.StringIO()
+        write_lines(stream, (f'{i}\t{i}' for i in range(count)))
+        assert stream.getvalue() == ''.join(f'{i}\t{i}\n' for i in range(count))
+
+
+class TestMappedLineReader:
+    """
+    Чтение строк файла, отображенного в память.
+    """
+
+    @pytest.mark.parametrize('value', [('2\t1\r\n1\n=A1', ['2\t1', '1', '=A1']), ('', [])])
+    def test_1(self, tmp_path, value):
+        """
+        Строки файла (в том числе пустого) совпадают со строками потока.
+        :param tuple value: Содержимое файла и строки.
+        """
+
+        path = tmp_path / 'sheet.txt'
+        path.write_bytes(value[0].encode('utf-8'))
+
+        with MappedLineReader(str(path), chunk_size=2) as reader:
+            assert list(reader) == value[1]
@@ -0,0 +1,87 @@
+import pytest
+
+from excel.sheet import Sheet
+from excel.stream_sheet import StreamSheet
+
+STREAM_LINE_LIST = ["1\t=A1*2\t'Text\t=B1+C1",
+                    "=A1+1\t=SUM(A1:B2)-B2\t=E2\t=C2",
+                    "=A2*B2\t=B3\t=A3/0\t=MAX(A1:B3)+D2",
+                    "=IF(A3>100, A2, B2)\t12\t=A4+B4\t=A4+G1",
+                    "=C5\t=D5\t=A5\t=COUNT(A3:D5)"]
+"""
+Строки листа, выражения которых ссылаются на ячейки своей строки и одной предшествующей строки
+(в том числе ошибки вычисления, циклические и не корректные ссылки)
+"""
+
+
+class TestStreamSheet:
+    """
+    Потоковый расчет листа.
+    """
+
+    @pytest.mark.parametrize('window', [2, 3, 10])
+    def test_1(self, window):
+        """
+        Значения строк совпадают с расчетом листа целиком.
+        :param int window: Кол-во строк окна.
+        """
+
+        size_line = f'{len(STREAM_LINE_LIST)}\t4'
+        sheet = Sheet(size_line)
+        stream_sheet = StreamSheet(size_line, window)
+        line_list = []
+        for line in STREAM_LINE_LIST:
+            sheet.add_line(line)
+            stream_sheet.add_line(line)
+            line_list.append(stream_sheet.format_line())
+
+        result = sheet.calculate()
+        assert line_list == list(result.format_lines())
+        assert stream_sheet.get_line() == result.get_line(len(STREAM_LINE_LIST))
+
+    @pytest.mark.parametrize('line', ['=A4\t1', '=SUM(A1:B2)\t1', '=A1\t1'])
+    def test_2(self, line):
+        """
+        Ссылка на последующую строку, либо на строку за пределами окна является ошибкой разбора.
+        Ошибка разбора не изменяет строки окна.
+        :param str line: Третья строка листа.
+        """
+
+        stream_sheet = StreamSheet('4\t2', 1)
+        stream_sheet.add_line('1\t2')
+        stream_sheet.add_line('=A1+B1\t=A2*2')
+
+        with pytest.raises(ValueError):
+            stream_sheet.add_line(line)
+        assert stream_sheet.get_line() == [3, 6]
+
+        stream_sheet.add_line('=A2+B2\t=A3')
+        assert stream_sheet.get_line() == [9, 9]
+
+    def test_3(self):
+        """
+        Значения строки до добавления строк.
+        """
+
+        stream_sheet = StreamSheet('1\t1', 0)
+        with pytest.raises(RuntimeError):
+            stream_sheet.format_line()
+
+        with pytest.raises(ValueError):
+            StreamSheet('1\t1', -1)
+
+    def test_4(self):
+        """
+        Таблица строк хранилища не растет при большом кол-ве строк с разным текстом.
+        """
+
+        size_y = 10000
+        stream_sheet = StreamSheet(f'{size_y}\t2', 1)
+        for y in range(1, size_y + 1):
+            stream_sheet.add_line(f"'Text {y}\t=A{y}")
+            assert stream_sheet.get_line() == [f'Text {y}', f'Text {y}']
+
+        assert len(stream_sheet._storage.text_list) < 2000
+
+        with pytest.raises(ValueError):
+            stream_sheet.add_line("'Text\t1")
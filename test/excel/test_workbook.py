@@ -0,0 +1,259 @@
+import pytest
+
+from excel.cell.expression_value import _CalcExpError as CalcExpError
+from excel.sheet import Sheet
+from excel.workbook import Workbook
+
+SHEET_LIST = {'Sheet1': ('2\t2', ['1\t=Sheet2!C1+A1', '=B1*2\t=Sheet3!A1']),
+              'Sheet2': ('1\t3', ["=Sheet1!A1+5\t'Text\t=A1*10"]),
+              'Sheet3': ('2\t1', ['=A2', '=Sheet3!A1'])}
+"""
+Листы книги: ссылки между листами, ссылка на лист с циклом, ссылка листа на себя по имени
+"""
+
+
+def make_workbook(sparse: bool = False) -> Workbook:
+    """
+    Создать книгу из SHEET_LIST.
+    :param sparse: Разреженное хранилище.
+    """
+
+    workbook = Workbook(sparse=sparse)
+    for name, (size_line, _) in SHEET_LIST.items():
+        workbook.add_sheet(name, size_line)
+
+    for name, (_, line_list) in SHEET_LIST.items():
+        for line in line_list:
+            workbook.get_sheet(name).add_line(line)
+
+    return workbook
+
+
+class TestWorkbookAddSheet:
+    """
+    Добавить лист.
+    """
+
+    @pytest.mark.parametrize('name', ['', None, '1Sheet', 'Sheet 1', 'Sheet!', 'Лист'])
+    def test_1(self, name):
+        """
+        Не корректное имя листа.
+        :param name: Имя листа.
+        """
+
+        with pytest.raises(ValueError):
+            Workbook().add_sheet(name, '1\t1')
+
+    def test_2(self):
+        """
+        Повторное имя листа, не корректный размер, отсутствующий лист.
+        """
+
+        workbook = Workbook()
+        assert isinstance(workbook.add_sheet('Sheet1', '1\t1'), Sheet)
+
+        with pytest.raises(ValueError):
+            workbook.add_sheet('Sheet1', '1\t1')
+
+        with pytest.raises(ValueError):
+            workbook.add_sheet('Sheet2', '0\t1')
+
+        with pytest.raises(ValueError):
+            workbook.get_sheet('Sheet2')
+
+        assert workbook.get_sheet_names() == ['Sheet1']
+
+    def test_3(self):
+        """
+        Расчет до окончания инициализации всех листов.
+        """
+
+        workbook = Workbook()
+        workbook.add_sheet('Sheet1', '1\t1').add_line('1')
+        sheet = workbook.add_sheet('Sheet2', '2\t1')
+        sheet.add_line('=Sheet1!A1')
+
+        with pytest.raises(RuntimeError):
+            workbook.calculate()
+
+        with pytest.raises(RuntimeError):
+            workbook.get_sheet('Sheet1').calculate()
+
+        sheet.add_line('2')
+        with pytest.raises(ValueError):
+            sheet.add_line('3')
+
+        assert dict(workbook.calculate()['Sheet2']) == {(1, 1): 1, (1, 2): 2}
+
+
+class TestWorkbookCalculate:
+    """
+    Расчет значений.
+    """
+
+    @pytest.mark.parametrize('sparse', [False, True])
+    @pytest.mark.parametrize('workers', [None, 2])
+    def test_1(self, sparse, workers):
+        """
+        Ссылки между листами.
+        :param sparse: Разреженное хранилище.
+        :param workers: Кол-во процессов.
+        """
+
+        result = make_workbook(sparse).calculate(workers)
+
+        assert list(result) == ['Sheet1', 'Sheet2', 'Sheet3']
+        assert dict(result['Sheet1']) == {(1, 1): 1, (2, 1): 61, (1, 2): 122, (2, 2): str(CalcExpError.calc_exp())}
+        assert dict(result['Sheet2']) == {(1, 1): 6, (2, 1): 'Text', (3, 1): 60}
+        assert dict(result['Sheet3']) == {(1, 1): str(CalcExpError.circle_ref()),
+                                          (1, 2): str(CalcExpError.circle_ref())}
+
+        assert list(result['Sheet1'].format_lines()) == ['1\t61', f'122\t{CalcExpError.calc_exp()}']
+        assert result['Sheet2'].format_line(1) == '6\tText\t60'
+        assert result['Sheet2'].get_line(1) == [6, 'Text', 60]
+        assert len(result['Sheet3']) == 2
+
+    def test_2(self):
+        """
+        Ссылки на отсутствующий лист и за пределы листа не корректны, лист вне книги не разрешает ссылки на листы.
+        Лист добавляется в книгу до задания ссылающихся на него выражений.
+        """
+
+        workbook = Workbook()
+        workbook.add_sheet('Sheet1', '1\t3').add_line('=Sheet2!A1\t=Sheet1!D1\t=Sheet1!A1')
+        workbook.add_sheet('Sheet2', '1\t1').add_line('1')
+
+        not_valid_text = str(CalcExpError.not_valid_ref())
+        assert workbook.get_sheet('Sheet1').calculate().get_line(1) == [not_valid_text, not_valid_text,
+                                                                         str(CalcExpError.calc_exp())]
+
+        sheet = Sheet('1\t2')
+        sheet.add_line('1\t=Sheet1!A1')
+        assert sheet.calculate().get_line(1) == [1, not_valid_text]
+
+    @pytest.mark.parametrize('workers', [None, 2])
+    def test_3(self, workers):
+        """
+        Функции диапазонов другого листа: цикл через диапазон, ошибка ячейки диапазона,
+        пересчет после изменения ячейки диапазона.
+        :param workers: Кол-во процессов.
+        """
+
+        workbook = Workbook()
+        sheet = workbook.add_sheet('Sheet2', '3\t1')
+        workbook.add_sheet('Sheet1', '1\t3').add_line('=SUM(Sheet2!A1:A3)\t=MAX(Sheet2!A1:A3)\t=SUM(Sheet3!A1)')
+        for line in ['1', '=Sheet1!A1-A1', '3']:
+            sheet.add_line(line)
+
+        assert workbook.calculate(workers)['Sheet1'].get_line(1) == [str(CalcExpError.circle_ref()),
+                                                                      str(CalcExpError.calc_exp()),
+                                                                      str(CalcExpError.not_valid_ref())]
+
+        workbook.set_cell('Sheet2', (1, 2), '10')
+        assert workbook.recalculate(workers) == {'Sheet1': {(1, 1): 14, (2, 1): 10}, 'Sheet2': {(1, 2): 10}}
+
+
+    def test_4(self):
+        """
+        Общие выражения листов книги вычисляются циклами, ссылки других листов на их ячейки вычисляются после них.
+        """
+
+        workbook = Workbook()
+        sheet1 = workbook.add_sheet('Sheet1', '1\t3')
+        sheet2 = workbook.add_sheet('Sheet2', '3\t2')
+        sheet1.add_line('=Sheet2!B3\t=A1+1\t=B1+1')
+        for y in range(1, 4):
+            sheet2.add_line(f'{y}\t=A{y}*B{y - 1}' if y > 1 else '1\t=Sheet1!C1')
+
+        result = workbook.calculate()
+        assert result['Sheet1'].get_line(1) == [str(CalcExpError.circle_ref())] * 3
+        assert result['Sheet2'].get_line(3) == [3, str(CalcExpError.circle_ref())]
+
+        workbook.set_cell('Sheet2', (2, 1), '5')
+        assert workbook.recalculate() == {'Sheet1': {(1, 1): 30, (2, 1): 31, (3, 1): 32},
+                                          'Sheet2': {(2, 1): 5, (2, 2): 10, (2, 3): 30}}
+
+
+class TestWorkbookRecalculate:
+    """
+    Пересчет значений после изменения ячеек.
+    """
+
+    @pytest.mark.parametrize('workers', [None, 2])
+    def test_1(self, workers):
+        """
+        Пересчитываются только затронутые листы.
+        :param workers: Кол-во процессов.
+        """
+
+        workbook = make_workbook()
+        workbook.calculate()
+
+        workbook.set_cell('Sheet2', (1, 1), '100')
+        assert workbook.recalculate(workers) == {'Sheet1': {(2, 1): 1001, (1, 2): 2002},
+                                                 'Sheet2': {(1, 1): 100, (3, 1): 1000}}
+
+        workbook.set_cell('Sheet3', (1, 2), '7')
+        assert workbook.recalculate(workers) == {'Sheet3': {(1, 1): 7, (1, 2): 7}, 'Sheet1': {(2, 2): 7}}
+
+        assert workbook.recalculate(workers) == {}
+
+    def test_2(self):
+        """
+        Пересчет листа книги пересчитывает все листы, результат только по листу.
+        """
+
+        workbook = make_workbook()
+        assert workbook.get_sheet('Sheet2').recalculate() == {(1, 1): 6, (2, 1): 'Text', (3, 1): 60}
+
+        workbook.get_sheet('Sheet1').set_cell((1, 1), '2')
+        assert workbook.get_sheet('Sheet2').recalculate() == {(1, 1): 7, (3, 1): 70}
+        assert dict(workbook.calculate()['Sheet1'])[(2, 1)] == 72
+
+    def test_3(self):
+        """
+        Вычисление по требованию через ссылки на другие листы.
+        """
+
+        workbook = make_workbook()
+        sheet = workbook.get_sheet('Sheet1')
+
+        assert sheet.get_value((1, 2)) == 122
+
+        workbook.set_cell('Sheet1', (1, 1), '2')
+        assert sheet.evaluate([(2, 1), (1, 2)]) == {(2, 1): 72, (1, 2): 144}
+
+    def test_4(self):
+        """
+        Значения предыдущего расчета листов не изменяются при изменении ячеек и пересчете.
+        """
+
+        workbook = make_workbook()
+        result = workbook.calculate()
+        value_list = {name: dict(values) for name, values in result.items()}
+
+        workbook.set_cell('Sheet2', (1, 1), '100')
+        workbook.recalculate()
+
+        assert {name: dict(values) for name, values in result.items()} == value_list
+        assert dict(workbook.calculate()['Sheet2'])[(1, 1)] == 100
+
+
+class TestWorkbookExplain:
+    """
+    Анализ зависимостей.
+    """
+
+    def test_1(self):
+        """
+        Ячейки других листов обозначаются именем листа.
+        """
+
+        workbook = make_workbook()
+
+        assert workbook.explain().get_longest_chain() == [(1, 2, 'Sheet1'), (2, 1, 'Sheet1'), (3, 1, 'Sheet2'),
+                                                          (1, 1, 'Sheet2')]
+
+        explain = workbook.get_sheet('Sheet1').explain()
+        assert [cell.get_name() for cell in explain.get_top(2)] == ['A2', 'B1']
+        assert explain.get_cell((3, 1, 'Sheet2')).get_name() == 'Sheet2!C1'